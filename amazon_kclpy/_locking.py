@@ -0,0 +1,46 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Helpers for coordinating the record processor processes running on a host.  These rely on ``fcntl`` so are only
+available on POSIX platforms: the module can be imported anywhere, but :class:`FileLock` raises on other platforms.
+"""
+import errno
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock(object):
+    """
+    Holds an exclusive ``flock`` on a file descriptor for the duration of a ``with`` block.
+    """
+
+    def __init__(self, fd):
+        if fcntl is None:
+            raise NotImplementedError('File locks require fcntl, which is only available on POSIX platforms')
+        self._fd = fd
+
+    def __enter__(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def pid_alive(pid):
+    """
+    Determines whether a process is still running.
+
+    :param int pid: the process id to check
+    :return: True if the process exists
+    :rtype: bool
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as os_error:
+        return os_error.errno == errno.EPERM
+    return True
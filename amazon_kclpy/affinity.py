@@ -0,0 +1,259 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Coordinates CPU affinity between the record processor processes running on a host.
+
+Each process given an :class:`AffinityHook` joins a registry, a JSON file in a local directory guarded by an
+``flock``, when its shard is initialized.  Whenever a process joins or leaves, the CPUs available to the record
+processors are dealt out again between every registered shard and each process pins itself to its CPUs with
+``os.sched_setaffinity``.  Processes leave the registry when the lease is lost, the shard ends, or the process exits;
+processes that died without leaving are removed the next time the registry changes.
+
+Optionally the niceness of each process can follow how far behind its shard is, so shards that have caught up yield
+CPU to the ones that are lagging.
+
+This module requires ``fcntl`` so is only available on POSIX platforms.  On platforms without
+``os.sched_setaffinity`` the registry is still maintained but processes aren't pinned.
+"""
+import atexit
+import json
+import os
+import tempfile
+import time
+
+from amazon_kclpy._locking import FileLock, pid_alive
+from amazon_kclpy.hooks import ProcessHook
+
+REGISTRY_DIRECTORY_ENV_VAR = 'KCLPY_AFFINITY_DIRECTORY'
+
+_REGISTRY_FILE = 'registry.json'
+_LOCK_FILE = 'registry.lock'
+
+
+def default_registry_directory():
+    """
+    The directory holding the registry, which can be overridden with the ``KCLPY_AFFINITY_DIRECTORY`` environment
+    variable.
+
+    :return: the registry directory
+    :rtype: str
+    """
+    return os.environ.get(REGISTRY_DIRECTORY_ENV_VAR) or os.path.join(tempfile.gettempdir(), 'amazon_kclpy_affinity')
+
+
+def assign_cpus(members, cpus, cpus_per_shard=1):
+    """
+    Deals CPUs out to the registered shards.  Shards are ordered by shard id so every process computes the same
+    assignment.  When there are more shards than CPUs the CPUs are shared round robin.
+
+    :param dict members: a mapping of process id to the registry entry for that process
+    :param list[int] cpus: the CPUs available to the record processors
+    :param int cpus_per_shard: how many CPUs each shard should be pinned to
+    :return: a mapping of process id to the CPUs that process should be pinned to
+    :rtype: dict
+    """
+    cpus = sorted(cpus)
+    per_shard = max(1, min(cpus_per_shard, len(cpus)))
+    ordered = sorted(members, key=lambda pid: (members[pid]['shard_id'], int(pid)))
+    assignment = {}
+    for position, pid in enumerate(ordered):
+        start = position * per_shard
+        assignment[pid] = sorted(set(cpus[(start + offset) % len(cpus)] for offset in range(per_shard)))
+    return assignment
+
+
+def niceness_for_lag(lag_niceness, millis_behind_latest):
+    """
+    Picks the niceness for a shard from a table of lag thresholds.
+
+    :param list[tuple] lag_niceness: pairs of (minimum millis behind latest, niceness)
+    :param int or None millis_behind_latest: how far behind the shard is
+    :return: the niceness of the largest threshold that the lag has reached, or None if no threshold applies
+    :rtype: int or None
+    """
+    if millis_behind_latest is None:
+        return None
+    chosen = None
+    for threshold, niceness in sorted(lag_niceness):
+        if millis_behind_latest >= threshold:
+            chosen = niceness
+    return chosen
+
+
+class AffinityRegistry(object):
+    """
+    The registry of record processor processes on this host, and the CPUs assigned to them.
+    """
+
+    def __init__(self, directory=None, cpus=None, cpus_per_shard=1):
+        """
+        :param str or None directory: the registry directory, defaults to :func:`default_registry_directory`
+        :param list[int] or None cpus: the CPUs to deal out, defaults to the CPUs this process may run on
+        :param int cpus_per_shard: how many CPUs each shard should be pinned to
+        """
+        self.directory = directory or default_registry_directory()
+        if cpus is None:
+            cpus = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else range(os.cpu_count() or 1)
+        self.cpus = sorted(cpus)
+        self.cpus_per_shard = cpus_per_shard
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self._registry_path = os.path.join(self.directory, _REGISTRY_FILE)
+        self._lock_path = os.path.join(self.directory, _LOCK_FILE)
+
+    def read(self):
+        """
+        Reads the registry without locking it.  Updates replace the file atomically so readers never see a partial
+        registry.
+
+        :return: the registry, with a generation counter and the registered members
+        :rtype: dict
+        """
+        try:
+            with open(self._registry_path) as registry_file:
+                return json.load(registry_file)
+        except (IOError, OSError, ValueError):
+            return {'generation': 0, 'members': {}}
+
+    def update(self, change):
+        """
+        Applies a change to the members while holding the registry lock, prunes processes that are no longer running,
+        and reassigns CPUs.
+
+        :param change: a callable that mutates the mapping of process id to registry entry
+        :return: the updated registry
+        :rtype: dict
+        """
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with FileLock(fd):
+                registry = self.read()
+                members = registry['members']
+                change(members)
+                for pid in [pid for pid in members if not pid_alive(int(pid))]:
+                    del members[pid]
+                for pid, cpus in assign_cpus(members, self.cpus, self.cpus_per_shard).items():
+                    members[pid]['cpus'] = cpus
+                registry['generation'] += 1
+                temporary_path = '{path}.{pid}'.format(path=self._registry_path, pid=os.getpid())
+                with open(temporary_path, 'w') as registry_file:
+                    json.dump(registry, registry_file)
+                os.replace(temporary_path, self._registry_path)
+                return registry
+        finally:
+            os.close(fd)
+
+    def join(self, shard_id):
+        """
+        Registers the current process as processing a shard.
+
+        :param str shard_id: the shard being processed
+        :return: the updated registry
+        :rtype: dict
+        """
+        def add(members):
+            members[str(os.getpid())] = {'shard_id': shard_id, 'cpus': []}
+        return self.update(add)
+
+    def leave(self):
+        """
+        Removes the current process from the registry.
+
+        :return: the updated registry
+        :rtype: dict
+        """
+        def remove(members):
+            members.pop(str(os.getpid()), None)
+        return self.update(remove)
+
+
+class AffinityHook(ProcessHook):
+    """
+    Pins this process to the CPUs the :class:`AffinityRegistry` assigns to its shard.  The registry is re-read every
+    ``check_interval`` seconds while records are being processed, so processes pick up new assignments as shards are
+    added to or removed from the host.
+    """
+
+    def __init__(self, directory=None, cpus=None, cpus_per_shard=1, check_interval=5.0, lag_niceness=None):
+        """
+        :param str or None directory: the registry directory, defaults to :func:`default_registry_directory`
+        :param list[int] or None cpus: the CPUs to deal out, defaults to the CPUs this process may run on
+        :param int cpus_per_shard: how many CPUs each shard should be pinned to
+        :param float check_interval: the number of seconds between checks for a new assignment
+        :param list[tuple] or None lag_niceness: pairs of (minimum millis behind latest, niceness), e.g.
+            ``[(0, 10), (60000, 0)]``.  Lowering niceness again requires privileges, so an unprivileged process will
+            only ever become nicer.
+        """
+        self.registry = AffinityRegistry(directory, cpus, cpus_per_shard)
+        self.check_interval = check_interval
+        self.lag_niceness = lag_niceness
+        self._original_cpus = self.registry.cpus
+        self._generation = None
+        self._cpus = None
+        self._niceness = None
+        self._next_check = 0.0
+        self._shard_id = None
+        self._joined = False
+        self._exit_registered = False
+
+    def _apply(self, registry):
+        self._generation = registry['generation']
+        entry = registry['members'].get(str(os.getpid()))
+        cpus = entry['cpus'] if entry is not None else self._original_cpus
+        if cpus and cpus != self._cpus:
+            if hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(0, cpus)
+            self._cpus = cpus
+
+    def _check(self):
+        registry = self.registry.read()
+        members = registry['members']
+        if str(os.getpid()) not in members or any(not pid_alive(int(pid)) for pid in members):
+            registry = self.registry.update(lambda m: m.setdefault(str(os.getpid()),
+                                                                   {'shard_id': self._shard_id, 'cpus': []}))
+        if registry['generation'] != self._generation:
+            self._apply(registry)
+
+    def _renice(self, millis_behind_latest):
+        niceness = niceness_for_lag(self.lag_niceness, millis_behind_latest)
+        if niceness is None or niceness == self._niceness:
+            return
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, niceness)
+            self._niceness = niceness
+        except OSError:
+            #
+            # Not permitted to lower the niceness; stay where we are until the lag calls for a higher niceness.
+            #
+            pass
+
+    def _leave(self):
+        if not self._joined:
+            return
+        self._joined = False
+        self.registry.leave()
+        self._apply({'generation': None, 'members': {}})
+
+    def action_started(self, action):
+        if action.action == 'initialize':
+            self._shard_id = action.shard_id
+            if not self._exit_registered:
+                atexit.register(self._leave)
+                self._exit_registered = True
+            self._joined = True
+            self._apply(self.registry.join(action.shard_id))
+            self._next_check = time.time() + self.check_interval
+        elif action.action == 'processRecords' and self._joined:
+            if self.lag_niceness:
+                self._renice(action.millis_behind_latest)
+            now = time.time()
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                self._check()
+
+    def action_finished(self, action, error):
+        if action.action in ('leaseLost', 'shardEnded'):
+            self._leave()
+
+    def close(self):
+        self._leave()
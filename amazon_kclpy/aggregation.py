@@ -0,0 +1,387 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Packs many small user records into Kinesis records in the Kinesis Producer Library (KPL) aggregation format, which
+the MultiLangDaemon deaggregates before they reach a record processor::
+
+    from amazon_kclpy.aggregation import aggregate
+    from amazon_kclpy.producer import KinesisProducer
+
+    producer = KinesisProducer('my-stream')
+    for record in aggregate((event.encode('utf-8'), event_key(event)) for event in events):
+        producer.put(record.data, record.partition_key, record.explicit_hash_key)
+
+An aggregated record is the magic bytes ``F3 89 9A C2``, an ``AggregatedRecord`` protobuf message and the MD5 digest
+of that message.  The message holds a table of partition keys, a table of explicit hash keys, and the user records,
+which refer to their keys by index.  It's encoded here by hand, so producers don't need ``protobuf``.
+
+An aggregated record is put on the shard of its outer key, the key of its first user record, and when the KCL
+deaggregates it, user records whose own key hashes outside that shard's range are dropped.  So user records are only
+packed together when they go to the same shard: by default only records with the same partition key and explicit hash
+key are, and given a :class:`amazon_kclpy.shards.ShardMap`, records whose keys the map predicts are on the same shard
+are too, as the KPL does.  With a shard map, records put while the stream is resharded can still be dropped, if the
+map hasn't been refreshed since.  Records with the same key stay in order.
+
+:func:`aggregate` packs records into one aggregated record per key, or per shard, at a time.
+:class:`RecordAggregator` builds one aggregated record at a time, finishing it when a record for another key or shard
+is added.  Each aggregated record is at most ``max_size`` bytes of data and outer partition key, 1 MiB by default,
+which is the most Kinesis accepts.
+
+:func:`deaggregate` decodes aggregated records, and returns any other payload as a single user record.
+"""
+import hashlib
+
+MAGIC = b'\xf3\x89\x9a\xc2'
+DIGEST_SIZE = 16
+MAX_RECORD_BYTES = 1024 * 1024
+
+_PARTITION_KEY_TABLE = 0x0a
+_EXPLICIT_HASH_KEY_TABLE = 0x12
+_RECORD = 0x1a
+_PARTITION_KEY_INDEX = 0x08
+_EXPLICIT_HASH_KEY_INDEX = 0x10
+_DATA = 0x1a
+_OVERHEAD = len(MAGIC) + DIGEST_SIZE
+
+
+def _varint(value):
+    if value < 0x80:
+        return bytes((value,))
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _varint_size(value):
+    return max(1, (value.bit_length() + 6) // 7)
+
+
+def _length_delimited_size(size):
+    return 1 + _varint_size(size) + size
+
+
+class AggregatedRecord(object):
+    """
+    A Kinesis record holding one or more user records.
+    """
+
+    __slots__ = ('data', 'partition_key', 'explicit_hash_key', 'count')
+
+    def __init__(self, data, partition_key, explicit_hash_key, count):
+        """
+        :param bytes data: the payload to put
+        :param str partition_key: the partition key to put it with
+        :param str or None explicit_hash_key: the explicit hash key to put it with
+        :param int count: the number of user records in it
+        """
+        self.data = data
+        self.partition_key = partition_key
+        self.explicit_hash_key = explicit_hash_key
+        self.count = count
+
+
+class UserRecord(object):
+    """
+    A user record decoded from an aggregated record.
+    """
+
+    __slots__ = ('data', 'partition_key', 'explicit_hash_key')
+
+    def __init__(self, data, partition_key, explicit_hash_key=None):
+        self.data = data
+        self.partition_key = partition_key
+        self.explicit_hash_key = explicit_hash_key
+
+    def __eq__(self, other):
+        return isinstance(other, UserRecord) and (self.data, self.partition_key, self.explicit_hash_key) == \
+            (other.data, other.partition_key, other.explicit_hash_key)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'UserRecord({d!r}, {p!r}, {e!r})'.format(d=self.data, p=self.partition_key, e=self.explicit_hash_key)
+
+
+class RecordAggregator(object):
+    """
+    Packs user records going to the same shard into aggregated records no larger than a size limit.
+    """
+
+    def __init__(self, max_size=MAX_RECORD_BYTES, shard_map=None):
+        """
+        :param int max_size: the most bytes of data and outer partition key in an aggregated record
+        :param amazon_kclpy.shards.ShardMap or None shard_map: predicts the shard of each record, so records with
+            different keys on the same shard can be packed together. Without one, only records with the same keys
+            are.
+        """
+        self.max_size = max_size
+        self.shard_map = shard_map
+        self._reset()
+
+    def _reset(self):
+        self._partition_keys = {}
+        self._explicit_hash_keys = {}
+        self._tables = []
+        self._records = []
+        self._body_size = 0
+        self._first_key = None
+        self._first_key_size = 0
+        self._group = None
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def size(self):
+        """
+        The size of the aggregated record built so far, including its outer partition key.
+        """
+        return self._first_key_size + _OVERHEAD + self._body_size if self._records else 0
+
+    def _fit(self, data, partition_key, explicit_hash_key):
+        """
+        Encodes a user record against the current key tables, without adding it.
+
+        :return: the new table entries, the encoded record, and the size they add to the message
+        :rtype: tuple
+        """
+        tables = []
+        index = self._partition_keys.get(partition_key)
+        if index is None:
+            index = len(self._partition_keys)
+            encoded_key = partition_key.encode('utf-8')
+            tables.append((_PARTITION_KEY_TABLE, partition_key, encoded_key))
+        record = [bytes((_PARTITION_KEY_INDEX,)), _varint(index)]
+        if explicit_hash_key is not None:
+            hash_key_index = self._explicit_hash_keys.get(explicit_hash_key)
+            if hash_key_index is None:
+                hash_key_index = len(self._explicit_hash_keys)
+                tables.append((_EXPLICIT_HASH_KEY_TABLE, explicit_hash_key, explicit_hash_key.encode('ascii')))
+            record.append(bytes((_EXPLICIT_HASH_KEY_INDEX,)))
+            record.append(_varint(hash_key_index))
+        record.append(bytes((_DATA,)))
+        record.append(_varint(len(data)))
+        record.append(data)
+        record = b''.join(record)
+        added = _length_delimited_size(len(record))
+        for _, _, encoded in tables:
+            added += _length_delimited_size(len(encoded))
+        return tables, record, added
+
+    def add(self, data, partition_key, explicit_hash_key=None):
+        """
+        Adds a user record, first finishing the aggregated record built so far if the user record doesn't fit in it
+        or goes to another shard.
+
+        :param bytes data: the user record's payload
+        :param str partition_key: the user record's partition key
+        :param str or None explicit_hash_key: the user record's explicit hash key
+        :return: the aggregated record that was finished, if one was
+        :rtype: AggregatedRecord or None
+        :raises ValueError: if the user record is too large to aggregate on its own
+        """
+        key_size = len(partition_key.encode('utf-8'))
+        alone = _length_delimited_size(key_size) + _length_delimited_size(
+            4 + _length_delimited_size(len(data)) if explicit_hash_key is not None else
+            2 + _length_delimited_size(len(data)))
+        if explicit_hash_key is not None:
+            alone += _length_delimited_size(len(explicit_hash_key))
+        if key_size + _OVERHEAD + alone > self.max_size:
+            raise ValueError('User record of {n} bytes is too large to aggregate into {m} bytes'.format(
+                n=len(data), m=self.max_size))
+        if self.shard_map is not None:
+            group = self.shard_map.shard_for(partition_key, explicit_hash_key)
+        else:
+            group = (partition_key, explicit_hash_key)
+        finished = None
+        if self._records and group != self._group:
+            finished = self.flush()
+        tables, record, added = self._fit(data, partition_key, explicit_hash_key)
+        if self._records and self.size + added > self.max_size:
+            finished = self.flush()
+            tables, record, added = self._fit(data, partition_key, explicit_hash_key)
+        if not self._records:
+            self._first_key = (partition_key, explicit_hash_key)
+            self._first_key_size = key_size
+            self._group = group
+        for tag, key, encoded in tables:
+            if tag == _PARTITION_KEY_TABLE:
+                self._partition_keys[key] = len(self._partition_keys)
+            else:
+                self._explicit_hash_keys[key] = len(self._explicit_hash_keys)
+            self._tables.append((tag, encoded))
+        self._records.append(record)
+        self._body_size += added
+        return finished
+
+    def flush(self):
+        """
+        Finishes the aggregated record built so far.
+
+        :return: the aggregated record, or None if no user records were added since the last one
+        :rtype: AggregatedRecord or None
+        """
+        if not self._records:
+            return None
+        parts = []
+        #
+        # Fields are written in field number order, as protobuf serializers do: the partition key table, the explicit
+        # hash key table, then the records.
+        #
+        for table in (_PARTITION_KEY_TABLE, _EXPLICIT_HASH_KEY_TABLE):
+            for tag, encoded in self._tables:
+                if tag == table:
+                    parts.append(bytes((tag,)))
+                    parts.append(_varint(len(encoded)))
+                    parts.append(encoded)
+        record_tag = bytes((_RECORD,))
+        for record in self._records:
+            parts.append(record_tag)
+            parts.append(_varint(len(record)))
+            parts.append(record)
+        body = b''.join(parts)
+        partition_key, explicit_hash_key = self._first_key
+        aggregated = AggregatedRecord(MAGIC + body + hashlib.md5(body).digest(), partition_key, explicit_hash_key,
+                                      len(self._records))
+        self._reset()
+        return aggregated
+
+
+def aggregate(records, max_size=MAX_RECORD_BYTES, shard_map=None):
+    """
+    Packs user records into aggregated records, grouped by partition key and explicit hash key, or by shard.
+
+    :param records: tuples of (data, partition key) or (data, partition key, explicit hash key)
+    :param int max_size: the most bytes of data and outer partition key in an aggregated record
+    :param amazon_kclpy.shards.ShardMap or None shard_map: predicts the shard of each record, to group records by
+        shard instead of by key
+    :return: the aggregated records, in the order each group's first user record appeared
+    :rtype: list[AggregatedRecord]
+    """
+    aggregators = {}
+    output = []
+    slots = {}
+    for record in records:
+        data, partition_key = record[0], record[1]
+        explicit_hash_key = record[2] if len(record) > 2 else None
+        if shard_map is not None:
+            group = shard_map.shard_for(partition_key, explicit_hash_key)
+        else:
+            group = (partition_key, explicit_hash_key)
+        aggregator = aggregators.get(group)
+        if aggregator is None:
+            aggregator = aggregators[group] = RecordAggregator(max_size, shard_map)
+            slots[group] = []
+        finished = aggregator.add(data, partition_key, explicit_hash_key)
+        if finished is not None:
+            slots[group].append(finished)
+    for group, aggregator in aggregators.items():
+        output.extend(slots[group])
+        finished = aggregator.flush()
+        if finished is not None:
+            output.append(finished)
+    return output
+
+
+def _read_varint(buffer, position):
+    result = 0
+    shift = 0
+    while True:
+        if position >= len(buffer):
+            raise ValueError('Truncated varint')
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def _fields(buffer, start, end):
+    """
+    Yields the (field number, wire type, value) of each field in a protobuf message.  Length delimited values are
+    returned as (start, end) offsets.
+    """
+    position = start
+    while position < end:
+        key, position = _read_varint(buffer, position)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, position = _read_varint(buffer, position)
+        elif wire_type == 2:
+            length, position = _read_varint(buffer, position)
+            value = (position, position + length)
+            position += length
+        elif wire_type == 1:
+            value = None
+            position += 8
+        elif wire_type == 5:
+            value = None
+            position += 4
+        else:
+            raise ValueError('Unsupported protobuf wire type {t}'.format(t=wire_type))
+        if position > end:
+            raise ValueError('Truncated protobuf field {f}'.format(f=field))
+        yield field, wire_type, value
+
+
+def is_aggregated(data):
+    """
+    :param bytes data: a Kinesis record's payload
+    :return: True if the payload has the aggregation magic bytes and a matching digest
+    :rtype: bool
+    """
+    return len(data) >= _OVERHEAD and data[:len(MAGIC)] == MAGIC and \
+        hashlib.md5(data[len(MAGIC):-DIGEST_SIZE]).digest() == data[-DIGEST_SIZE:]
+
+
+def deaggregate(data, partition_key=None, explicit_hash_key=None):
+    """
+    Decodes the user records in a Kinesis record.
+
+    :param bytes data: the Kinesis record's payload
+    :param str or None partition_key: the Kinesis record's partition key, used if the payload isn't aggregated
+    :param str or None explicit_hash_key: the Kinesis record's explicit hash key, used if the payload isn't aggregated
+    :return: the user records, or a single user record holding the payload if it isn't aggregated
+    :rtype: list[UserRecord]
+    :raises ValueError: if an aggregated payload is malformed
+    """
+    if not is_aggregated(data):
+        return [UserRecord(data, partition_key, explicit_hash_key)]
+    buffer = memoryview(data)
+    end = len(data) - DIGEST_SIZE
+    partition_keys = []
+    explicit_hash_keys = []
+    records = []
+    for field, wire_type, value in _fields(buffer, len(MAGIC), end):
+        if wire_type != 2:
+            continue
+        if field == 1:
+            partition_keys.append(bytes(buffer[value[0]:value[1]]).decode('utf-8'))
+        elif field == 2:
+            explicit_hash_keys.append(bytes(buffer[value[0]:value[1]]).decode('ascii'))
+        elif field == 3:
+            records.append(value)
+    user_records = []
+    for start, record_end in records:
+        partition_key_index = explicit_hash_key_index = record_data = None
+        for field, wire_type, value in _fields(buffer, start, record_end):
+            if field == 1 and wire_type == 0:
+                partition_key_index = value
+            elif field == 2 and wire_type == 0:
+                explicit_hash_key_index = value
+            elif field == 3 and wire_type == 2:
+                record_data = bytes(buffer[value[0]:value[1]])
+        if partition_key_index is None or record_data is None:
+            raise ValueError('Aggregated record is missing a partition key index or data')
+        try:
+            user_records.append(UserRecord(
+                record_data, partition_keys[partition_key_index],
+                explicit_hash_keys[explicit_hash_key_index] if explicit_hash_key_index is not None else None))
+        except IndexError:
+            raise ValueError('Aggregated record refers to a key that is not in its tables')
+    return user_records
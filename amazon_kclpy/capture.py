@@ -0,0 +1,88 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Records the exact message stream between the MultiLangDaemon and a record processor so that it can be replayed later
+with :mod:`amazon_kclpy.replay`.
+
+Capturing is enabled by passing ``capture='<path>'`` to :class:`amazon_kclpy.kcl.KCLProcess`, or by setting the
+``KCLPY_CAPTURE_FILE`` environment variable.  Any ``{pid}`` in the path is replaced with the process id, so one
+setting can be used for every shard on a host.
+
+A capture is a gzip compressed file with one JSON object per line, holding the time the line was read or written
+(``time``), whether it was read from the MultiLangDaemon or written to it (``direction`` of ``in`` or ``out``), and the
+line itself (``line``).  The file is flushed at most once per ``flush_interval`` seconds, and a capture cut short by the
+process being killed can still be read up to the last flush.
+"""
+import gzip
+import json
+import os
+import time
+import zlib
+
+INBOUND = 'in'
+OUTBOUND = 'out'
+
+
+class ProtocolCapture(object):
+    """
+    Writes the lines read and written by a :class:`amazon_kclpy.kcl._IOHandler` to a capture file.
+    """
+
+    def __init__(self, path, flush_interval=1.0, compresslevel=1):
+        """
+        :param str path: the capture file, ``{pid}`` is replaced with the process id
+        :param float flush_interval: the most seconds between flushes of the capture file
+        :param int compresslevel: the gzip compression level, from 1 (fastest) to 9 (smallest)
+        """
+        self.path = path.replace('{pid}', str(os.getpid()))
+        self.flush_interval = flush_interval
+        self._file = gzip.open(self.path, 'wt', compresslevel=compresslevel)
+        self._next_flush = time.time() + flush_interval
+
+    def _write(self, direction, line):
+        now = time.time()
+        self._file.write(json.dumps({'time': now, 'direction': direction, 'line': line.rstrip('\n')}))
+        self._file.write('\n')
+        if now >= self._next_flush:
+            self._next_flush = now + self.flush_interval
+            self._file.flush()
+
+    def inbound(self, line):
+        """
+        Records a line read from the MultiLangDaemon.
+
+        :param str line: the line
+        """
+        self._write(INBOUND, line)
+
+    def outbound(self, line):
+        """
+        Records a line written to the MultiLangDaemon.
+
+        :param str line: the line
+        """
+        self._write(OUTBOUND, line)
+
+    def close(self):
+        self._file.close()
+
+
+def read_capture(path):
+    """
+    Reads the entries of a capture file.  A capture that was cut short is read up to the point where it ends.
+
+    :param str path: the capture file
+    :return: a generator of dictionaries with ``time``, ``direction`` and ``line`` keys
+    """
+    with gzip.open(path, 'rt') as capture_file:
+        while True:
+            try:
+                line = capture_file.readline()
+            except (EOFError, zlib.error):
+                return
+            if not line:
+                return
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
@@ -0,0 +1,400 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Decodes every payload in a batch of records in one call::
+
+    from amazon_kclpy.codec import AvroCodec, CodecRegistry, JsonCodec
+
+    registry = CodecRegistry(default=JsonCodec())
+    registry.register('avro', AvroCodec(schema_resolver=fetch_schema))
+
+    def process_records(self, process_records_input):
+        decoded = registry.decode(process_records_input, content_type=lambda record: record.partition_key[:4])
+        for record, value in decoded.successes():
+            ...
+        for failure in decoded.failures:
+            ...
+
+Kinesis records carry no headers, so the content type of a record is whatever the producer chose to encode it in.  It
+can be given for the whole batch as a string, or per record as a function of the record, for example of its partition
+key.  Records without a registered content type are decoded by the ``default`` codec.
+
+Each codec decodes its share of the batch at once, so that setup is paid once per batch rather than once per record:
+the whole share is decoded in a single pass, falling back to one payload at a time only to find the ones that failed,
+:class:`AvroCodec` reads every payload from one buffer, and the schema based codecs resolve and compile each schema
+once, caching it across batches.  Payloads prefixed with a schema id (a zero byte followed by a four byte big endian
+id, as written by schema registry serializers) are decoded with the schema of that id.
+
+The Avro, Protobuf and MessagePack codecs need ``fastavro``, ``protobuf`` and ``msgpack`` respectively, which are
+installed with the ``avro``, ``protobuf`` and ``msgpack`` extras.  A payload that fails to decode, or a record whose
+data isn't valid base64, doesn't fail the batch; it's reported in :attr:`DecodedBatch.failures`.
+"""
+import functools
+import json
+import struct
+
+SCHEMA_ID_MAGIC = 0
+_SCHEMA_ID_HEADER = struct.Struct('>BI')
+
+
+def split_schema_id(payload):
+    """
+    Splits the schema id prefix from a payload.
+
+    :param bytes payload: a payload starting with a zero byte and a four byte big endian schema id
+    :return: the schema id and the rest of the payload
+    :rtype: tuple
+    :raises ValueError: if the payload doesn't start with a schema id
+    """
+    if len(payload) < _SCHEMA_ID_HEADER.size or payload[0] != SCHEMA_ID_MAGIC:
+        raise ValueError('Payload does not start with a schema id')
+    return _SCHEMA_ID_HEADER.unpack_from(payload)[1], payload[_SCHEMA_ID_HEADER.size:]
+
+
+class SchemaCache(object):
+    """
+    Resolves schema ids to compiled schemas, resolving and compiling each id only once.
+    """
+
+    def __init__(self, resolver, compile=None):
+        """
+        :param resolver: called with a schema id, returns the schema
+        :param compile: called with a resolved schema, returns the compiled form used for decoding. Defaults to using
+            the schema as it was resolved.
+        """
+        self.resolver = resolver
+        self.compile = compile
+        self._schemas = {}
+
+    def get(self, schema_id):
+        """
+        :param int schema_id: the schema id
+        :return: the compiled schema
+        """
+        schema = self._schemas.get(schema_id)
+        if schema is None:
+            schema = self.resolver(schema_id)
+            if self.compile is not None:
+                schema = self.compile(schema)
+            self._schemas[schema_id] = schema
+        return schema
+
+    def __len__(self):
+        return len(self._schemas)
+
+
+def _decode_all(decode, payloads):
+    """
+    Decodes a batch of payloads in one pass, and only if one of them fails, again one at a time to find the failures.
+
+    :return: the decoded values, and a mapping of the position of each payload that failed to its exception
+    :rtype: tuple
+    """
+    try:
+        return [decode(payload) for payload in payloads], {}
+    except Exception:
+        pass
+    values = []
+    errors = {}
+    for index, payload in enumerate(payloads):
+        try:
+            values.append(decode(payload))
+        except Exception as e:
+            values.append(None)
+            errors[index] = e
+    return values, errors
+
+
+class DecodeFailure(object):
+    """
+    A record whose payload couldn't be decoded.
+    """
+
+    def __init__(self, index, record, error):
+        """
+        :param int index: the position of the record in the batch
+        :param amazon_kclpy.messages.Record record: the record
+        :param Exception error: why it couldn't be decoded
+        """
+        self.index = index
+        self.record = record
+        self.error = error
+
+    def __repr__(self):
+        return 'DecodeFailure(index={index}, error={error!r})'.format(index=self.index, error=self.error)
+
+
+class DecodedBatch(object):
+    """
+    The decoded payloads of a batch of records.
+    """
+
+    def __init__(self, records, values, failures):
+        """
+        :param list records: the records
+        :param list values: the decoded payload of each record, None for those that failed
+        :param list[DecodeFailure] failures: the records that failed, in batch order
+        """
+        self.records = records
+        self.values = values
+        self.failures = failures
+
+    def successes(self):
+        """
+        :return: (record, value) pairs for the records that were decoded, in batch order
+        """
+        failed = set(failure.index for failure in self.failures)
+        return [(record, value) for index, (record, value) in enumerate(zip(self.records, self.values))
+                if index not in failed]
+
+
+class Codec(object):
+    """
+    Decodes payloads.  Subclasses implement :meth:`decode`, and override :meth:`decode_batch` when a whole batch can
+    be decoded more cheaply than its payloads one by one.
+    """
+
+    def decode(self, payload):
+        """
+        :param bytes payload: the payload of a record
+        :return: the decoded value
+        """
+        raise NotImplementedError
+
+    def decode_batch(self, payloads):
+        """
+        :param list[bytes] payloads: the payloads of a batch of records
+        :return: the decoded values, and a mapping of the position of each payload that failed to its exception
+        :rtype: tuple
+        """
+        return _decode_all(self.decode, payloads)
+
+
+class JsonCodec(Codec):
+    """
+    Decodes JSON payloads, or with ``lines=True``, payloads of newline separated JSON documents into lists.
+
+    ``orjson`` is used when it's installed, since it parses bytes directly and is several times faster than the
+    standard library.  It rejects a few documents that the standard library accepts, such as integers wider than 64
+    bits and ``NaN``, so it can be turned off.
+    """
+
+    def __init__(self, lines=False, encoding='utf-8', use_orjson=None):
+        """
+        :param bool lines: whether each payload holds newline separated documents
+        :param str encoding: the text encoding of the payloads
+        :param bool or None use_orjson: whether to use orjson, by default it's used if it's installed and the encoding
+            is UTF-8, the only encoding it accepts
+        """
+        self.lines = lines
+        self.encoding = encoding
+        self._loads = None
+        if use_orjson or (use_orjson is None and encoding.lower().replace('-', '') == 'utf8'):
+            try:
+                import orjson
+                self._loads = orjson.loads
+            except ImportError:
+                if use_orjson:
+                    raise ImportError('JsonCodec(use_orjson=True) requires orjson')
+        if self._loads is None:
+            decode = json.JSONDecoder().decode
+            self._loads = lambda payload: decode(payload.decode(encoding))
+
+    def decode(self, payload):
+        if self.lines:
+            loads = self._loads
+            return [loads(line) for line in payload.splitlines() if line.strip()]
+        return self._loads(payload)
+
+    def decode_batch(self, payloads):
+        return _decode_all(self.decode if self.lines else self._loads, payloads)
+
+
+class MessagePackCodec(Codec):
+    """
+    Decodes MessagePack payloads.  Requires ``msgpack``.
+    """
+
+    def __init__(self, **unpack_options):
+        """
+        :param unpack_options: passed to ``msgpack.unpackb``, by default strings are decoded as UTF-8
+        """
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError('MessagePackCodec requires msgpack, install amazon_kclpy[msgpack]')
+        unpack_options.setdefault('raw', False)
+        self._unpackb = functools.partial(msgpack.unpackb, **unpack_options)
+
+    def decode(self, payload):
+        return self._unpackb(payload)
+
+    def decode_batch(self, payloads):
+        return _decode_all(self._unpackb, payloads)
+
+
+class AvroCodec(Codec):
+    """
+    Decodes Avro binary payloads without embedded schemas, either with a fixed schema, or with schemas looked up by the
+    schema id prefixing each payload.  Requires ``fastavro``.
+    """
+
+    def __init__(self, schema=None, schema_resolver=None, reader_schema=None):
+        """
+        :param dict or None schema: the writer schema of every payload, if payloads aren't prefixed with a schema id
+        :param schema_resolver: called with a schema id, returns the writer schema of that id
+        :param dict or None reader_schema: a schema to resolve every writer schema to, if any
+        """
+        try:
+            import fastavro
+        except ImportError:
+            raise ImportError('AvroCodec requires fastavro, install amazon_kclpy[avro]')
+        if (schema is None) == (schema_resolver is None):
+            raise ValueError('Exactly one of schema and schema_resolver must be given')
+        from io import BytesIO
+        self._bytes_io = BytesIO
+        self._read = fastavro.schemaless_reader
+        self._schema = fastavro.parse_schema(schema) if schema is not None else None
+        self._reader_schema = fastavro.parse_schema(reader_schema) if reader_schema is not None else None
+        self.schemas = SchemaCache(schema_resolver, fastavro.parse_schema) if schema_resolver is not None else None
+
+    def decode(self, payload):
+        values, errors = self.decode_batch([payload])
+        if errors:
+            raise errors[0]
+        return values[0]
+
+    def decode_batch(self, payloads):
+        """
+        Reads every payload from one buffer, checking that each record ends where its payload does.
+        """
+        read = self._read
+        reader_schema = self._reader_schema
+        schema = self._schema
+        buffer = self._bytes_io(b''.join(payloads))
+        values = []
+        errors = {}
+        start = 0
+        for index, payload in enumerate(payloads):
+            end = start + len(payload)
+            try:
+                if schema is None:
+                    buffer.seek(start + _SCHEMA_ID_HEADER.size)
+                    value = read(buffer, self.schemas.get(split_schema_id(payload)[0]), reader_schema)
+                else:
+                    buffer.seek(start)
+                    value = read(buffer, schema, reader_schema)
+                if buffer.tell() != end:
+                    raise ValueError('Avro record does not fill its payload of {n} bytes'.format(n=len(payload)))
+                values.append(value)
+            except Exception as e:
+                values.append(None)
+                errors[index] = e
+            start = end
+        return values, errors
+
+
+class ProtobufCodec(Codec):
+    """
+    Decodes Protocol Buffers payloads into message objects, either of a fixed message class, or of a class looked up by
+    the schema id prefixing each payload.  Requires ``protobuf``.
+    """
+
+    def __init__(self, message_class=None, message_class_resolver=None):
+        """
+        :param message_class: the generated message class of every payload, if payloads aren't prefixed with a
+            schema id
+        :param message_class_resolver: called with a schema id, returns the message class of that id
+        """
+        try:
+            import google.protobuf  # noqa: F401
+        except ImportError:
+            raise ImportError('ProtobufCodec requires protobuf, install amazon_kclpy[protobuf]')
+        if (message_class is None) == (message_class_resolver is None):
+            raise ValueError('Exactly one of message_class and message_class_resolver must be given')
+        self._message_class = message_class
+        self.schemas = SchemaCache(message_class_resolver) if message_class_resolver is not None else None
+
+    def decode(self, payload):
+        if self._message_class is not None:
+            return self._message_class.FromString(payload)
+        schema_id, payload = split_schema_id(payload)
+        return self.schemas.get(schema_id).FromString(payload)
+
+    def decode_batch(self, payloads):
+        if self._message_class is not None:
+            return _decode_all(self._message_class.FromString, payloads)
+        return _decode_all(self.decode, payloads)
+
+
+class CodecRegistry(object):
+    """
+    Maps content types to codecs, and decodes batches of records with them.
+    """
+
+    def __init__(self, default=None):
+        """
+        :param Codec or None default: decodes records whose content type has no codec registered
+        """
+        self.default = default
+        self._codecs = {}
+
+    def register(self, content_type, codec):
+        """
+        :param str content_type: the content type
+        :param Codec codec: the codec for records of the content type
+        """
+        self._codecs[content_type] = codec
+
+    def codec_for(self, content_type):
+        """
+        :param str or None content_type: the content type
+        :return: the codec registered for the content type, or the default
+        :rtype: Codec
+        :raises LookupError: if there's no codec for the content type and no default
+        """
+        codec = self._codecs.get(content_type, self.default)
+        if codec is None:
+            raise LookupError('No codec is registered for content type {ct!r}'.format(ct=content_type))
+        return codec
+
+    def decode(self, records, content_type=None):
+        """
+        Decodes the payloads of a batch of records.
+
+        :param records: the records, or a :class:`amazon_kclpy.messages.ProcessRecordsInput`
+        :param content_type: the content type of every record as a string, or a function returning the content type
+            of a record. If None every record is decoded by the default codec.
+        :rtype: DecodedBatch
+        """
+        records = getattr(records, 'records', records)
+        if content_type is None or not callable(content_type):
+            groups = {content_type: range(len(records))}
+        else:
+            groups = {}
+            for index, record in enumerate(records):
+                groups.setdefault(content_type(record), []).append(index)
+
+        values = [None] * len(records)
+        failures = []
+        for group_type, indexes in groups.items():
+            try:
+                codec = self.codec_for(group_type)
+            except LookupError as e:
+                failures.extend(DecodeFailure(index, records[index], e) for index in indexes)
+                continue
+            payloads = []
+            decodable = []
+            for index in indexes:
+                try:
+                    payloads.append(records[index].binary_data)
+                    decodable.append(index)
+                except Exception as e:
+                    failures.append(DecodeFailure(index, records[index], e))
+            group_values, errors = codec.decode_batch(payloads)
+            for position, index in enumerate(decodable):
+                values[index] = group_values[position]
+            failures.extend(DecodeFailure(decodable[position], records[decodable[position]], error)
+                            for position, error in errors.items())
+        failures.sort(key=lambda failure: failure.index)
+        return DecodedBatch(records, values, failures)
@@ -0,0 +1,231 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Decompresses the payloads of a batch of records, detecting the format of each from its magic bytes::
+
+    from amazon_kclpy.decompression import DecompressionStage
+
+    stage = DecompressionStage(zstd_dictionaries=['/etc/my_app/events.dict'])
+
+    def process_records(self, process_records_input):
+        batch = stage.decompress(process_records_input)
+        values, errors = codec.decode_batch(batch.payloads)
+
+gzip and zlib payloads are decompressed with ``zlib`` directly, which is about twice as fast as the ``gzip`` module
+for record sized payloads.  zstd payloads (which need ``zstandard``, installed with the ``zstd`` extra) are
+decompressed with a ``ZstdDecompressor`` kept for each dictionary and thread, so its context is reused across records
+and batches.  Dictionaries are loaded once per process and chosen by the dictionary id in each frame.  Payloads in none
+of the enabled formats are passed through unchanged, and decompressed payloads are limited to ``max_output_size``
+bytes.
+
+A zlib header is only two bytes, so a small fraction of uncompressed payloads look like zlib.  Leave ``ZLIB`` out of
+``formats`` if producers never use it.
+
+Batches with at least ``parallel_threshold`` compressed bytes are split across a thread pool, since zlib and zstd
+release the GIL while decompressing.
+"""
+import os
+import threading
+import zlib
+
+GZIP = 'gzip'
+ZLIB = 'zlib'
+ZSTD = 'zstd'
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def detect_format(payload):
+    """
+    :param bytes payload: a payload
+    :return: :data:`GZIP`, :data:`ZLIB`, :data:`ZSTD`, or None if the payload doesn't start like any of them
+    :rtype: str or None
+    """
+    if payload[:2] == _GZIP_MAGIC:
+        return GZIP
+    if payload[:4] == _ZSTD_MAGIC:
+        return ZSTD
+    if len(payload) >= 2 and payload[0] & 0x0f == 8 and payload[0] >> 4 <= 7 \
+            and (payload[0] << 8 | payload[1]) % 31 == 0:
+        return ZLIB
+    return None
+
+
+def load_zstd_dictionary(path):
+    """
+    Loads a zstd dictionary, reading each file only once per process.
+
+    :param str path: the dictionary file
+    :rtype: zstandard.ZstdCompressionDict
+    """
+    path = os.path.abspath(path)
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(path)
+        if dictionary is None:
+            import zstandard
+            with open(path, 'rb') as dictionary_file:
+                dictionary = _dictionaries[path] = zstandard.ZstdCompressionDict(dictionary_file.read())
+        return dictionary
+
+
+class DecompressedBatch(object):
+    """
+    The decompressed payloads of a batch of records.
+    """
+
+    def __init__(self, records, payloads, formats, failures):
+        """
+        :param list records: the records
+        :param list[bytes] payloads: the decompressed payload of each record, None for those that failed
+        :param list formats: the detected format of each payload, None for those passed through
+        :param list[amazon_kclpy.codec.DecodeFailure] failures: the records that failed to decompress
+        """
+        self.records = records
+        self.payloads = payloads
+        self.formats = formats
+        self.failures = failures
+
+
+class DecompressionStage(object):
+    """
+    Decompresses gzip, zlib and zstd payloads.
+    """
+
+    def __init__(self, formats=(GZIP, ZLIB, ZSTD), zstd_dictionaries=None, max_output_size=64 * 1024 * 1024,
+                 threads=4, parallel_threshold=1024 * 1024):
+        """
+        :param formats: the formats that are detected and decompressed
+        :param list or None zstd_dictionaries: zstd dictionaries, as file paths or ``ZstdCompressionDict`` objects
+        :param int max_output_size: the largest decompressed payload allowed
+        :param int threads: the size of the thread pool used for large batches, 0 to never use one
+        :param int parallel_threshold: the number of compressed bytes in a batch above which the thread pool is used
+        """
+        self.formats = frozenset(formats)
+        self.max_output_size = max_output_size
+        self.threads = threads
+        self.parallel_threshold = parallel_threshold
+        self._dictionaries = {}
+        for dictionary in zstd_dictionaries or []:
+            if not hasattr(dictionary, 'dict_id'):
+                dictionary = load_zstd_dictionary(dictionary)
+            self._dictionaries[dictionary.dict_id()] = dictionary
+        self._local = threading.local()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _zstd_decompressor(self, dictionary_id):
+        decompressors = getattr(self._local, 'decompressors', None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(dictionary_id)
+        if decompressor is None:
+            import zstandard
+            if dictionary_id:
+                dictionary = self._dictionaries.get(dictionary_id)
+                if dictionary is None:
+                    raise ValueError('No zstd dictionary with id {id} was loaded'.format(id=dictionary_id))
+                decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            else:
+                decompressor = zstandard.ZstdDecompressor()
+            decompressors[dictionary_id] = decompressor
+        return decompressor
+
+    def _decompress_zstd(self, payload):
+        import zstandard
+        try:
+            parameters = zstandard.get_frame_parameters(payload)
+            if parameters.content_size != zstandard.CONTENTSIZE_UNKNOWN and \
+                    parameters.content_size > self.max_output_size:
+                raise ValueError('Decompressed payload exceeds {n} bytes'.format(n=self.max_output_size))
+            decompressor = self._zstd_decompressor(parameters.dict_id)
+            #
+            # max_output_size only applies to frames that don't record their content size, such as streamed frames.
+            #
+            return decompressor.decompress(payload, max_output_size=self.max_output_size)
+        except zstandard.ZstdError as e:
+            raise ValueError('Corrupt zstd payload: {e}'.format(e=e))
+
+    def decompress_payload(self, payload):
+        """
+        :param bytes payload: a payload
+        :return: the decompressed payload, or the payload itself if it isn't in an enabled format, and its format
+        :rtype: tuple
+        :raises ValueError: if the payload couldn't be decompressed
+        """
+        payload_format = detect_format(payload)
+        if payload_format is None or payload_format not in self.formats:
+            return payload, None
+        if payload_format == ZSTD:
+            return self._decompress_zstd(payload), ZSTD
+        try:
+            decompressor = zlib.decompressobj(31 if payload_format == GZIP else 15)
+            output = decompressor.decompress(payload, self.max_output_size)
+        except zlib.error as e:
+            raise ValueError('Corrupt {format} payload: {e}'.format(format=payload_format, e=e))
+        if decompressor.unconsumed_tail:
+            raise ValueError('Decompressed payload exceeds {n} bytes'.format(n=self.max_output_size))
+        if not decompressor.eof:
+            raise ValueError('Truncated {format} payload'.format(format=payload_format))
+        return output, payload_format
+
+    def _decompress_range(self, payloads, start, end, results):
+        decompress_payload = self.decompress_payload
+        for index in range(start, end):
+            try:
+                results[index] = decompress_payload(payloads[index])
+            except Exception as e:
+                results[index] = e
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='kclpy-decompress')
+            return self._executor
+
+    def decompress(self, records):
+        """
+        Decompresses the payloads of a batch of records.
+
+        :param records: the records, or a :class:`amazon_kclpy.messages.ProcessRecordsInput`
+        :rtype: DecompressedBatch
+        """
+        from amazon_kclpy.codec import DecodeFailure
+        records = getattr(records, 'records', records)
+        payloads = [record.binary_data for record in records]
+        results = [None] * len(payloads)
+        if self.threads and len(payloads) > 1 and sum(map(len, payloads)) >= self.parallel_threshold:
+            chunk = -(-len(payloads) // self.threads)
+            futures = [self._pool().submit(self._decompress_range, payloads, start,
+                                           min(start + chunk, len(payloads)), results)
+                       for start in range(0, len(payloads), chunk)]
+            for future in futures:
+                future.result()
+        else:
+            self._decompress_range(payloads, 0, len(payloads), results)
+
+        outputs = []
+        formats = []
+        failures = []
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                outputs.append(None)
+                formats.append(detect_format(payloads[index]))
+                failures.append(DecodeFailure(index, records[index], result))
+            else:
+                outputs.append(result[0])
+                formats.append(result[1])
+        return DecompressedBatch(records, outputs, formats, failures)
+
+    def close(self):
+        """
+        Stops the thread pool, if one was started.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,492 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Emulates the MultiLangDaemon locally, so record processors can be load and failover tested without the Java daemon,
+DynamoDB or a stream::
+
+    kclpy-emulator --scenario lease-theft --shards 4 --batches 200 -- python my_app.py
+
+Like the daemon, the emulator starts the record processor command once per shard lease and talks to it over its stdin
+and stdout.  Each shard is given ``initialize``, then synthetic ``processRecords`` batches, and finally
+``shutdownRequested`` (or just end of input with ``--no-shutdown``).  Checkpoints are persisted to a JSON file, so a
+processor taking over a shard starts from the last checkpoint and records after it are delivered again.  Each run
+starts with no checkpoints, unless ``--resume`` is given: then the run carries on from the checkpoints already in the
+file, and shards checkpointed at ``SHARD_END`` aren't processed again but go straight on to their child shards.
+
+The scenarios are:
+
+* ``steady``: every shard is processed to the end
+* ``resharding``: half way through, each shard ends with ``shardEnded``.  Once the record processor has checkpointed
+  at ``SHARD_END``, two child shards are processed.
+* ``lease-theft``: half way through, the lease of each shard is lost with ``leaseLost``, and a new record processor
+  takes the shard over from its last checkpoint
+* ``throttled-checkpoints``: a fifth of checkpoint requests fail with ``ThrottlingException``
+
+The emulator reports the throughput and checkpoint rate of each shard.  :class:`ProcessorConnection` exchanges single
+actions with a record processor, for tools that drive it directly.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+SHARD_END = 'SHARD_END'
+TRIM_HORIZON = 'TRIM_HORIZON'
+
+_FIRST_SEQUENCE_NUMBER = 49500000000000000000000000000
+
+
+class EmulatorError(Exception):
+    """
+    Raised when a record processor doesn't follow the MultiLangDaemon protocol.
+    """
+    pass
+
+
+class Scenario(object):
+    """
+    Describes the work given to each shard, and the failures injected along the way.
+    """
+
+    def __init__(self, shards=1, batches=100, records_per_batch=100, payload_size=1024, reshard_after=None,
+                 steal_lease_after=None, checkpoint_failure_rate=0.0, shutdown_at_end=True, seed=None):
+        """
+        :param int shards: the number of shards processed at the start
+        :param int batches: the number of processRecords batches delivered to each shard
+        :param int records_per_batch: the number of records in each batch
+        :param int payload_size: the number of bytes in each record
+        :param int or None reshard_after: if set, each initial shard ends after this many batches and is replaced by
+            two child shards
+        :param int or None steal_lease_after: if set, the lease of each shard is lost after this many batches, and a
+            new record processor takes it over
+        :param float checkpoint_failure_rate: the fraction of checkpoint requests that fail with ThrottlingException
+        :param bool shutdown_at_end: whether shards that reach the end are sent shutdownRequested
+        :param int or None seed: seeds the choice of failed checkpoints, for repeatable runs
+        """
+        self.shards = shards
+        self.batches = batches
+        self.records_per_batch = records_per_batch
+        self.payload_size = payload_size
+        self.reshard_after = reshard_after
+        self.steal_lease_after = steal_lease_after
+        self.checkpoint_failure_rate = checkpoint_failure_rate
+        self.shutdown_at_end = shutdown_at_end
+        self.seed = seed
+
+    @staticmethod
+    def named(name, **kwargs):
+        """
+        Creates one of the named scenarios described in the module documentation.
+
+        :param str name: steady, resharding, lease-theft or throttled-checkpoints
+        :param kwargs: any other :class:`Scenario` arguments
+        :rtype: Scenario
+        """
+        scenario = Scenario(**kwargs)
+        if name == 'resharding':
+            scenario.reshard_after = scenario.batches // 2
+        elif name == 'lease-theft':
+            scenario.steal_lease_after = scenario.batches // 2
+        elif name == 'throttled-checkpoints':
+            scenario.checkpoint_failure_rate = 0.2
+        elif name != 'steady':
+            raise ValueError('Unknown scenario {name}'.format(name=name))
+        return scenario
+
+
+class CheckpointStore(object):
+    """
+    Persists the checkpoint of each shard to a JSON file, replacing it atomically on every update.
+    """
+
+    def __init__(self, path, resume=True):
+        """
+        :param str path: the checkpoint file
+        :param bool resume: whether the checkpoints already in the file are read, rather than starting with none
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._checkpoints = {}
+        if resume:
+            try:
+                with open(path) as checkpoint_file:
+                    self._checkpoints = json.load(checkpoint_file)
+            except (IOError, OSError):
+                pass
+
+    def get(self, shard_id):
+        """
+        :param str shard_id: the shard
+        :return: the checkpointed sequence number and sub sequence number of the shard, or None
+        :rtype: tuple or None
+        """
+        with self._lock:
+            checkpoint = self._checkpoints.get(shard_id)
+        if checkpoint is None:
+            return None
+        return checkpoint['sequenceNumber'], checkpoint['subSequenceNumber']
+
+    def set(self, shard_id, sequence_number, sub_sequence_number):
+        """
+        :param str shard_id: the shard
+        :param str sequence_number: the checkpointed sequence number
+        :param int sub_sequence_number: the checkpointed sub sequence number
+        """
+        with self._lock:
+            self._checkpoints[shard_id] = {'sequenceNumber': sequence_number,
+                                           'subSequenceNumber': sub_sequence_number}
+            temporary_path = '{path}.{pid}.tmp'.format(path=self.path, pid=os.getpid())
+            with open(temporary_path, 'w') as checkpoint_file:
+                json.dump(self._checkpoints, checkpoint_file, indent=2, sort_keys=True)
+            os.replace(temporary_path, self.path)
+
+
+class ShardStats(object):
+    """
+    What happened to a shard during an emulation.
+    """
+
+    def __init__(self, shard_id):
+        self.shard_id = shard_id
+        self.leases = 0
+        self.batches = 0
+        self.records = 0
+        self.bytes = 0
+        self.redelivered = 0
+        self.checkpoints = 0
+        self.checkpoint_errors = 0
+        self.seconds = 0.0
+        self.outcome = None
+        self.error = None
+
+    @property
+    def records_per_second(self):
+        return self.records / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def checkpoints_per_second(self):
+        return self.checkpoints / self.seconds if self.seconds > 0 else 0.0
+
+
+class ProcessorConnection(object):
+    """
+    The daemon's end of the pipes to a record processor process.  It's started on creation, and can drive the record
+    processor through any sequence of actions, for tools such as benchmarks that need finer control than a
+    :class:`Scenario`.
+    """
+
+    def __init__(self, command, env=None):
+        """
+        :param list[str] command: the record processor command
+        :param dict or None env: the environment of the record processor, defaults to this process's
+        """
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+                                         universal_newlines=True, bufsize=1)
+
+    def exchange(self, message, on_checkpoint):
+        """
+        Sends an action, answers any checkpoint requests made while it's handled, and waits for its status response.
+
+        :param dict message: the action
+        :param on_checkpoint: called with each checkpoint request, returns the checkpoint response
+        """
+        self.exchange_line(json.dumps(message), message['action'], on_checkpoint)
+
+    def exchange_line(self, line, action, on_checkpoint):
+        """
+        Like :meth:`exchange`, for an action that has already been encoded.
+
+        :param str line: the encoded action
+        :param str action: the name of the action
+        :param on_checkpoint: called with each checkpoint request, returns the checkpoint response
+        """
+        self._process.stdin.write(line + '\n')
+        self._process.stdin.flush()
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                raise EmulatorError('The record processor exited while handling {action} (exit code {code})'.format(
+                    action=action, code=self._process.poll()))
+            line = line.strip()
+            if not line:
+                continue
+            response = json.loads(line)
+            if response.get('action') == 'checkpoint':
+                self._send(on_checkpoint(response))
+            elif response.get('action') == 'status':
+                if response.get('responseFor') != action:
+                    raise EmulatorError('Expected a status for {expected}, received one for {actual}'.format(
+                        expected=action, actual=response.get('responseFor')))
+                return
+            else:
+                raise EmulatorError('Unexpected message from the record processor: {line}'.format(line=line))
+
+    def _send(self, message):
+        self._process.stdin.write(json.dumps(message) + '\n')
+        self._process.stdin.flush()
+
+    def close(self, timeout=10.0):
+        """
+        Closes the record processor's input and waits for it to exit, killing it if it doesn't.
+
+        :return: the exit code
+        :rtype: int
+        """
+        try:
+            self._process.stdin.close()
+        except (IOError, OSError):
+            pass
+        try:
+            return self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            return self._process.wait()
+
+
+class Emulator(object):
+    """
+    Runs a :class:`Scenario` against a record processor command.
+    """
+
+    def __init__(self, command, scenario, checkpoint_path, env=None, resume=False):
+        """
+        :param list[str] command: the record processor command, started once per lease
+        :param Scenario scenario: the scenario to run
+        :param str checkpoint_path: the file checkpoints are persisted to
+        :param dict or None env: the environment of the record processor, defaults to this process's
+        :param bool resume: whether to carry on from the checkpoints already in the file
+        """
+        self.command = command
+        self.scenario = scenario
+        self.store = CheckpointStore(checkpoint_path, resume)
+        self.env = env
+        self.stats = []
+        self._lock = threading.Lock()
+        self._threads = []
+        self._next_shard = 0
+        payload = os.urandom(scenario.payload_size)
+        self._payload = base64.b64encode(payload).decode('ascii')
+
+    def _new_shard_id(self):
+        with self._lock:
+            shard_id = 'shardId-{n:012d}'.format(n=self._next_shard)
+            self._next_shard += 1
+        return shard_id
+
+    def _start_shard(self, shard_id, batches, may_reshard):
+        stats = ShardStats(shard_id)
+        thread = threading.Thread(target=self._run_shard, args=(stats, batches, may_reshard),
+                                  name='kclpy-emulator-{shard}'.format(shard=shard_id))
+        with self._lock:
+            self.stats.append(stats)
+            self._threads.append(thread)
+        thread.start()
+
+    def run(self):
+        """
+        Runs the scenario to completion.
+
+        :return: the stats of every shard, in the order they were started
+        :rtype: list[ShardStats]
+        """
+        for _ in range(self.scenario.shards):
+            self._start_shard(self._new_shard_id(), self.scenario.batches, True)
+        while True:
+            with self._lock:
+                pending = [thread for thread in self._threads if thread.is_alive()]
+            if not pending:
+                return self.stats
+            for thread in pending:
+                thread.join()
+
+    def _record(self, index):
+        return {'action': 'record', 'data': self._payload, 'partitionKey': str(index),
+                'sequenceNumber': str(_FIRST_SEQUENCE_NUMBER + index), 'subSequenceNumber': 0,
+                'approximateArrivalTimestamp': int(time.time() * 1000)}
+
+    def _run_shard(self, stats, batches, may_reshard):
+        started = time.time()
+        try:
+            stats.outcome = self._process_shard(stats, batches, may_reshard)
+        except (EmulatorError, IOError, OSError, ValueError) as e:
+            stats.outcome = 'failed'
+            stats.error = str(e)
+        stats.seconds = time.time() - started
+
+    def _process_shard(self, stats, batches, may_reshard):
+        scenario = self.scenario
+        total_records = batches * scenario.records_per_batch
+        end = total_records
+        ending = None
+        if may_reshard and scenario.reshard_after is not None and scenario.reshard_after < batches:
+            end, ending = scenario.reshard_after * scenario.records_per_batch, 'shardEnded'
+        elif scenario.steal_lease_after is not None and scenario.steal_lease_after < batches:
+            end, ending = scenario.steal_lease_after * scenario.records_per_batch, 'leaseLost'
+
+        if self.store.get(stats.shard_id) == (SHARD_END, None):
+            if ending == 'shardEnded':
+                self._start_children(batches - scenario.reshard_after)
+            return 'ended'
+
+        #
+        # Each shard draws its checkpoint failures from its own generator, so a seeded run doesn't depend on how the
+        # shard threads are scheduled.
+        #
+        failures = random.Random(None if scenario.seed is None else
+                                 '{seed}:{shard}'.format(seed=scenario.seed, shard=stats.shard_id))
+        delivered = self._run_lease(stats, failures, end, ending)
+        if ending == 'leaseLost':
+            delivered = self._run_lease(stats, failures, total_records, None, delivered)
+            ending = None
+        if ending == 'shardEnded':
+            if self.store.get(stats.shard_id) != (SHARD_END, None):
+                raise EmulatorError('{shard} ended without a checkpoint at SHARD_END'.format(shard=stats.shard_id))
+            self._start_children(batches - scenario.reshard_after)
+            return 'ended'
+        return 'completed'
+
+    def _start_children(self, batches):
+        for _ in range(2):
+            self._start_shard(self._new_shard_id(), batches, False)
+
+    def _run_lease(self, stats, failures, end, ending, delivered=0):
+        """
+        Runs one record processor for a shard, from the shard's checkpoint to ``end``.  Checkpoints fail according to
+        the ``failures`` random number generator.
+
+        :return: the number of records delivered to the shard so far
+        """
+        scenario = self.scenario
+        shard_id = stats.shard_id
+        checkpoint = self.store.get(shard_id)
+        if checkpoint is None:
+            position = 0
+            sequence_number, sub_sequence_number = TRIM_HORIZON, None
+        else:
+            sequence_number, sub_sequence_number = checkpoint
+            position = int(sequence_number) - _FIRST_SEQUENCE_NUMBER + 1
+        stats.redelivered += max(delivered - position, 0)
+        state = {'last': None, 'action': None}
+
+        def on_checkpoint(request):
+            if failures.random() < scenario.checkpoint_failure_rate:
+                stats.checkpoint_errors += 1
+                return {'action': 'checkpoint', 'sequenceNumber': None, 'subSequenceNumber': None,
+                        'error': 'ThrottlingException'}
+            requested = request.get('sequenceNumber')
+            requested_sub = request.get('subSequenceNumber')
+            if state['action'] == 'shardEnded' and requested is None:
+                requested, requested_sub = SHARD_END, None
+            elif requested is None:
+                requested, requested_sub = state['last'], 0
+            elif state['last'] is not None and int(requested) > int(state['last']):
+                requested = None
+            if requested is None:
+                stats.checkpoint_errors += 1
+                return {'action': 'checkpoint', 'sequenceNumber': None, 'subSequenceNumber': None,
+                        'error': 'IllegalArgumentException'}
+            self.store.set(shard_id, requested, requested_sub)
+            stats.checkpoints += 1
+            return {'action': 'checkpoint', 'sequenceNumber': requested, 'subSequenceNumber': requested_sub}
+
+        connection = ProcessorConnection(self.command, self.env)
+        stats.leases += 1
+        try:
+            connection.exchange({'action': 'initialize', 'shardId': shard_id, 'sequenceNumber': sequence_number,
+                                 'subSequenceNumber': sub_sequence_number}, on_checkpoint)
+            while position < end:
+                batch_end = min(position + scenario.records_per_batch, end)
+                records = [self._record(index) for index in range(position, batch_end)]
+                state['action'] = 'processRecords'
+                state['last'] = records[-1]['sequenceNumber']
+                behind = (end - batch_end) // scenario.records_per_batch * 1000
+                connection.exchange({'action': 'processRecords', 'records': records, 'millisBehindLatest': behind},
+                                    on_checkpoint)
+                stats.batches += 1
+                stats.records += len(records)
+                stats.bytes += len(records) * scenario.payload_size
+                position = batch_end
+            if ending is not None:
+                state['action'] = ending
+                connection.exchange({'action': ending}, on_checkpoint)
+            elif scenario.shutdown_at_end:
+                state['action'] = 'shutdownRequested'
+                connection.exchange({'action': 'shutdownRequested'}, on_checkpoint)
+        finally:
+            connection.close()
+        return position
+
+
+def render(stats):
+    """
+    Formats the stats of an emulation for display.
+
+    :param list[ShardStats] stats: the stats returned by :meth:`Emulator.run`
+    :rtype: str
+    """
+    lines = ['{shard:<20} {outcome:>9} {leases:>6} {records:>10} {redelivered:>11} {rate:>10} {checkpoints:>11} '
+             '{errors:>7} {checkpoint_rate:>8}'.format(shard='SHARD', outcome='OUTCOME', leases='LEASES',
+                                                       records='RECORDS', redelivered='REDELIVERED',
+                                                       rate='RECORDS/S', checkpoints='CHECKPOINTS',
+                                                       errors='ERRORS', checkpoint_rate='CKPT/S')]
+    for shard in stats:
+        lines.append('{shard:<20} {outcome:>9} {leases:>6} {records:>10} {redelivered:>11} {rate:>10.1f} '
+                     '{checkpoints:>11} {errors:>7} {checkpoint_rate:>8.2f}'.format(
+                         shard=shard.shard_id, outcome=shard.outcome, leases=shard.leases, records=shard.records,
+                         redelivered=shard.redelivered, rate=shard.records_per_second,
+                         checkpoints=shard.checkpoints, errors=shard.checkpoint_errors,
+                         checkpoint_rate=shard.checkpoints_per_second))
+        if shard.error:
+            lines.append('  {error}'.format(error=shard.error))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a record processor command against an emulated '
+                                                 'MultiLangDaemon.')
+    parser.add_argument('-S', '--scenario', dest='scenario', default='steady',
+                        choices=['steady', 'resharding', 'lease-theft', 'throttled-checkpoints'],
+                        help='The scenario to run. Default is steady.')
+    parser.add_argument('--shards', dest='shards', type=int, default=1,
+                        help='The number of shards at the start. Default is 1.')
+    parser.add_argument('--batches', dest='batches', type=int, default=100,
+                        help='The number of batches delivered to each shard. Default is 100.')
+    parser.add_argument('--records', dest='records_per_batch', type=int, default=100,
+                        help='The number of records in each batch. Default is 100.')
+    parser.add_argument('--payload-size', dest='payload_size', type=int, default=1024,
+                        help='The number of bytes in each record. Default is 1024.')
+    parser.add_argument('--checkpoint-failure-rate', dest='checkpoint_failure_rate', type=float, default=None,
+                        help='The fraction of checkpoints that fail with ThrottlingException.')
+    parser.add_argument('--checkpoints', dest='checkpoints', default='kclpy-emulator-checkpoints.json',
+                        help='The file checkpoints are persisted to. Default is kclpy-emulator-checkpoints.json.')
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help='Carry on from the checkpoints already in the checkpoint file, instead of starting '
+                             'with none.')
+    parser.add_argument('--seed', dest='seed', type=int, default=None,
+                        help='Seeds the choice of failed checkpoints.')
+    parser.add_argument('--no-shutdown', dest='shutdown_at_end', action='store_false',
+                        help="Don't send shutdownRequested to shards that reach the end.")
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='The record processor command, after --')
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error('a record processor command is required')
+    scenario = Scenario.named(args.scenario, shards=args.shards, batches=args.batches,
+                              records_per_batch=args.records_per_batch, payload_size=args.payload_size,
+                              shutdown_at_end=args.shutdown_at_end, seed=args.seed)
+    if args.checkpoint_failure_rate is not None:
+        scenario.checkpoint_failure_rate = args.checkpoint_failure_rate
+    stats = Emulator(command, scenario, args.checkpoints, resume=args.resume).run()
+    sys.stdout.write(render(stats) + '\n')
+    return 1 if any(shard.error for shard in stats) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,407 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Caches the values handlers look up for their records, such as customer metadata, for the life of a shard lease::
+
+    from amazon_kclpy import kcl
+    from amazon_kclpy.enrichment import CacheLifecycleProcessor, EnrichmentCache
+    from amazon_kclpy.instrumentation import InstrumentationHook, StatsdSink
+    from amazon_kclpy.v3 import processor
+
+    customers = EnrichmentCache(bulk_loader=lookup_customers, ttl=300, max_bytes=32 * 1024 * 1024)
+
+    class RecordProcessor(processor.RecordProcessorBase):
+
+        def process_records(self, process_records_input):
+            found = customers.get_many([record.partition_key for record in process_records_input.records])
+            ...
+
+    hook = InstrumentationHook(StatsdSink('127.0.0.1', 8125))
+    hook.add_source(customers)
+    kcl.KCLProcess(CacheLifecycleProcessor(RecordProcessor(), [customers]), hooks=[hook]).run()
+
+Entries are evicted least recently used first, once there are more than ``max_entries`` of them or their estimated
+size is over ``max_bytes``, and expire ``ttl`` seconds after they were loaded.  Expired entries are removed when
+they're next looked up, or evicted.  A key the loader finds no value for (it returns None, or the bulk loader leaves it
+out) is cached as missing for ``negative_ttl`` seconds, so unknown keys don't reach the backing service on every
+record.  Only one load of a key runs at a time: threads that miss a key while it's being loaded wait for that load
+instead of starting another.  Loader errors aren't cached, and are raised to every thread waiting for the load.
+
+:class:`CacheLifecycleProcessor` ties caches to a shard lease: they're emptied and warmed up with the ``warmer`` before
+the record processor is initialized, and emptied once it has handled ``lease_lost`` or ``shard_ended``, so nothing
+leaks from one lease to the next.
+
+Hits, misses, loads and evictions are counted, and reported by :meth:`EnrichmentCache.metrics` in the same form as
+:class:`amazon_kclpy.instrumentation.InstrumentationHook`, which includes them in its flushes once the cache is added
+with :meth:`amazon_kclpy.instrumentation.InstrumentationHook.add_source`.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from amazon_kclpy.instrumentation import COUNTER, GAUGE
+from amazon_kclpy.v3 import processor
+
+_MISSING = object()
+_MISSING_SIZE = 64
+_COUNTERS = ('hits', 'misses', 'negative_hits', 'coalesced', 'loads', 'load_errors', 'evictions', 'expirations')
+
+
+def estimate_size(key, value, depth=4):
+    """
+    Estimates the memory held by a cache entry, following containers to a limited depth.
+
+    :param key: the key
+    :param value: the value
+    :param int depth: how many levels of nested containers are followed
+    :return: the estimated number of bytes
+    :rtype: int
+    """
+    return _size(key, depth) + _size(value, depth)
+
+
+def _size(value, depth):
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        for item_key, item in value.items():
+            size += _size(item_key, depth - 1) + _size(item, depth - 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _size(item, depth - 1)
+    return size
+
+
+class _Entry(object):
+
+    __slots__ = ('value', 'expires', 'size')
+
+    def __init__(self, value, expires, size):
+        self.value = value
+        self.expires = expires
+        self.size = size
+
+
+class _Load(object):
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _MISSING
+        self.error = None
+
+
+class EnrichmentCache(object):
+    """
+    An LRU cache with expiry, a byte budget, negative caching and single flight loads.
+    """
+
+    def __init__(self, loader=None, bulk_loader=None, warmer=None, max_entries=100000, max_bytes=64 * 1024 * 1024,
+                 ttl=300.0, negative_ttl=30.0, sizer=estimate_size, name='enrichment', prefix='kclpy.cache',
+                 clock=time.monotonic):
+        """
+        :param loader: called with a key, returns its value or None if it has none
+        :param bulk_loader: called with a list of keys, returns a dictionary of the values found, used instead of
+            ``loader`` when given
+        :param warmer: called with the shard id when a lease starts, returns (key, value) pairs or a dictionary to
+            cache up front
+        :param int max_entries: the most entries kept
+        :param int max_bytes: the most estimated bytes kept
+        :param float ttl: the seconds a value is cached for
+        :param float negative_ttl: the seconds a key without a value is cached as missing for
+        :param sizer: called with a key and value, returns the bytes they hold
+        :param str name: identifies the cache in metric names
+        :param str prefix: the start of every metric name
+        :param clock: returns a monotonic time in seconds
+        """
+        if loader is None and bulk_loader is None:
+            raise ValueError('A loader or bulk_loader is required')
+        self.loader = loader
+        self.bulk_loader = bulk_loader
+        self.warmer = warmer
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.sizer = sizer
+        self.name = name
+        self.prefix = prefix
+        self.clock = clock
+        self.shard_id = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._loads = {}
+        self._generation = 0
+        self._counters = dict((name, 0) for name in _COUNTERS)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes(self):
+        """
+        The estimated bytes held by the cached entries.
+        """
+        return self._bytes
+
+    def _lookup(self, key, now):
+        """
+        Looks a key up, with the lock held.
+
+        :return: the entry, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            del self._entries[key]
+            self._bytes -= entry.size
+            self._counters['expirations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counters['negative_hits' if entry.value is _MISSING else 'hits'] += 1
+        return entry
+
+    def _store(self, key, value, now):
+        """
+        Caches a value, with the lock held, evicting the least recently used entries over the limits.
+        """
+        if value is None:
+            value = _MISSING
+        if value is _MISSING:
+            size = _MISSING_SIZE
+            expires = now + self.negative_ttl
+        else:
+            size = self.sizer(key, value)
+            expires = now + self.ttl
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        if size > self.max_bytes:
+            return
+        self._entries[key] = _Entry(value, expires, size)
+        self._bytes += size
+        entries = self._entries
+        while len(entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._counters['evictions'] += 1
+
+    def _load(self, loads):
+        """
+        Loads keys this thread claimed, caches the results and wakes the threads waiting for them.
+
+        :param dict loads: the :class:`_Load` of each key
+        """
+        keys = list(loads)
+        generation = self._generation
+        try:
+            if self.bulk_loader is not None:
+                found = self.bulk_loader(keys)
+                for key in keys:
+                    loads[key].value = found.get(key, _MISSING)
+            else:
+                for key in keys:
+                    loads[key].value = self.loader(key)
+        except Exception as e:
+            for load in loads.values():
+                load.error = e
+        with self._lock:
+            now = self.clock()
+            failed = 0
+            for key, load in loads.items():
+                if self._loads.get(key) is load:
+                    del self._loads[key]
+                if load.error is not None:
+                    failed += 1
+                elif generation == self._generation:
+                    self._store(key, load.value, now)
+            self._counters['loads'] += len(loads) - failed
+            self._counters['load_errors'] += failed
+        for load in loads.values():
+            load.done.set()
+
+    def _claim(self, key, claimed, waiting):
+        """
+        With the lock held, claims the load of a missed key, or joins the load already running.
+        """
+        self._counters['misses'] += 1
+        load = self._loads.get(key)
+        if load is None:
+            claimed[key] = self._loads[key] = _Load()
+        else:
+            self._counters['coalesced'] += 1
+            waiting[key] = load
+
+    def get(self, key, default=None):
+        """
+        :param key: the key
+        :param default: returned if the key has no value
+        :return: the key's value, loading it on a miss
+        :raises Exception: the loader's error, if loading the key failed
+        """
+        claimed = {}
+        waiting = {}
+        with self._lock:
+            entry = self._lookup(key, self.clock())
+            if entry is not None:
+                return default if entry.value is _MISSING else entry.value
+            self._claim(key, claimed, waiting)
+        if claimed:
+            self._load(claimed)
+        load = claimed.get(key) or waiting[key]
+        load.done.wait()
+        if load.error is not None:
+            raise load.error
+        return default if load.value is _MISSING or load.value is None else load.value
+
+    def get_many(self, keys):
+        """
+        Looks up a batch of keys, loading every missed key with one call to the bulk loader if there is one.
+
+        :param keys: the keys, which may repeat
+        :return: the values of the keys that have one
+        :rtype: dict
+        :raises Exception: the loader's error, if loading any of the keys failed
+        """
+        found = {}
+        claimed = {}
+        waiting = {}
+        with self._lock:
+            now = self.clock()
+            for key in dict.fromkeys(keys):
+                entry = self._lookup(key, now)
+                if entry is None:
+                    self._claim(key, claimed, waiting)
+                elif entry.value is not _MISSING:
+                    found[key] = entry.value
+        if claimed:
+            self._load(claimed)
+        for loads in (claimed, waiting):
+            for key, load in loads.items():
+                load.done.wait()
+                if load.error is not None:
+                    raise load.error
+                if load.value is not _MISSING and load.value is not None:
+                    found[key] = load.value
+        return found
+
+    def put(self, key, value):
+        """
+        Caches a value, or marks a key as missing if the value is None.
+        """
+        with self._lock:
+            self._store(key, value, self.clock())
+
+    def invalidate(self, key):
+        """
+        Removes a key from the cache.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def clear(self):
+        """
+        Removes every entry.  Loads running at the time don't cache their results.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+
+    def warm(self, shard_id):
+        """
+        Empties the cache for a new lease, and fills it with the warmer's entries.
+
+        :param str shard_id: the shard the lease is for
+        """
+        self.clear()
+        self.shard_id = shard_id
+        if self.warmer is None:
+            return
+        items = self.warmer(shard_id)
+        if hasattr(items, 'items'):
+            items = items.items()
+        with self._lock:
+            now = self.clock()
+            for key, value in items:
+                self._store(key, value, now)
+
+    def metrics(self, reset=False):
+        """
+        Summarizes the lookups since the metrics were last reset.
+
+        :param bool reset: whether to also start a new metrics interval, in the same step so no lookups are missed
+        :return: tuples of (name, value, kind)
+        :rtype: list[tuple]
+        """
+        name = '{p}.{n}'.format(p=self.prefix, n=self.name)
+        with self._lock:
+            counters = self._counters
+            if reset:
+                self._counters = dict((counter, 0) for counter in _COUNTERS)
+            else:
+                counters = dict(counters)
+            entries = len(self._entries)
+            size = self._bytes
+        metrics = [('{n}.{c}'.format(n=name, c=counter), counters[counter], COUNTER) for counter in _COUNTERS]
+        lookups = counters['hits'] + counters['negative_hits'] + counters['misses']
+        if lookups:
+            metrics.append((name + '.hit_ratio',
+                            round((counters['hits'] + counters['negative_hits']) / float(lookups), 4), GAUGE))
+        metrics.append((name + '.entries', entries, GAUGE))
+        metrics.append((name + '.bytes', size, GAUGE))
+        return metrics
+
+
+class CacheLifecycleProcessor(processor.RecordProcessorBase):
+    """
+    Ties caches to the lease of the record processor it wraps.
+    """
+
+    def __init__(self, delegate, caches):
+        """
+        :param amazon_kclpy.v3.processor.RecordProcessorBase delegate: the record processor
+        :param list[EnrichmentCache] caches: the caches whose lifecycle follows the lease
+        """
+        self.delegate = delegate
+        self.caches = list(caches)
+
+    def _clear(self):
+        for cache in self.caches:
+            cache.clear()
+
+    def initialize(self, initialize_input):
+        for cache in self.caches:
+            cache.warm(initialize_input.shard_id)
+        self.delegate.initialize(initialize_input)
+
+    def process_records(self, process_records_input):
+        self.delegate.process_records(process_records_input)
+
+    def lease_lost(self, lease_lost_input):
+        try:
+            self.delegate.lease_lost(lease_lost_input)
+        finally:
+            self._clear()
+
+    def shard_ended(self, shard_ended_input):
+        try:
+            self.delegate.shard_ended(shard_ended_input)
+        finally:
+            self._clear()
+
+    def shutdown_requested(self, shutdown_requested_input):
+        self.delegate.shutdown_requested(shutdown_requested_input)
+
+    def handoff_state(self):
+        return self.delegate.handoff_state()
+
+    def resume(self, initialize_input, state):
+        self.delegate.resume(initialize_input, state)
@@ -0,0 +1,135 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Reports exceptions raised by record processors without flooding the error file.
+
+When a downstream outage makes every dispatch fail, printing every stack trace produces more output than the
+MultiLangDaemon can comfortably forward.  :class:`ErrorReporter` fingerprints each exception by its type and the frame
+that raised it.  The first occurrence of a fingerprint is printed in full; repeats within the following ``window``
+seconds are only counted, and a one line summary is printed when the window ends.  A fingerprint that keeps recurring
+stays summarized until a whole window passes without it.  On top of that, the total error output is capped at
+``max_bytes_per_minute``; reports that don't fit are dropped, and the number dropped is included in the next report
+that does.
+"""
+import time
+
+_SUMMARY = ("Suppressed {count} repeats of {type} raised at {file}:{line} in {function} during the last {window:g} "
+            "seconds, most recently: {message}\n")
+_DROPPED = "{count} error reports were dropped because error output exceeded {limit} bytes per minute\n"
+
+
+def _fingerprint(context, error):
+    tb = error.__traceback__
+    while tb is not None and tb.tb_next is not None:
+        tb = tb.tb_next
+    if tb is None:
+        return context, type(error).__name__, None, None, None
+    code = tb.tb_frame.f_code
+    return context, type(error).__name__, code.co_filename, tb.tb_lineno, code.co_name
+
+
+class _Repeats(object):
+
+    def __init__(self, window_ends):
+        self.window_ends = window_ends
+        self.count = 0
+        self.message = None
+
+
+class ErrorReporter(object):
+    """
+    Writes exceptions to an error file, collapsing repeats and limiting the bytes written.
+    """
+
+    def __init__(self, error_file, window=60.0, max_bytes_per_minute=256 * 1024, clock=time.time):
+        """
+        :param file error_file: where reports are written
+        :param float window: the number of seconds that repeats of an exception are counted before being summarized
+        :param int max_bytes_per_minute: the most error output allowed in any minute
+        :param clock: returns the current time in seconds
+        """
+        self.error_file = error_file
+        self.window = window
+        self.max_bytes_per_minute = max_bytes_per_minute
+        self.clock = clock
+        self.dropped = 0
+        self._repeats = {}
+        self._next_summary = None
+        self._budget = float(max_bytes_per_minute)
+        self._budget_updated = clock()
+
+    def report(self, context, error):
+        """
+        Reports an exception, in full if it's the first of its kind in the current window.  Must be called while the
+        exception is being handled so its traceback is available.
+
+        :param str context: a description of what failed, e.g. ``Caught exception from action dispatch``
+        :param Exception error: the exception
+        """
+        now = self.clock()
+        self.poll(now)
+        fingerprint = _fingerprint(context, error)
+        repeats = self._repeats.get(fingerprint)
+        if repeats is not None:
+            repeats.count += 1
+            repeats.message = str(error)
+            return
+        self._repeats[fingerprint] = _Repeats(now + self.window)
+        if self._next_summary is None:
+            self._next_summary = now + self.window
+        import traceback
+        self._write('{context}: {ex}\n{tb}'.format(
+            context=context, ex=str(error),
+            tb=''.join(traceback.format_exception(type(error), error, error.__traceback__))), now)
+
+    def poll(self, now=None):
+        """
+        Writes summaries for every window that has ended.  This is cheap when there is nothing to summarize, so it can
+        be called after every dispatch.
+
+        :param float or None now: the current time, defaults to the clock
+        """
+        if self._next_summary is None:
+            return
+        now = self.clock() if now is None else now
+        if now < self._next_summary:
+            return
+        for fingerprint, repeats in list(self._repeats.items()):
+            if repeats.window_ends > now:
+                continue
+            if repeats.count == 0:
+                del self._repeats[fingerprint]
+                continue
+            context, type_name, file_name, line, function = fingerprint
+            self._write(_SUMMARY.format(count=repeats.count, type=type_name, file=file_name, line=line,
+                                        function=function, window=self.window, message=repeats.message), now)
+            repeats.count = 0
+            repeats.window_ends = now + self.window
+        if self._repeats:
+            self._next_summary = min(repeats.window_ends for repeats in self._repeats.values())
+        else:
+            self._next_summary = None
+
+    def _write(self, text, now):
+        self._budget = min(float(self.max_bytes_per_minute),
+                           self._budget + (now - self._budget_updated) * self.max_bytes_per_minute / 60.0)
+        self._budget_updated = now
+        if self.dropped:
+            text = _DROPPED.format(count=self.dropped, limit=self.max_bytes_per_minute) + text
+        if len(text) > self._budget:
+            self.dropped += 1
+            return
+        self._budget -= len(text)
+        self.dropped = 0
+        self.error_file.write(text)
+        self.error_file.flush()
+
+    def close(self):
+        """
+        Writes any outstanding summaries, regardless of whether their windows have ended.
+        """
+        for repeats in self._repeats.values():
+            repeats.window_ends = 0
+        if self._repeats:
+            self._next_summary = 0
+        self.poll()
@@ -0,0 +1,119 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+A fixed memory histogram of non-negative integer values with bounded relative error, in the style of
+`HdrHistogram <http://hdrhistogram.org/>`_.
+
+Values below ``2 ** precision_bits`` get a bucket each.  Above that, every power of two range is split into
+``2 ** (precision_bits - 1)`` linear buckets, so the width of a bucket is never more than ``2 ** -(precision_bits - 1)``
+of the values it holds.  Values above ``highest_value`` are clamped to it.
+"""
+import math
+
+
+class Histogram(object):
+    """
+    Counts of values grouped into log-linear buckets.
+    """
+
+    def __init__(self, highest_value=2 ** 36, precision_bits=7):
+        """
+        :param int highest_value: the largest value that can be told apart from larger ones
+        :param int precision_bits: the number of bits of each value that are kept. The default of 7 keeps the
+            relative error of reported values under 1.6%.
+        """
+        self.highest_value = highest_value
+        self.precision_bits = precision_bits
+        self._sub_bucket_count = 1 << precision_bits
+        self._half_count = self._sub_bucket_count >> 1
+        self._counts = [0] * (self._index(highest_value) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return shift * self._half_count + (value >> shift)
+
+    def _bucket_bounds(self, index):
+        if index < self._sub_bucket_count:
+            return index, index
+        shift = index // self._half_count - 1
+        mantissa = index - shift * self._half_count
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        """
+        Records a value.
+
+        :param int value: the value to record, negative values are recorded as 0
+        :param int count: the number of times the value occurred
+        """
+        value = min(max(int(value), 0), self.highest_value)
+        self._counts[self._index(value)] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Adds the values recorded by another histogram with the same configuration to this one.
+
+        :param Histogram other: the histogram to merge into this one
+        :raises ValueError: if the histograms have different bucket layouts
+        """
+        if other.highest_value != self.highest_value or other.precision_bits != self.precision_bits:
+            raise ValueError("Only histograms with the same highest_value and precision_bits can be merged")
+        if other.count == 0:
+            return
+        self._counts = [mine + theirs for mine, theirs in zip(self._counts, other._counts)]
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, percentile):
+        """
+        Finds the value at a percentile.  The result is the midpoint of the bucket holding that value, limited to the
+        smallest and largest values recorded, or the largest value recorded if it's in the same bucket.
+
+        :param float percentile: the percentile, between 0 and 100
+        :return: the value, or None if nothing has been recorded
+        :rtype: int or None
+        """
+        if self.count == 0:
+            return None
+        target = max(1, int(math.ceil(self.count * percentile / 100.0)))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= target:
+                if seen == self.count:
+                    return self.max
+                lower, upper = self._bucket_bounds(index)
+                return min(max((lower + upper) // 2, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        """
+        :return: the mean of the recorded values, or None if nothing has been recorded
+        :rtype: float or None
+        """
+        return float(self.total) / self.count if self.count else None
+
+    def reset(self):
+        """
+        Clears all recorded values.
+        """
+        self._counts = [0] * len(self._counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
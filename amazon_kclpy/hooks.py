@@ -0,0 +1,84 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+from collections import namedtuple
+
+ActionTimings = namedtuple('ActionTimings', ['read', 'decode', 'dispatch', 'write'])
+ActionTimings.__doc__ = """
+The number of seconds spent in each phase of handling an action: reading the line from the MultiLangDaemon (which
+includes waiting for it), decoding the JSON, dispatching to the record processor (which includes any checkpoints), and
+writing the status response.
+"""
+
+
+def payload_size(records):
+    """
+    Computes the total decoded size of the records' data without decoding it.
+
+    :param list[amazon_kclpy.messages.Record] records: the records to measure
+    :return: the number of bytes
+    :rtype: int
+    """
+    size = 0
+    for record in records:
+        data = record.data
+        size += len(data) * 3 // 4 - data.endswith('=') - data.endswith('==')
+    return size
+
+
+class ProcessHook(object):
+    """
+    Base class for observers that can be attached to a :class:`amazon_kclpy.kcl.KCLProcess`.  Hooks are notified as
+    actions are dispatched to the record processor, and as checkpoints complete.  All methods are no-ops by default so
+    implementations only need to override the notifications they care about.
+
+    Hooks are called synchronously on the thread that is processing the shard, so they should be cheap and must not
+    raise.
+    """
+
+    def action_started(self, action):
+        """
+        Called before an action is dispatched to the record processor.
+
+        :param amazon_kclpy.messages.MessageDispatcher action: the action that is about to be dispatched
+        """
+        pass
+
+    def action_finished(self, action, error):
+        """
+        Called once the record processor has returned from an action.
+
+        :param amazon_kclpy.messages.MessageDispatcher action: the action that was dispatched
+        :param Exception or None error: the exception raised by the record processor, or None if it succeeded
+        """
+        pass
+
+    def action_timed(self, action, timings):
+        """
+        Called once the status response for an action has been written.
+
+        :param amazon_kclpy.messages.MessageDispatcher action: the action that was handled
+        :param ActionTimings timings: how long each phase of handling the action took
+        """
+        pass
+
+    def checkpoint_started(self):
+        """
+        Called before a checkpoint request is sent to the MultiLangDaemon.
+        """
+        pass
+
+    def checkpoint_finished(self, elapsed, error):
+        """
+        Called once the MultiLangDaemon has responded to a checkpoint request.
+
+        :param float elapsed: the number of seconds the checkpoint round trip took
+        :param amazon_kclpy.checkpoint_error.CheckpointError or None error: the error reported by the
+            MultiLangDaemon, or None if the checkpoint succeeded
+        """
+        pass
+
+    def close(self):
+        """
+        Called when the :class:`amazon_kclpy.kcl.KCLProcess` has finished reading input and is about to exit.
+        """
+        pass
@@ -0,0 +1,226 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Times where a :class:`amazon_kclpy.kcl.KCLProcess` spends its time, per action type::
+
+    from amazon_kclpy import kcl
+    from amazon_kclpy.instrumentation import InstrumentationHook, StatsdSink
+
+    hook = InstrumentationHook(StatsdSink('127.0.0.1', 8125))
+    kcl.KCLProcess(RecordProcessor(), hooks=[hook]).run()
+
+The phases timed are reading the line (including waiting for the MultiLangDaemon), decoding the JSON, dispatching to
+the record processor, each checkpoint round trip made during the dispatch, and writing the status response.  Timings
+are aggregated into :class:`amazon_kclpy.histogram.Histogram` objects, in microseconds, and flushed to a sink every
+``flush_interval`` seconds.  Records and bytes delivered to ``processRecords`` are counted.
+
+Other components can add their own metrics to every flush with :meth:`InstrumentationHook.add_source`, such as the
+hit and miss counters of an :class:`amazon_kclpy.enrichment.EnrichmentCache`.
+
+A :class:`amazon_kclpy.kcl.KCLProcess` without hooks doesn't time anything, so instrumentation costs nothing unless
+it's enabled.
+"""
+import socket
+import time
+
+from amazon_kclpy.histogram import Histogram
+from amazon_kclpy.hooks import ProcessHook, payload_size
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+
+_PHASES = ('read', 'decode', 'dispatch', 'write')
+_PERCENTILES = (50, 90, 99)
+
+
+class MetricSink(object):
+    """
+    Receives the metrics produced by an :class:`InstrumentationHook` each time it flushes.
+    """
+
+    def emit(self, timestamp, metrics):
+        """
+        :param float timestamp: the time of the flush, in seconds since the epoch
+        :param list[tuple] metrics: tuples of (name, value, kind) where kind is either :data:`COUNTER` or
+            :data:`GAUGE`
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class StatsdSink(MetricSink):
+    """
+    Sends metrics to a StatsD compatible agent over UDP.  Counters are sent as counts and everything else as gauges,
+    packing as many metrics into each datagram as fit.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, max_datagram_size=1432):
+        """
+        :param str host: the host of the StatsD agent
+        :param int port: the port of the StatsD agent
+        :param int max_datagram_size: the largest datagram to send
+        """
+        self.address = (host, port)
+        self.max_datagram_size = max_datagram_size
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, timestamp, metrics):
+        datagram = b''
+        for name, value, kind in metrics:
+            line = '{name}:{value}|{type}'.format(name=name, value=value,
+                                                  type='c' if kind == COUNTER else 'g').encode('utf-8')
+            if datagram and len(datagram) + len(line) + 1 > self.max_datagram_size:
+                self._send(datagram)
+                datagram = b''
+            datagram = datagram + b'\n' + line if datagram else line
+        if datagram:
+            self._send(datagram)
+
+    def _send(self, datagram):
+        try:
+            self._socket.sendto(datagram, self.address)
+        except (IOError, OSError):
+            #
+            # Metrics are best effort, a missing agent mustn't stop record processing.
+            #
+            pass
+
+    def close(self):
+        self._socket.close()
+
+
+class FileSink(MetricSink):
+    """
+    Appends metrics to a text file, one ``<timestamp> <name> <value>`` line per metric.
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: the file to append to
+        """
+        self._file = open(path, 'a')
+
+    def emit(self, timestamp, metrics):
+        for name, value, kind in metrics:
+            self._file.write('{timestamp:.3f} {name} {value}\n'.format(timestamp=timestamp, name=name, value=value))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class InstrumentationHook(ProcessHook):
+    """
+    Aggregates per action phase timings and record counts, and periodically flushes them to a :class:`MetricSink`.
+    """
+
+    def __init__(self, sink, flush_interval=10.0, prefix='kclpy'):
+        """
+        :param MetricSink sink: where metrics are flushed to
+        :param float flush_interval: the number of seconds between flushes
+        :param str prefix: prepended to every metric name
+        """
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._current_action = None
+        self._sources = []
+        self._next_flush = time.time() + flush_interval
+
+    def add_source(self, source):
+        """
+        Adds another component's metrics to every flush.
+
+        :param source: has a ``metrics(reset=False)`` method returning (name, value, kind) tuples, which with
+            ``reset=True`` also starts a new interval, in one step so nothing counted in between is lost
+        """
+        self._sources.append(source)
+
+    def _histogram(self, action, phase):
+        key = (action, phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        return histogram
+
+    def _count(self, action, name, value):
+        key = (action, name)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def action_started(self, action):
+        self._current_action = action.action
+        if action.action == 'processRecords':
+            records = action.records
+            self._count(action.action, 'records', len(records))
+            self._count(action.action, 'bytes', payload_size(records))
+
+    def action_finished(self, action, error):
+        if error is not None:
+            self._count(action.action, 'errors', 1)
+
+    def checkpoint_finished(self, elapsed, error):
+        self._histogram(self._current_action, 'checkpoint').record(elapsed * 1e6)
+        if error is not None:
+            self._count(self._current_action, 'checkpoint_errors', 1)
+
+    def action_timed(self, action, timings):
+        name = action.action
+        self._count(name, 'count', 1)
+        for phase, elapsed in zip(_PHASES, timings):
+            self._histogram(name, phase).record(elapsed * 1e6)
+        self._current_action = None
+        now = time.time()
+        if now >= self._next_flush:
+            self._next_flush = now + self.flush_interval
+            self.flush(now)
+
+    def metrics(self):
+        """
+        Summarizes everything recorded since the last flush.  Timings are reported in milliseconds.
+
+        :return: tuples of (name, value, kind)
+        :rtype: list[tuple]
+        """
+        metrics = self._own_metrics()
+        for source in self._sources:
+            metrics.extend(source.metrics())
+        return metrics
+
+    def _own_metrics(self):
+        metrics = []
+        for (action, name), value in sorted(self._counters.items(), key=lambda item: str(item[0])):
+            metrics.append(('{p}.{a}.{n}'.format(p=self.prefix, a=action, n=name), value, COUNTER))
+        for (action, phase), histogram in sorted(self._histograms.items(), key=lambda item: str(item[0])):
+            if histogram.count == 0:
+                continue
+            name = '{p}.{a}.{ph}'.format(p=self.prefix, a=action, ph=phase)
+            metrics.append((name + '.count', histogram.count, COUNTER))
+            metrics.append((name + '.mean', round(histogram.mean / 1000.0, 3), GAUGE))
+            for percentile in _PERCENTILES:
+                metrics.append(('{n}.p{p}'.format(n=name, p=percentile),
+                                round(histogram.percentile(percentile) / 1000.0, 3), GAUGE))
+            metrics.append((name + '.max', round(histogram.max / 1000.0, 3), GAUGE))
+        return metrics
+
+    def flush(self, now=None):
+        """
+        Sends everything recorded since the last flush to the sink, and starts a new interval.
+
+        :param float or None now: the time of the flush, defaults to the current time
+        """
+        metrics = self._own_metrics()
+        for histogram in self._histograms.values():
+            histogram.reset()
+        self._counters = {}
+        for source in self._sources:
+            metrics.extend(source.metrics(reset=True))
+        if metrics:
+            self.sink.emit(now if now is not None else time.time(), metrics)
+
+    def close(self):
+        self.flush()
+        self.sink.close()
@@ -2,13 +2,18 @@
 # SPDX-License-Identifier: Apache-2.0
 import abc
 import json
+import os
 import sys
-import traceback
+import time
 
+#
+# Only the modules needed to speak the protocol are imported here.  The MultiLangDaemon starts a new process for
+# every shard, so anything else (the v1/v2 adapters, traceback) is imported when it's first needed to keep start up,
+# and with it failover recovery, fast.
+#
 from amazon_kclpy import dispatch
-from amazon_kclpy.v2 import processor as v2processor
-from amazon_kclpy.v3 import processor as v3processor
 from amazon_kclpy import messages
+from amazon_kclpy.hooks import ActionTimings
 from amazon_kclpy.checkpoint_error import CheckpointError
 
 
@@ -18,15 +23,18 @@ class _IOHandler(object):
     files.
     """
 
-    def __init__(self, input_file, output_file, error_file):
+    def __init__(self, input_file, output_file, error_file, capture=None):
         """
         :param file input_file: A file to read input lines from (e.g. sys.stdin).
         :param file output_file: A file to write output lines to (e.g. sys.stdout).
         :param file error_file: A file to write error lines to (e.g. sys.stderr).
+        :param amazon_kclpy.capture.ProtocolCapture or None capture: If provided, every line read and written is
+            also recorded to the capture.
         """
         self.input_file = input_file
         self.output_file = output_file
         self.error_file = error_file
+        self.capture = capture
 
     def write_line(self, line):
         """
@@ -38,6 +46,8 @@ class _IOHandler(object):
         """
         self.output_file.write('\n{line}\n'.format(line=line))
         self.output_file.flush()
+        if self.capture is not None:
+            self.capture.outbound(line)
 
     def write_error(self, error_message):
         """
@@ -55,7 +65,10 @@ class _IOHandler(object):
         :rtype: str
         :return: A single line read from the input_file (e.g. '{"action" : "initialize", "shardId" : "shardId-000001"}')
         """
-        return self.input_file.readline()
+        line = self.input_file.readline()
+        if self.capture is not None and line:
+            self.capture.inbound(line)
+        return line
 
     def load_action(self, line):
         """
@@ -89,13 +102,17 @@ class Checkpointer(object):
     processor will be started either by this MultiLangDaemon or a different instance and resume at the most recent
     checkpoint in this shard.
     """
-    def __init__(self, io_handler):
+    def __init__(self, io_handler, hooks=None):
         """
         :type io_handler: amazon_kclpy.kcl._IOHandler
         :param io_handler: An IOHandler object which this checkpointer will use to write and read checkpoint actions
             to and from the MultiLangDaemon.
+
+        :param list[amazon_kclpy.hooks.ProcessHook] or None hooks: hooks that will be told how long each checkpoint
+            round trip took.
         """
         self.io_handler = io_handler
+        self.hooks = hooks or []
 
     def _get_action(self):
         """
@@ -118,6 +135,24 @@ class Checkpointer(object):
         :param int or None sub_sequence_number: the sub sequence to checkpoint at, if set to None will checkpoint
             at the farthest sub_sequence_number
         """
+        if not self.hooks:
+            self._checkpoint(sequence_number, sub_sequence_number)
+            return
+        for hook in self.hooks:
+            hook.checkpoint_started()
+        started = time.perf_counter()
+        error = None
+        try:
+            self._checkpoint(sequence_number, sub_sequence_number)
+        except CheckpointError as checkpoint_error:
+            error = checkpoint_error
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            for hook in self.hooks:
+                hook.checkpoint_finished(elapsed, error)
+
+    def _checkpoint(self, sequence_number, sub_sequence_number):
         response = {"action": "checkpoint", "sequenceNumber": sequence_number, "subSequenceNumber": sub_sequence_number}
         self.io_handler.write_action(response)
         action = self._get_action()
@@ -207,7 +242,8 @@ class RecordProcessorBase(object):
 
 class KCLProcess(object):
 
-    def __init__(self, record_processor, input_file=sys.stdin, output_file=sys.stdout, error_file=sys.stderr):
+    def __init__(self, record_processor, input_file=sys.stdin, output_file=sys.stdout, error_file=sys.stderr,
+                 hooks=None, reloader=None, profile=None, error_reporter=None, capture=None):
         """
         :type record_processor: RecordProcessorBase or amazon_kclpy.v2.processor.RecordProcessorBase
         :param record_processor: A record processor to use for processing a shard.
@@ -217,15 +253,89 @@ class KCLProcess(object):
         :param file output_file: A file to write action messages to. Typically STDOUT.
 
         :param file error_file: A file to write error messages to. Typically STDERR.
+
+        :param list[amazon_kclpy.hooks.ProcessHook] or None hooks: hooks that will be notified as actions are
+            dispatched and checkpoints complete.
+
+        :param amazon_kclpy.reload.ModuleReloader or None reloader: if provided, checked between dispatches for a
+            new version of the record processor to swap in.
+
+        :param bool or None profile: whether to run the sampling profiler (see :mod:`amazon_kclpy.profiler`). If None
+            the profiler runs when the KCLPY_PROFILE environment variable is set to anything but 0, false, no or
+            off.
+
+        :param amazon_kclpy.error_reporter.ErrorReporter or None error_reporter: reports exceptions raised by the
+            record processor. Defaults to an ErrorReporter writing to the error file, created when first needed.
+
+        :param str or None capture: a file to record the message stream to, for later replay (see
+            :mod:`amazon_kclpy.capture`). If None the KCLPY_CAPTURE_FILE environment variable is used, if set, and an
+            empty string disables capturing.
+        """
+        if capture is None:
+            capture = os.environ.get('KCLPY_CAPTURE_FILE')
+        if capture:
+            from amazon_kclpy.capture import ProtocolCapture
+            capture = ProtocolCapture(capture)
+        self.io_handler = _IOHandler(input_file, output_file, error_file, capture or None)
+        self.hooks = list(hooks or [])
+        if profile is None:
+            profile = os.environ.get('KCLPY_PROFILE', '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+        if profile:
+            from amazon_kclpy.profiler import SamplingProfilerHook
+            profiler = SamplingProfilerHook.from_environment()
+            if profiler is not None:
+                self.hooks.append(profiler)
+        self.checkpointer = Checkpointer(self.io_handler, self.hooks)
+        self.reloader = reloader
+        self.error_reporter = error_reporter
+        self.record_processor = record_processor
+        self.processor = self._adapt_processor(record_processor)
+        self._initialize_input = None
+
+    @staticmethod
+    def _adapt_processor(record_processor):
+        """
+        Wraps older record processors in the adapters that translate v3 calls into the calls they expect.
+
+        :param record_processor: the record processor provided by the application
+        :return: a processor implementing the v3 interface
+        :rtype: amazon_kclpy.v3.processor.RecordProcessorBase
         """
-        self.io_handler = _IOHandler(input_file, output_file, error_file)
-        self.checkpointer = Checkpointer(self.io_handler)
         if record_processor.version == 2:
-            self.processor = v3processor.V2toV3Processor(record_processor)
+            from amazon_kclpy.v3 import processor as v3processor
+            return v3processor.V2toV3Processor(record_processor)
         elif record_processor.version == 1:
-            self.processor = v3processor.V2toV3Processor(v2processor.V1toV2Processor(record_processor))
-        else:
-            self.processor = record_processor
+            from amazon_kclpy.v2 import processor as v2processor
+            from amazon_kclpy.v3 import processor as v3processor
+            return v3processor.V2toV3Processor(v2processor.V1toV2Processor(record_processor))
+        return record_processor
+
+    def _reload_processor(self):
+        """
+        Swaps in a new record processor if the reloader has one.  If the shard has already been initialized the new
+        processor takes over the in memory state of the old one, otherwise it will receive the initialize action
+        as normal.  If the new code fails to load the current record processor is kept.
+        """
+        try:
+            record_processor = self.reloader.poll()
+            if record_processor is None:
+                return
+            processor = self._adapt_processor(record_processor)
+            if self._initialize_input is not None:
+                handoff_state = getattr(self.record_processor, 'handoff_state', None)
+                state = handoff_state() if handoff_state is not None else None
+                if hasattr(record_processor, 'resume'):
+                    record_processor.resume(self._initialize_input, state)
+                else:
+                    processor.initialize(self._initialize_input)
+        except SystemExit as sys_exit:
+            raise sys_exit
+        except Exception as ex:
+            self._report_error("Caught exception while reloading the record processor, continuing with the current "
+                               "one", ex)
+            return
+        self.record_processor = record_processor
+        self.processor = processor
 
     def _perform_action(self, action):
         """
@@ -237,7 +347,12 @@ class KCLProcess(object):
         :raises MalformedAction: Raised if the action is missing attributes.
         """
 
+        started = 0
+        error = None
         try:
+            for hook in self.hooks:
+                hook.action_started(action)
+                started += 1
             action.dispatch(self.checkpointer, self.processor)
         except SystemExit as sys_exit:
             # On a system exit exception just go ahead and exit
@@ -246,11 +361,28 @@ class KCLProcess(object):
             """
             We don't know what the client's code could raise and we have no way to recover if we let it propagate
             up further. We will mimic the KCL and pass over client errors. We print their stack trace to STDERR to
-            help them notice and debug this type of issue.
+            help them notice and debug this type of issue, summarizing repeats so a persistent failure doesn't flood
+            STDERR.
             """
-            self.io_handler.error_file.write("Caught exception from action dispatch: {ex}".format(ex=str(ex)))
-            traceback.print_exc(file=self.io_handler.error_file)
-            self.io_handler.error_file.flush()
+            error = ex
+            self._report_error("Caught exception from action dispatch", ex)
+        if self.error_reporter is not None:
+            self.error_reporter.poll()
+        for hook in self.hooks[:started]:
+            hook.action_finished(action, error)
+
+    def _report_error(self, context, error):
+        """
+        Reports an exception through the error reporter, creating the default reporter if there isn't one.  Repeats of
+        the same failure are summarized rather than printed in full, see :mod:`amazon_kclpy.error_reporter`.
+
+        :param str context: a description of what failed
+        :param Exception error: the exception being handled
+        """
+        if self.error_reporter is None:
+            from amazon_kclpy.error_reporter import ErrorReporter
+            self.error_reporter = ErrorReporter(self.io_handler.error_file)
+        self.error_reporter.report(context, error)
 
     def _report_done(self, response_for=None):
         """
@@ -260,6 +392,21 @@ class KCLProcess(object):
         """
         self.io_handler.write_action({"action": "status", "responseFor": response_for})
 
+    def _load_action(self, line):
+        """
+        Decodes an action, swapping in a reloaded record processor first if one is available.
+
+        :param str line: the line read from the MultiLangDaemon
+        :rtype: amazon_kclpy.messages.MessageDispatcher
+        :return: the decoded action
+        """
+        action = self.io_handler.load_action(line)
+        if self.reloader is not None:
+            self._reload_processor()
+            if action.action == 'initialize':
+                self._initialize_input = action
+        return action
+
     def _handle_a_line(self, line):
         """
         - Parses the line from JSON
@@ -270,10 +417,30 @@ class KCLProcess(object):
         :param line: A line that has been read from STDIN and is expected to be a JSON encoded dictionary
             representing what action to take.
         """
-        action = self.io_handler.load_action(line)
+        action = self._load_action(line)
         self._perform_action(action)
         self._report_done(action.action)
 
+    def _handle_a_timed_line(self, line, read_started):
+        """
+        Handles a line in the same way as :meth:`_handle_a_line`, timing each phase and reporting the timings to the
+        hooks.
+
+        :param str line: A line that has been read from STDIN
+        :param float read_started: the :func:`time.perf_counter` value from before the line was read
+        """
+        decode_started = time.perf_counter()
+        action = self._load_action(line)
+        dispatch_started = time.perf_counter()
+        self._perform_action(action)
+        write_started = time.perf_counter()
+        self._report_done(action.action)
+        finished = time.perf_counter()
+        timings = ActionTimings(decode_started - read_started, dispatch_started - decode_started,
+                                write_started - dispatch_started, finished - write_started)
+        for hook in self.hooks:
+            hook.action_timed(action, timings)
+
     def run(self):
         """
         Starts this KCL processor's main loop.
@@ -285,9 +452,23 @@ class KCLProcess(object):
         occur, e.g. I/O error or json decoding exception (the MultiLangDaemon should never write a non-json string
         to this process).
         """
-        while line:
-            line = self.io_handler.read_line()
-            if line:
-                self._handle_a_line(line)
+        try:
+            while line:
+                if self.hooks:
+                    read_started = time.perf_counter()
+                    line = self.io_handler.read_line()
+                    if line:
+                        self._handle_a_timed_line(line, read_started)
+                else:
+                    line = self.io_handler.read_line()
+                    if line:
+                        self._handle_a_line(line)
+        finally:
+            if self.io_handler.capture is not None:
+                self.io_handler.capture.close()
+            if self.error_reporter is not None:
+                self.error_reporter.close()
+            for hook in self.hooks:
+                hook.close()
 
 
@@ -0,0 +1,129 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Measures the end to end latency of records, from when Kinesis accepted them to when the record processor handled
+them::
+
+    from amazon_kclpy import kcl
+    from amazon_kclpy.instrumentation import StatsdSink
+    from amazon_kclpy.latency import LatencyHook
+
+    kcl.KCLProcess(RecordProcessor(), hooks=[LatencyHook(StatsdSink())]).run()
+
+For each batch of records the hook measures, in milliseconds, the time from each record's
+:attr:`amazon_kclpy.messages.Record.timestamp_millis` to the start of ``process_records``, and to when it returned.
+These, along with :attr:`amazon_kclpy.messages.ProcessRecordsInput.millis_behind_latest`, are recorded in
+:class:`amazon_kclpy.histogram.Histogram` objects, which can be merged across shards.
+
+Records in a batch usually share a small number of arrival timestamps, so the timestamps are counted in a single pass
+that runs in C, and each distinct timestamp is recorded once per histogram.
+"""
+import time
+from collections import Counter
+from operator import attrgetter
+
+from amazon_kclpy.histogram import Histogram
+from amazon_kclpy.hooks import ProcessHook
+from amazon_kclpy.instrumentation import COUNTER, GAUGE
+
+ARRIVAL_TO_DISPATCH = 'arrival_to_dispatch'
+ARRIVAL_TO_COMPLETION = 'arrival_to_completion'
+MILLIS_BEHIND_LATEST = 'millis_behind_latest'
+
+_PERCENTILES = (50, 90, 99, 99.9)
+_arrival_timestamp = attrgetter('timestamp_millis')
+
+
+class LatencyHook(ProcessHook):
+    """
+    Records arrival latency histograms for every batch of records, and periodically reports percentiles.
+    """
+
+    def __init__(self, sink=None, snapshot_interval=60.0, reset_on_snapshot=True, prefix='kclpy.latency'):
+        """
+        :param amazon_kclpy.instrumentation.MetricSink or None sink: where percentile snapshots are sent, if anywhere
+        :param float snapshot_interval: the number of seconds between snapshots
+        :param bool reset_on_snapshot: whether the histograms are cleared after each snapshot, so that each snapshot
+            only covers its own interval
+        :param str prefix: prepended to every metric name
+        """
+        self.sink = sink
+        self.snapshot_interval = snapshot_interval
+        self.reset_on_snapshot = reset_on_snapshot
+        self.prefix = prefix
+        self.histograms = {
+            ARRIVAL_TO_DISPATCH: Histogram(),
+            ARRIVAL_TO_COMPLETION: Histogram(),
+            MILLIS_BEHIND_LATEST: Histogram(),
+        }
+        self._arrivals = None
+        self._next_snapshot = time.time() + snapshot_interval
+
+    def action_started(self, action):
+        if action.action != 'processRecords':
+            return
+        dispatch_millis = int(time.time() * 1000)
+        self._arrivals = Counter(map(_arrival_timestamp, action.records))
+        histogram = self.histograms[ARRIVAL_TO_DISPATCH]
+        for arrival, count in self._arrivals.items():
+            histogram.record(dispatch_millis - arrival, count)
+        if action.millis_behind_latest is not None:
+            self.histograms[MILLIS_BEHIND_LATEST].record(action.millis_behind_latest)
+
+    def action_finished(self, action, error):
+        if self._arrivals is None:
+            return
+        completion_millis = int(time.time() * 1000)
+        histogram = self.histograms[ARRIVAL_TO_COMPLETION]
+        for arrival, count in self._arrivals.items():
+            histogram.record(completion_millis - arrival, count)
+        self._arrivals = None
+        now = time.time()
+        if now >= self._next_snapshot:
+            self._next_snapshot = now + self.snapshot_interval
+            self.take_snapshot(now)
+
+    def snapshot(self):
+        """
+        Summarizes the histograms.
+
+        :return: a mapping of histogram name to a dictionary of count, mean, max and percentiles (p50, p90, p99 and
+            p99.9) in milliseconds. Empty histograms are left out.
+        :rtype: dict
+        """
+        snapshot = {}
+        for name, histogram in self.histograms.items():
+            if histogram.count == 0:
+                continue
+            summary = {'count': histogram.count, 'mean': histogram.mean, 'max': histogram.max}
+            for percentile in _PERCENTILES:
+                summary['p{p:g}'.format(p=percentile)] = histogram.percentile(percentile)
+            snapshot[name] = summary
+        return snapshot
+
+    def take_snapshot(self, now=None):
+        """
+        Sends a snapshot to the sink, and resets the histograms if configured to.
+
+        :param float or None now: the time of the snapshot, defaults to the current time
+        :return: the snapshot
+        :rtype: dict
+        """
+        snapshot = self.snapshot()
+        if self.sink is not None and snapshot:
+            metrics = []
+            for name, summary in sorted(snapshot.items()):
+                for statistic, value in sorted(summary.items()):
+                    kind = COUNTER if statistic == 'count' else GAUGE
+                    metrics.append(('{p}.{n}.{s}'.format(p=self.prefix, n=name, s=statistic.replace('.', '_')),
+                                    round(value, 3), kind))
+            self.sink.emit(now if now is not None else time.time(), metrics)
+        if self.reset_on_snapshot:
+            for histogram in self.histograms.values():
+                histogram.reset()
+        return snapshot
+
+    def close(self):
+        self.take_snapshot()
+        if self.sink is not None:
+            self.sink.close()
@@ -0,0 +1,477 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Puts synthetic records into a Kinesis stream at a target rate, to load test consumers::
+
+    kclpy-loadgen -s my-stream --rate 5000 --payload-size lognormal:512:0.8 --keys 10000 --skew 1.1 --duration 300
+    kclpy-loadgen -s my-stream --byte-rate 2000000 --compression gzip --aggregate --workers 4
+    kclpy-loadgen -s my-stream --rate 1000 --endpoint-url http://localhost:4566
+
+Payloads are slices of generated JSON event lines, so they compress like real events, with sizes drawn from a
+distribution (see :func:`parse_distribution`).  Partition keys are drawn from ``--keys`` distinct keys with a Zipf
+skew: 0 spreads records evenly, and around 1 or more sends most of them to a few hot keys.  Payloads can be compressed
+with gzip, zlib or zstd, as :class:`amazon_kclpy.decompression.DecompressionStage` expects, and packed into KPL
+aggregated records with :class:`amazon_kclpy.aggregation.RecordAggregator`.  Aggregation is by shard, using the
+stream's hash key ranges, so it packs records well however many partition keys there are: each shard's aggregated
+record is put once it's full, or has been open for 100 ms.  Sizes and rates count user records and payloads before
+compression and aggregation.
+
+Each of ``--workers`` processes generates an equal share of the target rate, and puts it with its own
+:class:`amazon_kclpy.producer.KinesisProducer`, optionally shaped by :class:`amazon_kclpy.shards.ShardRateLimiter`.
+Records are generated in small chunks paced against the target ``--rate`` records/s and ``--byte-rate`` bytes/s,
+whichever is reached first; without either, records are put as fast as the stream accepts them.  The achieved rates,
+failures and throttling are reported at the end.  ``--endpoint-url`` sends requests to a local stand-in for Kinesis.
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+import zlib
+
+from amazon_kclpy.decompression import GZIP, ZLIB, ZSTD
+
+_CHUNK_SECONDS = 0.05
+_AGGREGATION_LINGER = 0.1
+_MAX_CHUNK_RECORDS = 500
+_CORPUS_SIZE = 64 * 1024
+_EVENTS = ('view', 'click', 'add_to_cart', 'purchase', 'search', 'login', 'logout')
+
+
+def parse_distribution(spec):
+    """
+    Parses a payload size distribution.
+
+    :param str spec: ``<bytes>`` or ``fixed:<bytes>`` for a fixed size, ``uniform:<low>:<high>``, or
+        ``lognormal:<median>:<sigma>``
+    :return: a function taking a :class:`random.Random` and returning a size in bytes
+    """
+    parts = spec.split(':')
+    try:
+        if len(parts) == 1:
+            parts = ['fixed'] + parts
+        kind, arguments = parts[0], [float(part) for part in parts[1:]]
+        if kind == 'fixed' and len(arguments) == 1:
+            size = int(arguments[0])
+            return lambda rng: size
+        if kind == 'uniform' and len(arguments) == 2:
+            low, high = int(arguments[0]), int(arguments[1])
+            return lambda rng: rng.randint(low, high)
+        if kind == 'lognormal' and len(arguments) == 2:
+            median, sigma = arguments
+            return lambda rng: max(1, int(median * rng.lognormvariate(0, sigma)))
+    except ValueError:
+        pass
+    raise ValueError('Unknown payload size distribution {spec}'.format(spec=spec))
+
+
+class KeyChooser(object):
+    """
+    Draws partition keys from a fixed set with a Zipf skew.
+    """
+
+    def __init__(self, cardinality, skew=0.0, rng=None):
+        """
+        :param int cardinality: the number of distinct keys
+        :param float skew: the Zipf exponent, 0 for evenly spread keys
+        :param random.Random or None rng: the source of randomness
+        """
+        self.keys = ['key-{n}'.format(n=n) for n in range(cardinality)]
+        self.rng = rng or random.Random()
+        total = 0.0
+        self._cumulative = []
+        for rank in range(1, cardinality + 1):
+            total += rank ** -skew
+            self._cumulative.append(total)
+
+    def choose(self, count):
+        """
+        :param int count: the number of keys drawn
+        :rtype: list[str]
+        """
+        return self.rng.choices(self.keys, cum_weights=self._cumulative, k=count)
+
+    def share(self, rank):
+        """
+        :param int rank: the rank of a key, 0 for the most frequent
+        :return: the fraction of records expected to have the key
+        :rtype: float
+        """
+        previous = self._cumulative[rank - 1] if rank else 0.0
+        return (self._cumulative[rank] - previous) / self._cumulative[-1]
+
+
+class PayloadFactory(object):
+    """
+    Makes JSON event payloads of sizes drawn from a distribution, optionally compressed.
+    """
+
+    def __init__(self, payload_size='1024', compression=None, rng=None):
+        """
+        :param str payload_size: the size distribution, see :func:`parse_distribution`
+        :param str or None compression: :data:`amazon_kclpy.decompression.GZIP`, ``ZLIB``, ``ZSTD``, or None
+        :param random.Random or None rng: the source of randomness
+        """
+        self.sizes = parse_distribution(payload_size)
+        self.rng = rng or random.Random()
+        if compression == GZIP:
+            self._compress = lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+        elif compression == ZLIB:
+            self._compress = zlib.compress
+        elif compression == ZSTD:
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError('zstd compression requires zstandard, install amazon_kclpy[zstd]')
+            self._compress = zstandard.ZstdCompressor().compress
+        elif compression is None:
+            self._compress = None
+        else:
+            raise ValueError('Unknown compression {c}'.format(c=compression))
+        lines = []
+        length = 0
+        while length < _CORPUS_SIZE:
+            event = {'event': self.rng.choice(_EVENTS), 'user': 'user-{n}'.format(n=self.rng.randint(0, 99999)),
+                     'page': '/item/{n}'.format(n=self.rng.randint(0, 9999)),
+                     'time': 1700000000000 + self.rng.randint(0, 86400000)}
+            line = json.dumps(event, separators=(',', ':')) + '\n'
+            lines.append(line)
+            length += len(line)
+        self._corpus = ''.join(lines).encode('ascii')
+
+    def make(self):
+        """
+        :return: a payload, and its size before compression
+        :rtype: tuple
+        """
+        size = self.sizes(self.rng)
+        corpus = self._corpus
+        if size > len(corpus):
+            data = (corpus * (size // len(corpus) + 1))[:size]
+        else:
+            start = self.rng.randrange(len(corpus) - size + 1)
+            data = corpus[start:start + size]
+        if self._compress is not None:
+            return self._compress(data), size
+        return data, size
+
+
+class LoadConfig(object):
+    """
+    What a load generator puts, and how fast.
+    """
+
+    def __init__(self, stream_name, records_per_second=None, bytes_per_second=None, payload_size='1024',
+                 partition_keys=1000, skew=0.0, compression=None, aggregate=False, shape=False, duration=60.0,
+                 max_records=None, seed=None):
+        """
+        :param str stream_name: the stream records are put into
+        :param float or None records_per_second: the target user records per second, across every worker
+        :param float or None bytes_per_second: the target payload bytes per second, across every worker
+        :param str payload_size: the payload size distribution, see :func:`parse_distribution`
+        :param int partition_keys: the number of distinct partition keys
+        :param float skew: the Zipf exponent of the partition key distribution
+        :param str or None compression: the payload compression, see :class:`PayloadFactory`
+        :param bool aggregate: whether user records are packed into KPL aggregated records
+        :param bool shape: whether puts are shaped to each shard's write limits
+        :param float duration: the most seconds to run for
+        :param int or None max_records: the most user records to put, across every worker
+        :param int or None seed: seeds the keys and payloads, for repeatable runs
+        """
+        self.stream_name = stream_name
+        self.records_per_second = records_per_second
+        self.bytes_per_second = bytes_per_second
+        self.payload_size = payload_size
+        self.partition_keys = partition_keys
+        self.skew = skew
+        self.compression = compression
+        self.aggregate = aggregate
+        self.shape = shape
+        self.duration = duration
+        self.max_records = max_records
+        self.seed = seed
+
+
+class LoadReport(object):
+    """
+    What a load generator achieved.
+    """
+
+    def __init__(self, seconds=0.0, user_records=0, payload_bytes=0, records=0, records_put=0, bytes_put=0,
+                 records_failed=0, records_throttled=0, records_retried=0):
+        """
+        :param float seconds: how long records were put for
+        :param int user_records: the user records generated
+        :param int payload_bytes: the payload bytes generated, before compression
+        :param int records: the Kinesis records put, which are fewer than the user records when aggregating
+        :param int records_put: the Kinesis records accepted
+        :param int bytes_put: the bytes of data and partition keys accepted
+        :param int records_failed: the Kinesis records that failed every attempt
+        :param int records_throttled: the Kinesis records throttled, including those later retried
+        :param int records_retried: the Kinesis records retried
+        """
+        self.seconds = seconds
+        self.user_records = user_records
+        self.payload_bytes = payload_bytes
+        self.records = records
+        self.records_put = records_put
+        self.bytes_put = bytes_put
+        self.records_failed = records_failed
+        self.records_throttled = records_throttled
+        self.records_retried = records_retried
+
+    def merge(self, other):
+        """
+        Adds the counts of another worker's report, keeping the longer duration.
+
+        :param LoadReport other: the other report
+        """
+        self.seconds = max(self.seconds, other.seconds)
+        for name in ('user_records', 'payload_bytes', 'records', 'records_put', 'bytes_put', 'records_failed',
+                     'records_throttled', 'records_retried'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    @property
+    def user_records_per_second(self):
+        return self.user_records / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def payload_bytes_per_second(self):
+        return self.payload_bytes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def records_put_per_second(self):
+        return self.records_put / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_put_per_second(self):
+        return self.bytes_put / self.seconds if self.seconds > 0 else 0.0
+
+
+def make_client(region=None, endpoint_url=None, max_pool_connections=10):
+    """
+    :param str or None region: the region of the stream
+    :param str or None endpoint_url: the URL of a stand-in for Kinesis, instead of the region's endpoint
+    :param int max_pool_connections: the size of the client's connection pool
+    :return: a Kinesis client
+    """
+    import boto3
+    from botocore.config import Config
+    return boto3.client('kinesis', region_name=region, endpoint_url=endpoint_url,
+                        config=Config(max_pool_connections=max_pool_connections))
+
+
+def run_worker(config, client, worker=0, workers=1, max_in_flight=4, clock=time.monotonic, sleep=time.sleep):
+    """
+    Puts one worker's share of the load.
+
+    :param LoadConfig config: the load
+    :param client: a Kinesis client
+    :param int worker: the number of this worker, from 0
+    :param int workers: the number of workers sharing the load
+    :param int max_in_flight: the most PutRecords calls made at once
+    :param clock: returns a monotonic time in seconds
+    :param sleep: waits for the given number of seconds
+    :rtype: LoadReport
+    """
+    from amazon_kclpy.instrumentation import COUNTER
+    from amazon_kclpy.producer import KinesisProducer
+
+    rng = random.Random(None if config.seed is None else config.seed * 1000003 + worker)
+    keys = KeyChooser(config.partition_keys, config.skew, rng)
+    payloads = PayloadFactory(config.payload_size, config.compression, rng)
+    records_per_second = config.records_per_second / workers if config.records_per_second else None
+    bytes_per_second = config.bytes_per_second / workers if config.bytes_per_second else None
+    max_records = None
+    if config.max_records is not None:
+        max_records = config.max_records // workers + (1 if worker < config.max_records % workers else 0)
+    if records_per_second:
+        chunk_records = max(1, min(_MAX_CHUNK_RECORDS, int(records_per_second * _CHUNK_SECONDS)))
+    else:
+        chunk_records = _MAX_CHUNK_RECORDS
+
+    shard_map = shaper = None
+    if config.shape or config.aggregate:
+        from amazon_kclpy.shards import ShardMap, ShardRateLimiter
+        shard_map = ShardMap(client, config.stream_name)
+        if config.shape:
+            shaper = ShardRateLimiter(shard_map)
+    producer = KinesisProducer(config.stream_name, client=client, max_in_flight=max_in_flight, shaper=shaper)
+    aggregators = opened = None
+    if config.aggregate:
+        from amazon_kclpy.aggregation import RecordAggregator
+        aggregators = {}
+        opened = {}
+
+    report = LoadReport()
+
+    def put_aggregated(record):
+        producer.put(record.data, record.partition_key, record.explicit_hash_key)
+        report.records += 1
+
+    started = clock()
+    try:
+        while True:
+            now = clock()
+            elapsed = now - started
+            if elapsed >= config.duration or (max_records is not None and report.user_records >= max_records):
+                break
+            allowed = chunk_records
+            if max_records is not None:
+                allowed = min(allowed, max_records - report.user_records)
+            waits = []
+            if records_per_second:
+                behind = records_per_second * elapsed - report.user_records
+                if behind < 1:
+                    waits.append((1 - behind) / records_per_second)
+                else:
+                    allowed = min(allowed, int(behind))
+            if bytes_per_second and bytes_per_second * elapsed <= report.payload_bytes:
+                waits.append(max(0.001, (report.payload_bytes - bytes_per_second * elapsed) / bytes_per_second))
+            if waits:
+                sleep(min(max(waits), config.duration - elapsed))
+                continue
+            chunk = []
+            for partition_key in keys.choose(allowed):
+                data, size = payloads.make()
+                chunk.append((data, partition_key))
+                report.payload_bytes += size
+            report.user_records += len(chunk)
+            if aggregators is not None:
+                shard_ids = shard_map.shards_for([partition_key for _, partition_key in chunk])
+                for (data, partition_key), shard_id in zip(chunk, shard_ids):
+                    aggregator = aggregators.get(shard_id)
+                    if aggregator is None:
+                        aggregator = aggregators[shard_id] = RecordAggregator(shard_map=shard_map)
+                    if not len(aggregator):
+                        opened[shard_id] = now
+                    finished = aggregator.add(data, partition_key)
+                    if finished is not None:
+                        put_aggregated(finished)
+                        opened[shard_id] = now
+                for shard_id, aggregator in aggregators.items():
+                    if len(aggregator) and now - opened[shard_id] >= _AGGREGATION_LINGER:
+                        put_aggregated(aggregator.flush())
+            else:
+                for data, partition_key in chunk:
+                    producer.put(data, partition_key)
+                report.records += len(chunk)
+        if aggregators is not None:
+            for aggregator in aggregators.values():
+                if len(aggregator):
+                    put_aggregated(aggregator.flush())
+        producer.close()
+    finally:
+        report.seconds = clock() - started
+    counters = dict((name[len(producer.prefix) + 1:], value) for name, value, kind in producer.metrics()
+                    if kind == COUNTER)
+    for name in ('records_put', 'bytes_put', 'records_failed', 'records_throttled', 'records_retried'):
+        setattr(report, name, counters.get(name, 0))
+    return report
+
+
+def _worker_main(config, worker, workers, region, endpoint_url, max_in_flight, results):
+    try:
+        client = make_client(region, endpoint_url, max(10, max_in_flight))
+        results.put((worker, run_worker(config, client, worker, workers, max_in_flight), None))
+    except Exception as e:
+        results.put((worker, None, '{t}: {e}'.format(t=type(e).__name__, e=e)))
+
+
+def run(config, workers=1, region=None, endpoint_url=None, max_in_flight=4):
+    """
+    Puts the load from one or more worker processes.
+
+    :param LoadConfig config: the load
+    :param int workers: the number of worker processes, 1 to put the load from this process
+    :param str or None region: the region of the stream
+    :param str or None endpoint_url: the URL of a stand-in for Kinesis
+    :param int max_in_flight: the most PutRecords calls each worker makes at once
+    :return: the combined report of every worker, and the errors of workers that failed
+    :rtype: tuple
+    """
+    if workers == 1:
+        client = make_client(region, endpoint_url, max(10, max_in_flight))
+        return run_worker(config, client, 0, 1, max_in_flight), []
+    import multiprocessing
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_worker_main, name='kclpy-loadgen-{n}'.format(n=worker),
+                                         args=(config, worker, workers, region, endpoint_url, max_in_flight,
+                                               results))
+                 for worker in range(workers)]
+    for process in processes:
+        process.start()
+    report = LoadReport()
+    errors = []
+    for _ in processes:
+        worker, worker_report, error = results.get()
+        if error is not None:
+            errors.append('worker {n}: {e}'.format(n=worker, e=error))
+        else:
+            report.merge(worker_report)
+    for process in processes:
+        process.join()
+    return report, errors
+
+
+def render(report):
+    """
+    :param LoadReport report: the report returned by :func:`run`
+    :rtype: str
+    """
+    return ('{u} user records, {p:.3f} MB of payloads in {s:.3f} seconds: {ups:.1f} records/s, {pps:.3f} MB/s\n'
+            '{r} Kinesis records, {rp} put: {rps:.1f} records/s, {bps:.3f} MB/s\n'
+            '{f} failed, {t} throttled, {rt} retried').format(
+        u=report.user_records, p=report.payload_bytes / 1e6, s=report.seconds, ups=report.user_records_per_second,
+        pps=report.payload_bytes_per_second / 1e6, r=report.records, rp=report.records_put,
+        rps=report.records_put_per_second, bps=report.bytes_put_per_second / 1e6, f=report.records_failed,
+        t=report.records_throttled, rt=report.records_retried)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Puts synthetic records into a Kinesis stream at a target rate.')
+    parser.add_argument('-s', '--stream', dest='stream_name', required=True, help='The stream records are put into.')
+    parser.add_argument('-r', '--region', dest='region', default=None, help='The region of the stream.')
+    parser.add_argument('--endpoint-url', dest='endpoint_url', default=None,
+                        help='The URL of a local stand-in for Kinesis.')
+    parser.add_argument('--rate', dest='records_per_second', type=float, default=None,
+                        help='The target user records per second. Default is as fast as possible.')
+    parser.add_argument('--byte-rate', dest='bytes_per_second', type=float, default=None,
+                        help='The target payload bytes per second, before compression.')
+    parser.add_argument('--payload-size', dest='payload_size', default='1024',
+                        help='The payload size distribution: <bytes>, uniform:<low>:<high> or '
+                             'lognormal:<median>:<sigma>. Default is 1024.')
+    parser.add_argument('--keys', dest='partition_keys', type=int, default=1000,
+                        help='The number of distinct partition keys. Default is 1000.')
+    parser.add_argument('--skew', dest='skew', type=float, default=0.0,
+                        help='The Zipf exponent of the partition key distribution, 0 for even. Default is 0.')
+    parser.add_argument('--compression', dest='compression', default=None, choices=[GZIP, ZLIB, ZSTD],
+                        help='Compresses each payload.')
+    parser.add_argument('--aggregate', dest='aggregate', action='store_true',
+                        help='Packs user records into KPL aggregated records by shard.')
+    parser.add_argument('--shape', dest='shape', action='store_true',
+                        help="Shapes puts to each shard's write limits.")
+    parser.add_argument('-d', '--duration', dest='duration', type=float, default=60.0,
+                        help='The most seconds to run for. Default is 60.')
+    parser.add_argument('-n', '--records', dest='max_records', type=int, default=None,
+                        help='The most user records to put.')
+    parser.add_argument('-w', '--workers', dest='workers', type=int, default=1,
+                        help='The number of worker processes. Default is 1.')
+    parser.add_argument('--in-flight', dest='max_in_flight', type=int, default=4,
+                        help='The most PutRecords calls each worker makes at once. Default is 4.')
+    parser.add_argument('--seed', dest='seed', type=int, default=None, help='Seeds the keys and payloads.')
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(args.stream_name, args.records_per_second, args.bytes_per_second, args.payload_size,
+                        args.partition_keys, args.skew, args.compression, args.aggregate, args.shape, args.duration,
+                        args.max_records, args.seed)
+    report, errors = run(config, args.workers, args.region, args.endpoint_url, args.max_in_flight)
+    sys.stdout.write(render(report) + '\n')
+    for error in errors:
+        sys.stderr.write(error + '\n')
+    return 1 if errors or report.records_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
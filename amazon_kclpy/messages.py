@@ -2,8 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import abc
-import base64
-from datetime import datetime
+import binascii
 
 from amazon_kclpy.checkpoint_error import CheckpointError
 
@@ -394,7 +393,7 @@ class Record(object):
         self._sub_sequence_number = json_dict["subSequenceNumber"]
 
         self._timestamp_millis = int(json_dict["approximateArrivalTimestamp"])
-        self._approximate_arrival_timestamp = datetime.fromtimestamp(self._timestamp_millis / 1000.0)
+        self._approximate_arrival_timestamp = None
 
         self._partition_key = json_dict["partitionKey"]
         self._data = json_dict["data"]
@@ -410,7 +409,7 @@ class Record(object):
         :return: a string representing the raw bytes from
         :rtype: str
         """
-        return base64.b64decode(self._data)
+        return binascii.a2b_base64(self._data)
     
     @property
     def sequence_number(self):
@@ -454,6 +453,9 @@ class Record(object):
         :return: the timestamp
         :rtype: datetime
         """
+        if self._approximate_arrival_timestamp is None:
+            from datetime import datetime
+            self._approximate_arrival_timestamp = datetime.fromtimestamp(self._timestamp_millis / 1000.0)
         return self._approximate_arrival_timestamp
 
     @property
@@ -0,0 +1,367 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Puts records into a Kinesis stream with batched ``PutRecords`` calls::
+
+    from amazon_kclpy.producer import KinesisProducer
+
+    producer = KinesisProducer('my-stream')
+    futures = [producer.put(line, partition_key=line[:8]) for line in lines]
+    producer.flush()
+    for future in futures:
+        shard_id, sequence_number = future.result()
+
+Records are buffered until there are 500 of them or 5 MB of data and partition keys, the most one ``PutRecords`` call
+accepts, or the oldest has waited ``linger`` seconds.  Up to ``max_in_flight`` calls are made at once over one client;
+:meth:`KinesisProducer.put` blocks while they are all busy and another batch is full.  Entries that fail in an
+otherwise successful call, such as those throttled by a busy shard, are retried on their own with exponential backoff
+and full jitter, so records that were accepted are never put twice by the producer.
+
+Retries and concurrent calls can reorder records, including records with the same partition key.  Use
+``max_in_flight=1`` and ``max_attempts=1`` if consumers depend on the order records are put in.
+
+A ``shaper``, such as :class:`amazon_kclpy.shards.ShardRateLimiter`, decides which records of a batch are sent in each
+call.  Records it holds back wait without using up their attempts.
+
+:meth:`KinesisProducer.metrics` reports records and bytes put, failures, retries, throttling and call latency in the
+same form as :class:`amazon_kclpy.instrumentation.InstrumentationHook`, so they can be sent to any
+:class:`amazon_kclpy.instrumentation.MetricSink`.
+"""
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from amazon_kclpy.histogram import Histogram
+from amazon_kclpy.instrumentation import COUNTER, GAUGE
+
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+MAX_RECORD_BYTES = 1024 * 1024
+
+_THROTTLED = 'ProvisionedThroughputExceededException'
+_PERCENTILES = (50, 90, 99)
+
+
+class PutRecordsError(Exception):
+    """
+    Raised by the future of a record that Kinesis still rejected after every attempt.
+    """
+
+    def __init__(self, error_code, error_message):
+        super(PutRecordsError, self).__init__('{code}: {message}'.format(code=error_code, message=error_message))
+        self.error_code = error_code
+        self.error_message = error_message
+
+
+class _Entry(object):
+
+    __slots__ = ('request', 'size', 'future', 'attempts')
+
+    def __init__(self, request, size, future):
+        self.request = request
+        self.size = size
+        self.future = future
+        self.attempts = 0
+
+
+class KinesisProducer(object):
+    """
+    Batches records into concurrent PutRecords calls, retrying the entries that fail.
+    """
+
+    def __init__(self, stream_name, client=None, linger=0.1, max_in_flight=4, max_attempts=8, base_delay=0.1,
+                 max_delay=5.0, max_batch_records=MAX_BATCH_RECORDS, max_batch_bytes=MAX_BATCH_BYTES,
+                 shaper=None, prefix='kclpy.producer', clock=time.monotonic, sleep=time.sleep):
+        """
+        :param str stream_name: the stream records are put into
+        :param client: a Kinesis client, by default one is created with a connection pool for ``max_in_flight`` calls
+        :param float or None linger: the seconds a record waits for its batch to fill, None to only send full batches
+            and on :meth:`flush`
+        :param int max_in_flight: the most PutRecords calls made at once
+        :param int max_attempts: the most calls made for a record, including retries
+        :param float base_delay: the first backoff before retrying failed entries, in seconds
+        :param float max_delay: the longest backoff, in seconds
+        :param int max_batch_records: the most records in a call
+        :param int max_batch_bytes: the most data and partition key bytes in a call
+        :param shaper: decides which records can be sent now, such as a
+            :class:`amazon_kclpy.shards.ShardRateLimiter`
+        :param str prefix: the start of every metric name
+        :param clock: returns a monotonic time in seconds
+        :param sleep: waits for the given number of seconds
+        """
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = boto3.client('kinesis', config=Config(max_pool_connections=max(10, max_in_flight)))
+        self.stream_name = stream_name
+        self.client = client
+        self.linger = linger
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_batch_records = max_batch_records
+        self.max_batch_bytes = max_batch_bytes
+        self.shaper = shaper
+        self.prefix = prefix
+        self.clock = clock
+        self.sleep = sleep
+
+        self._condition = threading.Condition()
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        self._outstanding = 0
+        self._closed = False
+        self._linger_thread = None
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = None
+
+        self._metrics_lock = threading.Lock()
+        self._counters = {}
+        self._latency = Histogram()
+        self._interval_start = clock()
+
+    def put(self, data, partition_key, explicit_hash_key=None):
+        """
+        Buffers a record to be put.
+
+        :param data: the payload, str payloads are encoded as UTF-8
+        :type data: bytes or str
+        :param str partition_key: the partition key
+        :param str or None explicit_hash_key: the hash key that chooses the shard, instead of the partition key's
+        :return: a future that resolves to the record's (shard id, sequence number), or raises
+            :class:`PutRecordsError` if every attempt to put it failed
+        :rtype: concurrent.futures.Future
+        :raises ValueError: if the record is larger than Kinesis allows, or the producer is closed
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        size = len(data) + len(partition_key.encode('utf-8'))
+        if size > MAX_RECORD_BYTES:
+            raise ValueError('Record of {n} bytes exceeds the {m} byte limit'.format(n=size, m=MAX_RECORD_BYTES))
+        request = {'Data': data, 'PartitionKey': partition_key}
+        if explicit_hash_key is not None:
+            request['ExplicitHashKey'] = explicit_hash_key
+        future = Future()
+        full = []
+        with self._condition:
+            if self._closed:
+                raise ValueError('The producer is closed')
+            if self._pending and self._pending_bytes + size > self.max_batch_bytes:
+                full.append(self._take_pending())
+            if not self._pending:
+                self._pending_since = self.clock()
+                if self.linger is not None:
+                    self._start_linger_thread()
+                    self._condition.notify_all()
+            self._pending.append(_Entry(request, size, future))
+            self._pending_bytes += size
+            if len(self._pending) >= self.max_batch_records:
+                full.append(self._take_pending())
+        for batch in full:
+            self._submit(batch)
+        return future
+
+    def _take_pending(self):
+        batch = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        self._outstanding += 1
+        return batch
+
+    def _start_linger_thread(self):
+        if self._linger_thread is None:
+            self._linger_thread = threading.Thread(target=self._linger_loop, name='kclpy-producer-linger')
+            self._linger_thread.daemon = True
+            self._linger_thread.start()
+
+    def _linger_loop(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._pending_since is None:
+                        self._condition.wait()
+                        continue
+                    remaining = self._pending_since + self.linger - self.clock()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+                batch = self._take_pending()
+            self._submit(batch)
+
+    def _submit(self, batch):
+        self._slots.acquire()
+        if self._executor is None:
+            with self._condition:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(self.max_in_flight, thread_name_prefix='kclpy-producer')
+        self._executor.submit(self._send, batch)
+
+    def _count(self, name, value=1):
+        with self._metrics_lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _send(self, batch):
+        try:
+            while batch:
+                if self.shaper is not None:
+                    admitted, wait = self.shaper.admit([entry.request for entry in batch])
+                    ready = [entry for entry, admit in zip(batch, admitted) if admit]
+                    deferred = [entry for entry, admit in zip(batch, admitted) if not admit]
+                    if deferred:
+                        self._count('records_deferred', len(deferred))
+                    if not ready:
+                        self.sleep(wait)
+                        continue
+                else:
+                    ready, deferred, wait = batch, [], 0
+                retried = sum(1 for entry in ready if entry.attempts)
+                if retried:
+                    self._count('records_retried', retried)
+                for entry in ready:
+                    entry.attempts += 1
+                failed = self._put(ready)
+                batch = failed + deferred
+                if failed:
+                    self.sleep(self._backoff(max(entry.attempts for entry in failed)))
+                elif deferred:
+                    self.sleep(wait)
+        except BaseException as e:
+            for entry in batch:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+            raise
+        finally:
+            self._slots.release()
+            with self._condition:
+                self._outstanding -= 1
+                self._condition.notify_all()
+
+    def _put(self, batch):
+        """
+        Makes one PutRecords call, resolving the futures of entries that succeeded or ran out of attempts.
+
+        :return: the entries to retry
+        :rtype: list
+        """
+        started = time.perf_counter()
+        try:
+            response = self.client.put_records(StreamName=self.stream_name, Records=[entry.request for entry in batch])
+        except Exception as e:
+            self._count('requests_failed')
+            retry = [entry for entry in batch if entry.attempts < self.max_attempts]
+            if len(retry) < len(batch):
+                self._count('records_failed', len(batch) - len(retry))
+                for entry in batch:
+                    if entry.attempts >= self.max_attempts:
+                        entry.future.set_exception(e)
+            return retry
+        elapsed = int((time.perf_counter() - started) * 1000000)
+        retry = []
+        put = put_bytes = throttled = failed = 0
+        for entry, result in zip(batch, response['Records']):
+            error_code = result.get('ErrorCode')
+            if error_code:
+                if error_code == _THROTTLED:
+                    throttled += 1
+                if entry.attempts < self.max_attempts:
+                    retry.append(entry)
+                else:
+                    failed += 1
+                    entry.future.set_exception(PutRecordsError(error_code, result.get('ErrorMessage')))
+            else:
+                put += 1
+                put_bytes += entry.size
+                entry.future.set_result((result['ShardId'], result['SequenceNumber']))
+        with self._metrics_lock:
+            self._latency.record(elapsed)
+            counters = self._counters
+            for name, value in (('requests', 1), ('records_put', put), ('bytes_put', put_bytes),
+                                ('records_throttled', throttled), ('records_failed', failed)):
+                if value:
+                    counters[name] = counters.get(name, 0) + value
+        return retry
+
+    def flush(self, timeout=None):
+        """
+        Sends every buffered record, and waits for every call to finish.
+
+        :param float or None timeout: the most seconds to wait
+        :return: True if every call finished
+        :rtype: bool
+        """
+        with self._condition:
+            batch = self._take_pending() if self._pending else None
+        if batch:
+            self._submit(batch)
+        with self._condition:
+            return self._condition.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def metrics(self, reset=False):
+        """
+        Summarizes everything put since the metrics were last reset.  Latencies are reported in milliseconds.
+
+        :param bool reset: whether to also start a new metrics interval, in the same step so no calls are missed
+        :return: tuples of (name, value, kind)
+        :rtype: list[tuple]
+        """
+        with self._metrics_lock:
+            counters = self._counters
+            latency = self._latency
+            now = self.clock()
+            elapsed = now - self._interval_start
+            metrics = [('{p}.{n}'.format(p=self.prefix, n=name), value, COUNTER)
+                       for name, value in sorted(counters.items())]
+            if elapsed > 0:
+                metrics.append((self.prefix + '.records_per_second',
+                                round(counters.get('records_put', 0) / elapsed, 3), GAUGE))
+                metrics.append((self.prefix + '.bytes_per_second',
+                                round(counters.get('bytes_put', 0) / elapsed, 3), GAUGE))
+            if latency.count:
+                name = self.prefix + '.put_records'
+                metrics.append((name + '.mean', round(latency.mean / 1000.0, 3), GAUGE))
+                for percentile in _PERCENTILES:
+                    metrics.append(('{n}.p{p}'.format(n=name, p=percentile),
+                                    round(latency.percentile(percentile) / 1000.0, 3), GAUGE))
+                metrics.append((name + '.max', round(latency.max / 1000.0, 3), GAUGE))
+            if reset:
+                self._counters = {}
+                latency.reset()
+                self._interval_start = now
+        return metrics
+
+    def flush_metrics(self, sink, now=None):
+        """
+        Sends the metrics since the last call to a sink, and starts a new interval.
+
+        :param amazon_kclpy.instrumentation.MetricSink sink: the sink
+        :param float or None now: the time of the flush, defaults to the current time
+        """
+        metrics = self.metrics(reset=True)
+        if metrics:
+            sink.emit(now if now is not None else time.time(), metrics)
+
+    def close(self, timeout=None):
+        """
+        Sends every buffered record, waits for every call to finish, and stops the producer's threads.
+
+        :param float or None timeout: the most seconds to wait for calls to finish
+        :return: True if every call finished
+        :rtype: bool
+        """
+        finished = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=finished)
+        return finished
@@ -0,0 +1,139 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+A low overhead sampling profiler that can be left running in production.
+
+The profiler is enabled by passing ``profile=True`` to :class:`amazon_kclpy.kcl.KCLProcess`, or by setting the
+``KCLPY_PROFILE`` environment variable to anything but ``0``, ``false``, ``no`` or ``off``.  It's configured with these
+environment variables:
+
+* ``KCLPY_PROFILE_DIRECTORY``: where profiles are written, defaults to the temporary directory
+* ``KCLPY_PROFILE_INTERVAL``: seconds between samples, defaults to 0.05
+* ``KCLPY_PROFILE_ROTATE_SECONDS``: seconds covered by each profile file, defaults to 300
+* ``KCLPY_PROFILE_MAX_FILES``: the number of profile files each process keeps, defaults to 12
+* ``KCLPY_PROFILE_FRACTION``: the fraction of processes that run the profiler, defaults to 1.  This allows the same
+  configuration to be deployed everywhere while only profiling part of the fleet.
+
+A background thread samples the stack of the processing thread.  Each sample is attributed to what the process was
+doing at the time: ``idle`` while waiting for the MultiLangDaemon, the name of the action being dispatched (for
+example ``initialize`` or ``processRecords``), or ``checkpoint`` while waiting for a checkpoint response.  Samples are
+written in the collapsed stack format (see :mod:`amazon_kclpy.stacks`), each stack starting with the shard id and
+the activity, to files that are rotated every ``rotate_seconds``.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+from amazon_kclpy.hooks import ProcessHook
+from amazon_kclpy.stacks import collapse_stack, write_collapsed
+
+IDLE = 'idle'
+CHECKPOINT = 'checkpoint'
+
+
+class SamplingProfilerHook(ProcessHook):
+    """
+    Samples the processing thread at a fixed interval, attributing each sample to the current activity.
+    """
+
+    @staticmethod
+    def from_environment(environ=None):
+        """
+        Creates a profiler configured from the ``KCLPY_PROFILE_*`` environment variables.
+
+        :param dict or None environ: the environment to read, defaults to ``os.environ``
+        :return: the profiler, or None if this process wasn't selected by ``KCLPY_PROFILE_FRACTION``
+        :rtype: SamplingProfilerHook or None
+        """
+        environ = os.environ if environ is None else environ
+        fraction = float(environ.get('KCLPY_PROFILE_FRACTION', '1'))
+        if random.random() >= fraction:
+            return None
+        return SamplingProfilerHook(output_directory=environ.get('KCLPY_PROFILE_DIRECTORY'),
+                                    interval=float(environ.get('KCLPY_PROFILE_INTERVAL', '0.05')),
+                                    rotate_seconds=float(environ.get('KCLPY_PROFILE_ROTATE_SECONDS', '300')),
+                                    max_files=int(environ.get('KCLPY_PROFILE_MAX_FILES', '12')))
+
+    def __init__(self, output_directory=None, interval=0.05, rotate_seconds=300.0, max_files=12):
+        """
+        :param str or None output_directory: where profiles are written, defaults to the temporary directory
+        :param float interval: the number of seconds between samples
+        :param float rotate_seconds: the number of seconds covered by each profile file
+        :param int max_files: the number of profile files to keep, older files are deleted
+        """
+        self.output_directory = output_directory or tempfile.gettempdir()
+        self.interval = interval
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.files = deque()
+        self._shard_id = 'unknown'
+        self._activity = IDLE
+        self._action = IDLE
+        self._samples = Counter()
+        self._thread = None
+        self._stopped = False
+
+    def action_started(self, action):
+        if action.action == 'initialize':
+            self._shard_id = action.shard_id
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(threading.current_thread().ident,),
+                                            name='kclpy-profiler')
+            self._thread.daemon = True
+            self._thread.start()
+        self._action = self._activity = action.action
+
+    def action_finished(self, action, error):
+        self._action = self._activity = IDLE
+
+    def checkpoint_started(self):
+        self._activity = CHECKPOINT
+
+    def checkpoint_finished(self, elapsed, error):
+        self._activity = self._action
+
+    def _run(self, thread_ident):
+        rotate_at = time.time() + self.rotate_seconds
+        while not self._stopped:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(thread_ident)
+            if frame is not None:
+                self._samples[collapse_stack(frame, (self._shard_id, self._activity))] += 1
+                del frame
+            if time.time() >= rotate_at:
+                rotate_at = time.time() + self.rotate_seconds
+                self.rotate()
+
+    def rotate(self):
+        """
+        Writes the samples collected since the last rotation to a new profile file, and deletes the oldest files
+        beyond ``max_files``.
+        """
+        samples, self._samples = self._samples, Counter()
+        if not samples:
+            return
+        file_name = 'kclpy-profile-{shard}-{pid}-{time}.folded'.format(shard=self._shard_id, pid=os.getpid(),
+                                                                      time=int(time.time() * 1000))
+        path = os.path.join(self.output_directory, file_name)
+        try:
+            with open(path, 'w') as profile_file:
+                write_collapsed(profile_file, samples)
+        except (IOError, OSError) as e:
+            sys.stderr.write('Unable to write profile to {path}: {e}\n'.format(path=path, e=e))
+            return
+        self.files.append(path)
+        while len(self.files) > self.max_files:
+            try:
+                os.remove(self.files.popleft())
+            except OSError:
+                pass
+
+    def close(self):
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join(self.interval + 1.0)
+        self.rotate()
@@ -0,0 +1,369 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Extracts a few fields from the JSON payloads of a batch of records, without parsing whole documents::
+
+    from amazon_kclpy.projection import Equals, Prefix, Projection
+
+    projection = Projection(['user.id', 'items[0].sku', 'amount'],
+                            where=[Equals('type', 'order'), Prefix('region', 'eu-')])
+
+    def process_records(self, process_records_input):
+        batch = projection.project(process_records_input)
+        for record, row in batch.rows():
+            handle(row['user.id'], row['amount'])
+
+Paths are dot separated object keys, with ``[n]`` for array elements.  Results are returned as columns, one list per
+path aligned with the records, holding None for records where the path is missing.
+
+Each payload is scanned from the start.  Only the values at requested paths are parsed, with the standard library's C
+scanner; every other member is skipped over by matching its strings and brackets with a regular expression, without
+decoding it.  Scanning stops as soon as every path has been found, so a document isn't read past the last
+requested field.  When a predicate fails, scanning of that record stops at once and its other columns may be
+incomplete.  Documents are only validated as far as they are scanned, and skipped values only as far as having
+terminated strings and balanced brackets.  A record whose payload isn't a JSON document (as far as it's scanned) is
+reported in :attr:`ProjectedBatch.failures`.
+"""
+import re
+import sys
+from json.decoder import JSONDecoder, scanstring
+
+from amazon_kclpy.codec import DecodeFailure
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_PATH_TOKEN = re.compile(r'([^.\[\]]+)|\[(\d+)\]')
+_SCALAR = re.compile(r'-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null')
+
+# Skipped containers are matched by a regular expression nested _MAX_NESTED_DEPTH levels deep.  The first pattern
+# tried only accepts strings with no backslash before their closing quote, as matching up to the next quote is much
+# faster than stepping over escapes; a string it can't match makes it fail rather than match wrongly, and the exact
+# pattern is tried instead.  The patterns are unambiguous, so possessive quantifiers (from Python 3.11) match the same
+# text but save the regex engine from keeping backtracking state.
+_POSSESSIVE = '+' if sys.version_info >= (3, 11) else ''
+_SIMPLE_STRING = r'"[^"]*{q}(?<!\\)"'.replace('{q}', _POSSESSIVE)
+_STRING = r'"[^"\\]*{q}(?:\\.[^"\\]*{q})*{q}"'.replace('{q}', _POSSESSIVE)
+_PLAIN = r'[^"\[\]{}]*' + _POSSESSIVE
+_MAX_NESTED_DEPTH = 8
+
+
+def _nested(string, depth):
+    content = _PLAIN + '(?:' + string + _PLAIN + ')*' + _POSSESSIVE
+    for _ in range(depth - 1):
+        content = _PLAIN + '(?:(?:' + string + r'|[\[{]' + content + r'[\]}])' + _PLAIN + ')*' + _POSSESSIVE
+    return re.compile(r'[\[{]' + content + r'[\]}]', re.DOTALL)
+
+
+_CONTAINERS = (_nested(_SIMPLE_STRING, _MAX_NESTED_DEPTH).match, _nested(_STRING, _MAX_NESTED_DEPTH).match)
+_CONTENT = re.compile(_PLAIN + '(?:' + _STRING + _PLAIN + ')*', re.DOTALL)
+
+
+def parse_path(path):
+    """
+    :param str path: a path such as ``items[0].sku``
+    :return: the object keys (as str) and array indexes (as int) of the path
+    :rtype: tuple
+    :raises ValueError: if the path is malformed
+    """
+    tokens = []
+    position = 0
+    while position < len(path):
+        if tokens and path[position] == '.':
+            position += 1
+        match = _PATH_TOKEN.match(path, position)
+        if match is None:
+            raise ValueError('Malformed path {path!r}'.format(path=path))
+        key, index = match.groups()
+        tokens.append(key if key is not None else int(index))
+        position = match.end()
+    if not tokens:
+        raise ValueError('Empty path')
+    return tuple(tokens)
+
+
+class Predicate(object):
+    """
+    A condition on the value at a path.
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: the path of the value tested
+        """
+        self.path = path
+
+    def __call__(self, value):
+        raise NotImplementedError
+
+
+class Equals(Predicate):
+
+    def __init__(self, path, value):
+        Predicate.__init__(self, path)
+        self.value = value
+
+    def __call__(self, value):
+        return value == self.value
+
+
+class OneOf(Predicate):
+
+    def __init__(self, path, values):
+        Predicate.__init__(self, path)
+        self.values = frozenset(values)
+
+    def __call__(self, value):
+        try:
+            return value in self.values
+        except TypeError:
+            return False
+
+
+class Prefix(Predicate):
+
+    def __init__(self, path, prefix):
+        Predicate.__init__(self, path)
+        self.prefix = prefix
+
+    def __call__(self, value):
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+
+def _skip_value(text, index):
+    """
+    Finds the end of the JSON value starting at an index, without decoding it.
+
+    :return: the index just past the value
+    :rtype: int
+    """
+    first = text[index]
+    if first == '"':
+        return scanstring(text, index + 1)[1]
+    if first != '{' and first != '[':
+        match = _SCALAR.match(text, index)
+        if match is None:
+            raise ValueError('Expecting value at {index}'.format(index=index))
+        return match.end()
+    for container in _CONTAINERS:
+        match = container(text, index)
+        if match is not None:
+            return match.end()
+    # Nested deeper than the pattern, or malformed: follow the brackets one at a time.
+    content = _CONTENT.match
+    depth = 0
+    while True:
+        character = text[index]
+        if character == '{' or character == '[':
+            depth += 1
+        elif character == '}' or character == ']':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        else:
+            raise ValueError('Unterminated string at {index}'.format(index=index))
+        index = content(text, index + 1).end()
+
+
+class _Node(object):
+    __slots__ = ('paths', 'children')
+
+    def __init__(self):
+        self.paths = []
+        self.children = {}
+
+
+class _Complete(Exception):
+    pass
+
+
+class _Rejected(Exception):
+    pass
+
+
+class ProjectedBatch(object):
+    """
+    The projected fields of a batch of records.
+    """
+
+    def __init__(self, records, columns, matches, failures):
+        """
+        :param list records: the records
+        :param dict columns: a mapping of each path to a list of its values, aligned with the records
+        :param list[bool] matches: whether each record was decoded and satisfied every predicate
+        :param list[amazon_kclpy.codec.DecodeFailure] failures: the records that couldn't be scanned
+        """
+        self.records = records
+        self.columns = columns
+        self.matches = matches
+        self.failures = failures
+
+    def rows(self):
+        """
+        :return: (record, {path: value}) pairs for the matching records, in batch order
+        """
+        paths = list(self.columns)
+        columns = [self.columns[path] for path in paths]
+        return [(record, dict(zip(paths, [column[index] for column in columns])))
+                for index, record in enumerate(self.records) if self.matches[index]]
+
+
+class Projection(object):
+    """
+    Extracts a fixed set of paths, and optionally filters on them, from JSON payloads.
+    """
+
+    def __init__(self, paths, where=None, encoding='utf-8'):
+        """
+        :param list[str] paths: the paths to extract
+        :param list[Predicate] or None where: conditions every matching record satisfies. Their paths are extracted
+            too.
+        :param str encoding: the text encoding of the payloads
+        """
+        self.where = list(where or [])
+        self.paths = list(paths)
+        for predicate in self.where:
+            if predicate.path not in self.paths:
+                self.paths.append(predicate.path)
+        self.encoding = encoding
+        self._root = _Node()
+        self._predicates = {}
+        for predicate in self.where:
+            self._predicates.setdefault(predicate.path, []).append(predicate)
+        for position, path in enumerate(self.paths):
+            node = self._root
+            for token in parse_path(path):
+                node = node.children.setdefault(token, _Node())
+            node.paths.append(position)
+        self._predicate_positions = [(self.paths.index(path), predicates)
+                                     for path, predicates in self._predicates.items()]
+        self._raw_decode = JSONDecoder().raw_decode
+
+    def project_payload(self, payload):
+        """
+        Extracts the paths from a single payload.
+
+        :param bytes or str payload: the JSON document
+        :return: the value of each path (None where missing), in the order of :attr:`paths`, and whether the payload
+            satisfied every predicate
+        :rtype: tuple
+        :raises ValueError: if the payload isn't a JSON document
+        """
+        text = payload.decode(self.encoding) if isinstance(payload, bytes) else payload
+        values = [None] * len(self.paths)
+        state = [len(self.paths), values, [False] * len(self.paths)]
+        try:
+            self._scan_value(text, _WHITESPACE.match(text, 0).end(), self._root, state)
+        except _Complete:
+            pass
+        except _Rejected:
+            return values, False
+        except IndexError:
+            raise ValueError('Truncated JSON document')
+        for position, predicates in self._predicate_positions:
+            value = values[position]
+            if not all(predicate(value) for predicate in predicates):
+                return values, False
+        return values, True
+
+    def project(self, records):
+        """
+        Extracts the paths from the payloads of a batch of records.
+
+        :param records: the records, or a :class:`amazon_kclpy.messages.ProcessRecordsInput`
+        :rtype: ProjectedBatch
+        """
+        records = getattr(records, 'records', records)
+        columns = [[None] * len(records) for _ in self.paths]
+        matches = [False] * len(records)
+        failures = []
+        project_payload = self.project_payload
+        for index, record in enumerate(records):
+            try:
+                values, matches[index] = project_payload(record.binary_data)
+            except ValueError as e:
+                failures.append(DecodeFailure(index, record, e))
+                continue
+            for column, value in zip(columns, values):
+                column[index] = value
+        return ProjectedBatch(records, dict(zip(self.paths, columns)), matches, failures)
+
+    def _found(self, node, value, state):
+        for position in node.paths:
+            state[1][position] = value
+            predicates = self._predicates.get(self.paths[position])
+            if predicates is not None and not all(predicate(value) for predicate in predicates):
+                raise _Rejected()
+            if state[2][position]:
+                # A duplicate key: the path was already counted.
+                continue
+            state[2][position] = True
+            state[0] -= 1
+            if state[0] == 0:
+                raise _Complete()
+        for token, child in node.children.items():
+            if isinstance(token, int):
+                if isinstance(value, list) and token < len(value):
+                    self._found(child, value[token], state)
+            elif isinstance(value, dict) and token in value:
+                self._found(child, value[token], state)
+
+    def _scan_value(self, text, index, node, state):
+        if not node.paths:
+            first = text[index]
+            if first == '{':
+                return self._scan_object(text, index, node, state)
+            if first == '[':
+                return self._scan_array(text, index, node, state)
+        value, index = self._raw_decode(text, index)
+        self._found(node, value, state)
+        return index
+
+    def _scan_object(self, text, index, node, state):
+        whitespace = _WHITESPACE.match
+        children = node.children
+        index = whitespace(text, index + 1).end()
+        if text[index] == '}':
+            return index + 1
+        while True:
+            if text[index] != '"':
+                raise ValueError('Expecting property name at {index}'.format(index=index))
+            key, index = scanstring(text, index + 1)
+            index = whitespace(text, index).end()
+            if text[index] != ':':
+                raise ValueError("Expecting ':' at {index}".format(index=index))
+            index = whitespace(text, index + 1).end()
+            child = children.get(key)
+            if child is None:
+                index = _skip_value(text, index)
+            else:
+                index = self._scan_value(text, index, child, state)
+            index = whitespace(text, index).end()
+            separator = text[index]
+            if separator == ',':
+                index = whitespace(text, index + 1).end()
+            elif separator == '}':
+                return index + 1
+            else:
+                raise ValueError("Expecting ',' or '}}' at {index}".format(index=index))
+
+    def _scan_array(self, text, index, node, state):
+        whitespace = _WHITESPACE.match
+        children = node.children
+        index = whitespace(text, index + 1).end()
+        if text[index] == ']':
+            return index + 1
+        position = 0
+        while True:
+            child = children.get(position)
+            if child is None:
+                index = _skip_value(text, index)
+            else:
+                index = self._scan_value(text, index, child, state)
+            index = whitespace(text, index).end()
+            separator = text[index]
+            if separator == ',':
+                index = whitespace(text, index + 1).end()
+                position += 1
+            elif separator == ']':
+                return index + 1
+            else:
+                raise ValueError("Expecting ',' or ']' at {index}".format(index=index))
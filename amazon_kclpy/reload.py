@@ -0,0 +1,68 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Lets a :class:`amazon_kclpy.kcl.KCLProcess` pick up changes to the record processor's code without giving up the
+lease on its shard.  The record processor must live in an importable module (not the ``__main__`` script)::
+
+    from amazon_kclpy import kcl
+    from amazon_kclpy.reload import ModuleReloader
+    from my_app import handlers
+
+    kcl.KCLProcess(handlers.RecordProcessor(), reloader=ModuleReloader('my_app.handlers')).run()
+
+Between dispatches the process checks whether the module's source file has changed.  When it has, the module is
+reloaded, a new record processor is created, and it takes over from the old one.  See
+:meth:`amazon_kclpy.v3.processor.RecordProcessorBase.handoff_state` and
+:meth:`amazon_kclpy.v3.processor.RecordProcessorBase.resume` for how state is carried over.
+"""
+import importlib
+import os
+import time
+
+
+class ModuleReloader(object):
+    """
+    Watches the source file of a module and creates a new record processor from it when it changes.
+    """
+
+    def __init__(self, module_name, class_name='RecordProcessor', poll_interval=2.0, factory=None):
+        """
+        :param str module_name: the fully qualified name of the module containing the record processor
+        :param str class_name: the name of the record processor class in the module, used if no factory is given
+        :param float poll_interval: the minimum number of seconds between checks of the source file
+        :param factory: an optional callable that receives the reloaded module and returns a new record processor
+        """
+        self.module_name = module_name
+        self.class_name = class_name
+        self.poll_interval = poll_interval
+        self.factory = factory
+        self._module = importlib.import_module(module_name)
+        self._modified = self._source_modified()
+        self._next_poll = time.time() + poll_interval
+
+    def _source_modified(self):
+        try:
+            return os.stat(self._module.__file__).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def poll(self):
+        """
+        Checks, at most once per poll interval, whether the module has changed.
+
+        :return: a new record processor if the module was reloaded, otherwise None
+        :raises Exception: whatever the module raised while being reloaded, or the new record processor raised while
+            being created.  The same change won't be attempted again.
+        """
+        now = time.time()
+        if now < self._next_poll:
+            return None
+        self._next_poll = now + self.poll_interval
+        modified = self._source_modified()
+        if modified is None or modified == self._modified:
+            return None
+        self._modified = modified
+        self._module = importlib.reload(self._module)
+        if self.factory is not None:
+            return self.factory(self._module)
+        return getattr(self._module, self.class_name)()
@@ -0,0 +1,223 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Replays a capture recorded by :mod:`amazon_kclpy.capture` into a record processor, so that changes to it can be
+profiled against real traffic without a MultiLangDaemon or a stream::
+
+    kclpy-replay capture.jsonl.gz my_app.handlers:RecordProcessor
+    kclpy-replay --original-timing --speed 4 capture.jsonl.gz my_app.handlers:RecordProcessor
+
+The record processor is created by calling the named class (or any other callable) with no arguments, and is run by a
+:class:`amazon_kclpy.kcl.KCLProcess` exactly as under the MultiLangDaemon.  Actions are delivered as fast as the
+record processor handles them, or, with ``--original-timing``, at the times they were originally received divided by
+``--speed``.
+
+Checkpoint requests are answered with the responses recorded during the same action, in order, so checkpoint failures
+are reproduced.  If the record processor checkpoints more often than the recorded one did, the extra checkpoints
+succeed.  The status messages the record processor writes are discarded.
+
+Once the capture is exhausted the throughput and the phase timings of :class:`amazon_kclpy.instrumentation
+.InstrumentationHook` are reported.
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+
+from amazon_kclpy import kcl
+from amazon_kclpy.capture import INBOUND, read_capture
+from amazon_kclpy.instrumentation import InstrumentationHook, MetricSink
+
+
+class CapturedAction(object):
+    """
+    An action read from a capture, along with the checkpoint responses that were received while it was dispatched.
+    """
+
+    def __init__(self, time, line):
+        """
+        :param float time: when the action was received
+        :param str line: the action message
+        """
+        self.time = time
+        self.line = line
+        self.checkpoint_responses = []
+
+
+def load_actions(path):
+    """
+    Reads the actions in a capture file.
+
+    :param str path: the capture file
+    :return: the actions, in the order they were received
+    :rtype: list[CapturedAction]
+    """
+    actions = []
+    for entry in read_capture(path):
+        if entry['direction'] != INBOUND:
+            continue
+        line = entry['line']
+        if json.loads(line).get('action') == 'checkpoint' and actions:
+            actions[-1].checkpoint_responses.append(line)
+        else:
+            actions.append(CapturedAction(entry['time'], line))
+    return actions
+
+
+class _ReplayInput(object):
+    """
+    Stands in for the MultiLangDaemon's end of the record processor's stdin.
+    """
+
+    def __init__(self, actions, original_timing, speed):
+        self._actions = iter(actions)
+        self._original_timing = original_timing
+        self._speed = speed
+        self._first_time = actions[0].time if actions else 0
+        self._started = None
+        self._responses = []
+        self.checkpoint_request = None
+        self.actions = 0
+
+    def readline(self):
+        if self.checkpoint_request is not None:
+            request, self.checkpoint_request = self.checkpoint_request, None
+            if self._responses:
+                return self._responses.pop(0) + '\n'
+            return json.dumps({'action': 'checkpoint', 'sequenceNumber': request.get('sequenceNumber'),
+                               'subSequenceNumber': request.get('subSequenceNumber')}) + '\n'
+        action = next(self._actions, None)
+        if action is None:
+            return ''
+        if self._started is None:
+            self._started = time.time()
+        elif self._original_timing:
+            delay = self._started + (action.time - self._first_time) / self._speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self._responses = list(action.checkpoint_responses)
+        self.actions += 1
+        return action.line + '\n'
+
+
+class _ReplayOutput(object):
+    """
+    Stands in for the MultiLangDaemon's end of the record processor's stdout, noticing checkpoint requests.
+    """
+
+    def __init__(self, replay_input):
+        self._input = replay_input
+
+    def write(self, text):
+        for line in text.splitlines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message.get('action') == 'checkpoint':
+                self._input.checkpoint_request = message
+
+    def flush(self):
+        pass
+
+
+class _CollectingSink(MetricSink):
+
+    def __init__(self):
+        self.metrics = []
+
+    def emit(self, timestamp, metrics):
+        self.metrics.extend(metrics)
+
+
+def replay(path, record_processor, original_timing=False, speed=1.0, error_file=sys.stderr):
+    """
+    Replays a capture into a record processor.
+
+    :param str path: the capture file
+    :param record_processor: the record processor to replay into
+    :param bool original_timing: whether to deliver actions at their original times, rather than as fast as possible
+    :param float speed: with original timing, how many times faster than the original actions are delivered
+    :param file error_file: where the record processor's errors are written
+    :return: a dictionary of the elapsed ``seconds``, ``actions``, ``records``, ``bytes``, ``records_per_second``,
+        ``megabytes_per_second`` and the instrumentation ``metrics``
+    :rtype: dict
+    """
+    actions = load_actions(path)
+    replay_input = _ReplayInput(actions, original_timing, speed)
+    sink = _CollectingSink()
+    hook = InstrumentationHook(sink, flush_interval=float('inf'))
+    process = kcl.KCLProcess(record_processor, input_file=replay_input, output_file=_ReplayOutput(replay_input),
+                             error_file=error_file, hooks=[hook], capture='')
+    started = time.perf_counter()
+    process.run()
+    elapsed = time.perf_counter() - started
+    counters = dict((name, value) for name, value, _ in sink.metrics)
+    records = counters.get('kclpy.processRecords.records', 0)
+    total_bytes = counters.get('kclpy.processRecords.bytes', 0)
+    return {
+        'seconds': elapsed,
+        'actions': replay_input.actions,
+        'records': records,
+        'bytes': total_bytes,
+        'records_per_second': records / elapsed if elapsed > 0 else 0.0,
+        'megabytes_per_second': total_bytes / elapsed / 1e6 if elapsed > 0 else 0.0,
+        'metrics': sink.metrics,
+    }
+
+
+def render(report):
+    """
+    Formats a replay report for display.
+
+    :param dict report: the report returned by :func:`replay`
+    :rtype: str
+    """
+    lines = [
+        'Replayed {a} actions and {r} records ({b} bytes) in {s:.3f} seconds'.format(
+            a=report['actions'], r=report['records'], b=report['bytes'], s=report['seconds']),
+        '{r:.1f} records/s, {m:.3f} MB/s'.format(r=report['records_per_second'], m=report['megabytes_per_second']),
+        '',
+        'Phase timings (milliseconds) and counts:',
+    ]
+    for name, value, _ in report['metrics']:
+        lines.append('  {n} {v}'.format(n=name, v=value))
+    return '\n'.join(lines)
+
+
+def _load_factory(spec):
+    module_name, _, attribute = spec.partition(':')
+    if not attribute:
+        raise ValueError('Expected module:attribute, got {spec}'.format(spec=spec))
+    target = importlib.import_module(module_name)
+    for name in attribute.split('.'):
+        target = getattr(target, name)
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replays a kclpy protocol capture into a record processor and '
+                                                 'reports throughput and phase timings.')
+    parser.add_argument('capture', help='The capture file to replay.')
+    parser.add_argument('processor',
+                        help='The record processor as module:callable, called with no arguments to create it.')
+    parser.add_argument('-t', '--original-timing', dest='original_timing', action='store_true',
+                        help='Deliver actions at the times they were originally received. Default is as fast as '
+                             'possible.')
+    parser.add_argument('-s', '--speed', dest='speed', type=float, default=1.0,
+                        help='With original timing, how many times faster than the original to replay. Default is 1.')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, '')
+    try:
+        factory = _load_factory(args.processor)
+    except (ImportError, AttributeError, ValueError) as e:
+        sys.stderr.write('Unable to load the record processor {p}: {e}\n'.format(p=args.processor, e=e))
+        return 1
+    report = replay(args.capture, factory(), original_timing=args.original_timing, speed=args.speed)
+    sys.stdout.write(render(report) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
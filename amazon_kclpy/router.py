@@ -0,0 +1,233 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+A record processor that routes records to handlers by partition key::
+
+    from amazon_kclpy import kcl
+    from amazon_kclpy.router import PartitionKeyRouter, prefix, regex
+
+    router = PartitionKeyRouter([
+        prefix('orders:refund:', RefundsProcessor()),
+        prefix('orders:', OrdersProcessor()),
+        regex(r'user-\\d+$', UsersProcessor()),
+    ], default=OtherProcessor())
+    kcl.KCLProcess(router).run()
+
+Handlers are v3 record processors (see :class:`amazon_kclpy.v3.processor.RecordProcessorBase`).  A record goes to the
+first rule in the table that matches its partition key, as in an ``if``/``elif`` chain, so more specific rules go
+first.  Prefix rules are compiled into a trie.  Regex rules are matched from the start of the key like
+:func:`re.match`; those without groups or inline flags are compiled into one alternation, and the others, whose group
+names and backreferences would clash in it, are matched one at a time.  The rule chosen for each distinct key is
+remembered.  Records no rule matches go to
+``default``, or are skipped if there isn't one.
+
+Each batch is split into a sub-batch per handler in one pass, keeping the order of the records, and each handler with
+records is given its sub-batch.  Handlers can't checkpoint themselves: their checkpointers ignore every call.  Once
+every handler has returned, the router checkpoints at the last record of the batch, so a batch is never checkpointed
+before all of it is handled.  If a handler raises, the batch isn't checkpointed and the error is raised.  Lifecycle
+calls are passed to every handler, and the router checkpoints the end of the shard after they return.
+"""
+import re
+
+from amazon_kclpy import messages
+from amazon_kclpy.v3 import processor
+
+
+class Rule(object):
+    """
+    Routes the records whose partition key matches to a handler.
+    """
+
+    def __init__(self, kind, value, handler):
+        """
+        :param str kind: ``prefix`` or ``regex``
+        :param str value: the prefix or pattern
+        :param handler: the record processor given matching records
+        """
+        if kind not in ('prefix', 'regex'):
+            raise ValueError('Unknown rule kind {k}'.format(k=kind))
+        self.kind = kind
+        self.value = value
+        self.handler = handler
+
+
+def prefix(value, handler):
+    """
+    :param str value: the partition key prefix
+    :param handler: the record processor given records whose partition key starts with the prefix
+    :rtype: Rule
+    """
+    return Rule('prefix', value, handler)
+
+
+def regex(pattern, handler):
+    """
+    :param str pattern: a regular expression matched from the start of the partition key
+    :param handler: the record processor given records whose partition key matches
+    :rtype: Rule
+    """
+    return Rule('regex', pattern, handler)
+
+
+class _HeldCheckpointer(object):
+    """
+    Given to handlers, so checkpoints are only made by the router.
+    """
+
+    def checkpoint(self, sequence_number=None, sub_sequence_number=None):
+        pass
+
+
+class PartitionKeyRouter(processor.RecordProcessorBase):
+    """
+    Splits each batch into sub-batches by partition key, and gives each to its handler.
+    """
+
+    def __init__(self, rules, default=None, checkpoint=True, max_cached_keys=100000):
+        """
+        :param list[Rule] rules: the routing table, in order of precedence
+        :param default: the record processor given records no rule matches, None to skip them
+        :param bool checkpoint: whether the router checkpoints after every batch
+        :param int max_cached_keys: the most partition keys whose route is remembered
+        """
+        self.rules = list(rules)
+        self.default = default
+        self.checkpoint = checkpoint
+        self.max_cached_keys = max_cached_keys
+        self.handlers = [rule.handler for rule in self.rules]
+        if default is not None:
+            self.handlers.append(default)
+        self.unmatched = 0
+        self._default_index = len(self.rules) if default is not None else None
+        self._distinct = []
+        self._slots = []
+        slots = {}
+        for handler in self.handlers:
+            if id(handler) not in slots:
+                slots[id(handler)] = len(self._distinct)
+                self._distinct.append(handler)
+            self._slots.append(slots[id(handler)])
+        self._checkpointer = _HeldCheckpointer()
+        self._routes = {}
+
+        self._trie = {}
+        for index, rule in enumerate(self.rules):
+            if rule.kind == 'prefix':
+                node = self._trie
+                for character in rule.value:
+                    node = node.setdefault(character, {})
+                node.setdefault(None, index)
+        patterns = []
+        self._separate = []
+        plain_flags = re.compile('').flags
+        for index, rule in enumerate(self.rules):
+            if rule.kind == 'regex':
+                compiled = re.compile(rule.value)
+                if compiled.groups or compiled.flags != plain_flags:
+                    self._separate.append((index, compiled))
+                else:
+                    patterns.append((index, rule.value))
+        self._regex = None
+        if patterns:
+            self._regex = re.compile('|'.join('(?P<_rule{i}>{p})'.format(i=index, p=pattern)
+                                              for index, pattern in patterns))
+            self._regex_groups = [(self._regex.groupindex['_rule{i}'.format(i=index)], index)
+                                  for index, _ in patterns]
+            self._first_regex = patterns[0][0]
+
+    def route(self, partition_key):
+        """
+        :param str partition_key: a partition key
+        :return: the index in :attr:`handlers` of the handler for the key, or None if it's skipped
+        :rtype: int or None
+        """
+        node = self._trie
+        best = node.get(None)
+        for character in partition_key:
+            node = node.get(character)
+            if node is None:
+                break
+            index = node.get(None)
+            if index is not None and (best is None or index < best):
+                best = index
+        if self._regex is not None and (best is None or self._first_regex < best):
+            match = self._regex.match(partition_key)
+            if match is not None:
+                for group, index in self._regex_groups:
+                    if match.start(group) != -1:
+                        if best is None or index < best:
+                            best = index
+                        break
+        for index, compiled in self._separate:
+            if best is not None and index > best:
+                break
+            if compiled.match(partition_key) is not None:
+                best = index
+                break
+        return best if best is not None else self._default_index
+
+    def split(self, records):
+        """
+        Splits records into a sub-batch per handler in one pass, keeping their order.  A handler used by more than
+        one rule is given a single sub-batch.
+
+        :param list records: the records
+        :return: the records for each distinct handler, in the order of :attr:`handlers`, and the number that were
+            skipped
+        :rtype: tuple
+        """
+        routes = self._routes
+        if len(routes) > self.max_cached_keys:
+            routes = self._routes = {}
+        batches = [[] for _ in self._distinct]
+        appends = [batch.append for batch in batches]
+        route = self.route
+        slots = self._slots
+        skipped = 0
+        for record in records:
+            partition_key = record.partition_key
+            try:
+                slot = routes[partition_key]
+            except KeyError:
+                index = route(partition_key)
+                slot = routes[partition_key] = slots[index] if index is not None else None
+            if slot is None:
+                skipped += 1
+            else:
+                appends[slot](record)
+        return batches, skipped
+
+    def _distinct_handlers(self):
+        return self._distinct
+
+    def initialize(self, initialize_input):
+        for handler in self._distinct_handlers():
+            handler.initialize(initialize_input)
+
+    def process_records(self, process_records_input):
+        records = process_records_input.records
+        batches, skipped = self.split(records)
+        self.unmatched += skipped
+        for handler, batch in zip(self._distinct, batches):
+            if batch:
+                sub_batch = messages.ProcessRecordsInput({'action': process_records_input.action, 'records': batch,
+                                                          'millisBehindLatest':
+                                                              process_records_input.millis_behind_latest})
+                sub_batch.dispatch(self._checkpointer, handler)
+        if self.checkpoint and records:
+            last = records[-1]
+            process_records_input.checkpointer.checkpoint(last.sequence_number, last.sub_sequence_number)
+
+    def lease_lost(self, lease_lost_input):
+        for handler in self._distinct_handlers():
+            handler.lease_lost(lease_lost_input)
+
+    def shard_ended(self, shard_ended_input):
+        for handler in self._distinct_handlers():
+            messages.ShardEndedInput({'action': shard_ended_input.action}).dispatch(self._checkpointer, handler)
+        shard_ended_input.checkpointer.checkpoint()
+
+    def shutdown_requested(self, shutdown_requested_input):
+        for handler in self._distinct_handlers():
+            messages.ShutdownRequestedInput({'action': shutdown_requested_input.action}).dispatch(
+                self._checkpointer, handler)
@@ -0,0 +1,244 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Predicts the shard each record will be put on, and shapes puts to each shard's write limits::
+
+    import boto3
+    from amazon_kclpy.producer import KinesisProducer
+    from amazon_kclpy.shards import ShardMap, ShardRateLimiter
+
+    client = boto3.client('kinesis')
+    limiter = ShardRateLimiter(ShardMap(client, 'my-stream'))
+    producer = KinesisProducer('my-stream', client=client, shaper=limiter)
+
+Kinesis puts a record on the open shard whose hash key range holds the MD5 digest of its partition key, read as a 128
+bit big endian integer, or its explicit hash key if it has one.  :class:`ShardMap` caches the hash key ranges of the
+open shards from ``ListShards``, refreshing them every ``refresh_interval`` seconds, and maps a batch of keys to shards
+by hashing each distinct key once and bisecting the sorted range starts.
+
+:class:`ShardRateLimiter` keeps a token bucket of records and one of bytes for each shard, refilled at the shard's
+write limits of 1,000 records and 1 MiB of data and partition keys per second.  A
+:class:`amazon_kclpy.producer.KinesisProducer` with the limiter as its ``shaper`` only sends the records whose shards
+have tokens, and holds the rest back until they do, instead of sending them to be throttled.  Once a record for a shard
+is held back, the later records for that shard in the same batch are too, so they keep their order.
+
+The limits are only enforced within one process.  Give each producer a share of them if several write to the same
+shards.
+"""
+import bisect
+import hashlib
+import threading
+import time
+
+MAX_HASH_KEY = 2 ** 128 - 1
+SHARD_RECORDS_PER_SECOND = 1000
+SHARD_BYTES_PER_SECOND = 1024 * 1024
+
+
+def hash_key(partition_key):
+    """
+    :param str partition_key: a partition key
+    :return: the hash key Kinesis computes for it
+    :rtype: int
+    """
+    return int.from_bytes(hashlib.md5(partition_key.encode('utf-8')).digest(), 'big')
+
+
+class ShardMap(object):
+    """
+    The hash key ranges of a stream's open shards.
+    """
+
+    def __init__(self, client, stream_name, refresh_interval=60.0, max_cached_keys=100000, clock=time.monotonic):
+        """
+        :param client: a Kinesis client
+        :param str stream_name: the stream
+        :param float refresh_interval: the seconds between ``ListShards`` calls
+        :param int max_cached_keys: the most partition key hashes remembered between batches
+        :param clock: returns a monotonic time in seconds
+        """
+        self.client = client
+        self.stream_name = stream_name
+        self.refresh_interval = refresh_interval
+        self.max_cached_keys = max_cached_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._starts = None
+        self._shard_ids = None
+        self._refreshed = None
+        self._hashes = {}
+
+    def refresh(self):
+        """
+        Lists the stream's shards, and keeps the hash key ranges of the open ones.
+        """
+        shards = []
+        arguments = {'StreamName': self.stream_name}
+        while True:
+            response = self.client.list_shards(**arguments)
+            shards.extend(response['Shards'])
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+            arguments = {'NextToken': next_token}
+        ranges = sorted((int(shard['HashKeyRange']['StartingHashKey']), shard['ShardId']) for shard in shards
+                        if 'EndingSequenceNumber' not in shard['SequenceNumberRange'])
+        with self._lock:
+            self._starts = [start for start, _ in ranges]
+            self._shard_ids = [shard_id for _, shard_id in ranges]
+            self._refreshed = self.clock()
+
+    def _ranges(self):
+        if self._refreshed is None:
+            self.refresh()
+        elif self.clock() - self._refreshed >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception:
+                #
+                # Keep using the ranges already known, and try again after another interval.
+                #
+                with self._lock:
+                    self._refreshed = self.clock()
+        with self._lock:
+            return self._starts, self._shard_ids
+
+    @property
+    def shard_ids(self):
+        """
+        The ids of the open shards, in hash key order.
+        """
+        return list(self._ranges()[1])
+
+    def shards_for(self, partition_keys, explicit_hash_keys=None):
+        """
+        Predicts the shard of each record in a batch.
+
+        :param list[str] partition_keys: the partition key of each record
+        :param list or None explicit_hash_keys: the explicit hash key of each record, or None for records without one
+        :return: the id of each record's shard, or None if the stream has no open shards
+        :rtype: list
+        """
+        starts, shard_ids = self._ranges()
+        if not starts:
+            return [None] * len(partition_keys)
+        hashes = self._hashes
+        if len(hashes) > self.max_cached_keys:
+            hashes = self._hashes = {}
+        for partition_key in set(partition_keys).difference(hashes):
+            hashes[partition_key] = hash_key(partition_key)
+        keys = [hashes[partition_key] for partition_key in partition_keys]
+        if explicit_hash_keys is not None:
+            keys = [int(explicit) if explicit is not None else key for key, explicit in zip(keys, explicit_hash_keys)]
+        shards = {}
+        result = []
+        for key in keys:
+            shard_id = shards.get(key)
+            if shard_id is None:
+                shard_id = shards[key] = shard_ids[max(bisect.bisect_right(starts, key) - 1, 0)]
+            result.append(shard_id)
+        return result
+
+    def shard_for(self, partition_key, explicit_hash_key=None):
+        """
+        :param str partition_key: a record's partition key
+        :param str or None explicit_hash_key: the record's explicit hash key
+        :return: the id of the shard the record will be put on
+        :rtype: str or None
+        """
+        return self.shards_for([partition_key], [explicit_hash_key])[0]
+
+
+class TokenBucket(object):
+    """
+    Tokens refilled at a steady rate, up to a capacity.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        """
+        :param float rate: the tokens added per second
+        :param float capacity: the most tokens held
+        :param float now: the current time, in seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount):
+        """
+        :param float amount: the tokens needed, at most the capacity
+        :return: the seconds until the bucket holds them, as of its last refill
+        :rtype: float
+        """
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+
+class ShardRateLimiter(object):
+    """
+    Admits records while their shard has records and bytes left in its write limits.
+    """
+
+    def __init__(self, shard_map, records_per_second=SHARD_RECORDS_PER_SECOND,
+                 bytes_per_second=SHARD_BYTES_PER_SECOND, clock=time.monotonic):
+        """
+        :param ShardMap shard_map: predicts the shard of each record
+        :param float records_per_second: the records each shard is sent per second
+        :param float bytes_per_second: the bytes of data and partition keys each shard is sent per second
+        :param clock: returns a monotonic time in seconds
+        """
+        self.shard_map = shard_map
+        self.records_per_second = records_per_second
+        self.bytes_per_second = bytes_per_second
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def admit(self, requests):
+        """
+        Takes tokens for the records that can be sent now.
+
+        :param list[dict] requests: PutRecords request entries
+        :return: whether each record was admitted, and the seconds until the next one held back could be
+        :rtype: tuple
+        """
+        shard_ids = self.shard_map.shards_for([request['PartitionKey'] for request in requests],
+                                              [request.get('ExplicitHashKey') for request in requests])
+        admitted = []
+        blocked = set()
+        wait = None
+        with self._lock:
+            now = self.clock()
+            buckets = self._buckets
+            for request, shard_id in zip(requests, shard_ids):
+                if shard_id is None:
+                    admitted.append(True)
+                    continue
+                if shard_id in blocked:
+                    admitted.append(False)
+                    continue
+                pair = buckets.get(shard_id)
+                if pair is None:
+                    pair = buckets[shard_id] = (TokenBucket(self.records_per_second, self.records_per_second, now),
+                                                TokenBucket(self.bytes_per_second, self.bytes_per_second, now))
+                records, size = pair
+                records.refill(now)
+                size.refill(now)
+                request_size = len(request['Data']) + len(request['PartitionKey'].encode('utf-8'))
+                if records.tokens >= 1 and size.tokens >= min(request_size, size.capacity):
+                    records.tokens -= 1
+                    size.tokens -= request_size
+                    admitted.append(True)
+                else:
+                    blocked.add(shard_id)
+                    admitted.append(False)
+                    shard_wait = max(records.wait_time(1), size.wait_time(request_size))
+                    wait = shard_wait if wait is None else min(wait, shard_wait)
+        return admitted, wait or 0.0
@@ -0,0 +1,275 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Publishes per shard counters and gauges into a host wide shared memory segment.
+
+Every record processor process that is given a :class:`SharedMetricsHook` claims a fixed size slot in a memory mapped
+file (by default under ``/dev/shm``).  Updates are plain memory writes into the mapping, so publishing adds no system
+calls to the processing path.  Each slot has a single writer, and readers use the slot's sequence counter to discard
+torn reads, so no locks are taken while publishing.  The ``kclpy-top`` command (:mod:`amazon_kclpy.top`) reads every
+slot on the host to render live per shard rates.
+
+Claiming and releasing slots uses ``fcntl`` file locks, so this module is only available on POSIX platforms.
+"""
+import atexit
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from amazon_kclpy._locking import FileLock, pid_alive
+from amazon_kclpy.hooks import ProcessHook, payload_size
+
+SEGMENT_ENV_VAR = 'KCLPY_METRICS_SEGMENT'
+DEFAULT_SLOT_COUNT = 256
+
+_MAGIC = b'KCLPYSHM'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIII')
+_SEQUENCE = struct.Struct('<Q')
+_SLOT = struct.Struct('<Qq64sddQQQQqQQddQ')
+
+SLOT_FIELDS = (
+    'sequence',
+    'pid',
+    'shard_id',
+    'started',
+    'updated',
+    'batches',
+    'records',
+    'bytes',
+    'last_batch_size',
+    'millis_behind_latest',
+    'checkpoints',
+    'checkpoint_errors',
+    'last_checkpoint_millis',
+    'total_checkpoint_millis',
+    'dispatch_errors',
+)
+
+
+def default_segment_path():
+    """
+    The location of the shared segment, which can be overridden with the ``KCLPY_METRICS_SEGMENT`` environment
+    variable.
+
+    :return: the path to the segment file
+    :rtype: str
+    """
+    path = os.environ.get(SEGMENT_ENV_VAR)
+    if path:
+        return path
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'amazon_kclpy_metrics')
+
+
+class SharedMetricsSegment(object):
+    """
+    A memory mapped file holding a header followed by a fixed number of fixed layout slots.
+    """
+
+    def __init__(self, path=None, slot_count=DEFAULT_SLOT_COUNT, create=True):
+        """
+        Opens, and if needed creates, the segment.
+
+        :param str or None path: the segment file, defaults to :func:`default_segment_path`
+        :param int slot_count: the number of slots to create the segment with. An existing segment keeps its own
+            slot count.
+        :param bool create: whether a missing segment should be created
+
+        :raises ValueError: if the file exists but isn't a metrics segment
+        """
+        self.path = path or default_segment_path()
+        flags = os.O_RDWR | os.O_CREAT if create else os.O_RDONLY
+        self._fd = os.open(self.path, flags, 0o644)
+        try:
+            if create:
+                with self._locked():
+                    if os.fstat(self._fd).st_size == 0:
+                        os.ftruncate(self._fd, _HEADER.size + slot_count * _SLOT.size)
+                        os.pwrite(self._fd, _HEADER.pack(_MAGIC, _VERSION, slot_count, _SLOT.size), 0)
+            header = os.pread(self._fd, _HEADER.size, 0)
+            if len(header) != _HEADER.size:
+                raise ValueError("{path} is not a kclpy metrics segment".format(path=self.path))
+            magic, version, self.slot_count, slot_size = _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION or slot_size != _SLOT.size:
+                raise ValueError("{path} is not a version {v} kclpy metrics segment".format(path=self.path,
+                                                                                          v=_VERSION))
+            access = mmap.ACCESS_WRITE if create else mmap.ACCESS_READ
+            self._map = mmap.mmap(self._fd, _HEADER.size + self.slot_count * _SLOT.size, access=access)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _locked(self):
+        return FileLock(self._fd)
+
+    def _offset(self, index):
+        return _HEADER.size + index * _SLOT.size
+
+    def claim(self, shard_id):
+        """
+        Claims a free slot for the current process. Slots held by processes that are no longer alive are reused.
+
+        :param str shard_id: the shard the slot will report for
+        :return: the index of the claimed slot, or None if every slot is in use
+        :rtype: int or None
+        """
+        pid = os.getpid()
+        with self._locked():
+            for index in range(self.slot_count):
+                owner = self.read_slot(index)
+                if owner is not None and owner['pid'] != pid and pid_alive(owner['pid']):
+                    continue
+                now = time.time()
+                self._map[self._offset(index):self._offset(index + 1)] = _SLOT.pack(
+                    0, pid, shard_id.encode('utf-8')[:64], now, now, 0, 0, 0, 0, -1, 0, 0, 0.0, 0.0, 0)
+                return index
+        return None
+
+    def release(self, index):
+        """
+        Marks a slot as free.
+
+        :param int index: the slot to release
+        """
+        with self._locked():
+            self._map[self._offset(index):self._offset(index + 1)] = b'\0' * _SLOT.size
+
+    def publish(self, index, values):
+        """
+        Writes the values of a slot. The sequence counter is made odd while the slot is being written so readers can
+        detect, and retry, a torn read.
+
+        :param int index: the slot to write
+        :param tuple values: values for every field in :data:`SLOT_FIELDS` apart from ``sequence``
+        """
+        offset = self._offset(index)
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0] + 1
+        _SEQUENCE.pack_into(self._map, offset, sequence)
+        _SLOT.pack_into(self._map, offset, sequence, *values)
+        _SEQUENCE.pack_into(self._map, offset, sequence + 1)
+
+    def read_slot(self, index, retries=100):
+        """
+        Reads a consistent copy of a slot.
+
+        :param int index: the slot to read
+        :param int retries: how many times to retry if the slot is being written to
+        :return: the slot's fields, or None if the slot is free
+        :rtype: dict or None
+        """
+        offset = self._offset(index)
+        for _ in range(retries):
+            raw = self._map[offset:offset + _SLOT.size]
+            values = _SLOT.unpack(raw)
+            if values[0] % 2 == 0 and _SEQUENCE.unpack_from(self._map, offset)[0] == values[0]:
+                break
+        if values[1] == 0:
+            return None
+        slot = dict(zip(SLOT_FIELDS, values))
+        slot['shard_id'] = slot['shard_id'].rstrip(b'\0').decode('utf-8', 'replace')
+        slot['slot'] = index
+        return slot
+
+    def read_slots(self):
+        """
+        Reads every occupied slot.
+
+        :return: the occupied slots
+        :rtype: list[dict]
+        """
+        slots = (self.read_slot(index) for index in range(self.slot_count))
+        return [slot for slot in slots if slot is not None]
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class SharedMetricsHook(ProcessHook):
+    """
+    Publishes throughput, batch size, ``millis_behind_latest`` and checkpoint latency for this process's shard into
+    the host wide :class:`SharedMetricsSegment`.  A slot is claimed when the shard is initialized, and released when
+    the process finishes or exits.
+    """
+
+    def __init__(self, path=None, slot_count=DEFAULT_SLOT_COUNT):
+        """
+        :param str or None path: the segment file, defaults to :func:`default_segment_path`
+        :param int slot_count: the number of slots to create the segment with, if it doesn't exist yet
+        """
+        self._path = path
+        self._slot_count = slot_count
+        self._segment = None
+        self._index = None
+        self._shard_id = ''
+        self._encoded_shard_id = b''
+        self._pid = None
+        self._started = 0.0
+        self._batches = 0
+        self._records = 0
+        self._bytes = 0
+        self._last_batch_size = 0
+        self._millis_behind_latest = -1
+        self._checkpoints = 0
+        self._checkpoint_errors = 0
+        self._last_checkpoint_millis = 0.0
+        self._total_checkpoint_millis = 0.0
+        self._dispatch_errors = 0
+
+    def _claim(self, shard_id):
+        if self._segment is None:
+            self._segment = SharedMetricsSegment(self._path, self._slot_count)
+            atexit.register(self.close)
+        elif self._index is not None:
+            self._segment.release(self._index)
+        self._shard_id = shard_id
+        self._encoded_shard_id = shard_id.encode('utf-8')[:64]
+        self._pid = os.getpid()
+        self._started = time.time()
+        self._index = self._segment.claim(shard_id)
+
+    def _publish(self):
+        if self._index is None:
+            return
+        self._segment.publish(self._index, (
+            self._pid, self._encoded_shard_id, self._started, time.time(), self._batches, self._records, self._bytes,
+            self._last_batch_size, self._millis_behind_latest, self._checkpoints, self._checkpoint_errors,
+            self._last_checkpoint_millis, self._total_checkpoint_millis, self._dispatch_errors))
+
+    def action_started(self, action):
+        if action.action == 'initialize':
+            self._claim(action.shard_id)
+        elif action.action == 'processRecords':
+            records = action.records
+            self._batches += 1
+            self._records += len(records)
+            self._bytes += payload_size(records)
+            self._last_batch_size = len(records)
+            if action.millis_behind_latest is not None:
+                self._millis_behind_latest = action.millis_behind_latest
+
+    def action_finished(self, action, error):
+        if error is not None:
+            self._dispatch_errors += 1
+        self._publish()
+
+    def checkpoint_finished(self, elapsed, error):
+        millis = elapsed * 1000.0
+        self._checkpoints += 1
+        if error is not None:
+            self._checkpoint_errors += 1
+        self._last_checkpoint_millis = millis
+        self._total_checkpoint_millis += millis
+        self._publish()
+
+    def close(self):
+        if self._segment is None:
+            return
+        if self._index is not None:
+            self._segment.release(self._index)
+            self._index = None
+        self._segment.close()
+        self._segment = None
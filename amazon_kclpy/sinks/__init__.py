@@ -0,0 +1,5 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Sinks write the records given to a record processor somewhere durable, and checkpoint once they have been written.
+"""
@@ -0,0 +1,201 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Writes records to local columnar files, and checkpoints once each file is durable::
+
+    from amazon_kclpy.sinks.columnar import ColumnarFileSink
+
+    class RecordProcessor(processor.RecordProcessorBase):
+
+        def initialize(self, initialize_input):
+            self.sink = ColumnarFileSink('/var/spool/events', prefix=initialize_input.shard_id)
+
+        def process_records(self, process_records_input):
+            self.sink.add(process_records_input)
+
+        def shutdown_requested(self, shutdown_requested_input):
+            self.sink.flush(shutdown_requested_input.checkpointer)
+
+Records are buffered column by column across batches.  When the buffered payloads reach ``max_bytes``, or the oldest
+buffered record is ``max_age`` seconds old, the buffer is written to a temporary file, which is fsynced and atomically
+renamed to its final name (``<prefix>-<first sequence number>-<last sequence number>.<format>``).  Only then is the
+checkpointer of the current dispatch called, at the last record in the file, so a record is never checkpointed before
+it's on disk.  Age is checked as batches arrive, so an idle shard keeps its buffer until the next batch or a flush.
+
+Files are written as Parquet or Arrow IPC when ``pyarrow`` is installed (the ``parquet`` extra), otherwise as CSV with
+base64 encoded payloads.  The columns are the sequence number, sub sequence number, partition key, arrival timestamp
+in milliseconds and payload of each record, followed by any columns returned by the ``extract`` function.
+"""
+import base64
+import csv
+import os
+import time
+
+PARQUET = 'parquet'
+ARROW = 'arrow'
+CSV = 'csv'
+
+RECORD_COLUMNS = ('sequence_number', 'sub_sequence_number', 'partition_key', 'arrival_millis', 'data')
+
+_EXTENSIONS = {PARQUET: 'parquet', ARROW: 'arrow', CSV: 'csv'}
+
+
+def _pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _fsync_directory(directory):
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class ColumnarFileSink(object):
+    """
+    Buffers records column wise and writes them to rolled, durable files, checkpointing after each file.
+    """
+
+    def __init__(self, directory, prefix='records', file_format=None, max_bytes=128 * 1024 * 1024, max_age=300.0,
+                 extract=None, extra_columns=(), compression='snappy', clock=time.time):
+        """
+        :param str directory: where files are written
+        :param str prefix: the start of every file name, such as the shard id
+        :param str or None file_format: :data:`PARQUET`, :data:`ARROW` or :data:`CSV`, defaults to Parquet if
+            pyarrow is installed, and CSV otherwise
+        :param int max_bytes: the payload bytes buffered before a file is written
+        :param float max_age: the seconds the oldest buffered record waits before a file is written
+        :param extract: called with each record, returns a dictionary of values for ``extra_columns``
+        :param extra_columns: the names of the columns returned by ``extract``
+        :param str compression: the Parquet compression codec
+        :param clock: returns the current time in seconds
+        """
+        if file_format is None:
+            file_format = PARQUET if _pyarrow_available() else CSV
+        if file_format not in _EXTENSIONS:
+            raise ValueError('Unknown file format {f}'.format(f=file_format))
+        if file_format != CSV and not _pyarrow_available():
+            raise ImportError('Writing {f} files requires pyarrow, install amazon_kclpy[parquet]'.format(
+                f=file_format))
+        self.directory = directory
+        self.prefix = prefix
+        self.file_format = file_format
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.extract = extract
+        self.columns = RECORD_COLUMNS + tuple(extra_columns)
+        self.compression = compression
+        self.clock = clock
+        self.files = []
+        self._reset()
+
+    def _reset(self):
+        self._buffer = dict((column, []) for column in self.columns)
+        self._buffered_bytes = 0
+        self._oldest = None
+
+    @property
+    def buffered_records(self):
+        return len(self._buffer['sequence_number'])
+
+    def add(self, process_records_input):
+        """
+        Buffers a batch of records, and writes a file and checkpoints if the buffer is full or old enough.
+
+        :param amazon_kclpy.messages.ProcessRecordsInput process_records_input: the batch
+        :return: the path of the file written, if one was
+        :rtype: str or None
+        """
+        records = process_records_input.records
+        if records:
+            if self._oldest is None:
+                self._oldest = self.clock()
+            buffer = self._buffer
+            sequence_numbers = buffer['sequence_number']
+            sub_sequence_numbers = buffer['sub_sequence_number']
+            partition_keys = buffer['partition_key']
+            arrivals = buffer['arrival_millis']
+            payloads = buffer['data']
+            extra = [(column, buffer[column]) for column in self.columns[len(RECORD_COLUMNS):]]
+            for record in records:
+                data = record.binary_data
+                sequence_numbers.append(record.sequence_number)
+                sub_sequence_numbers.append(record.sub_sequence_number)
+                partition_keys.append(record.partition_key)
+                arrivals.append(record.timestamp_millis)
+                payloads.append(data)
+                self._buffered_bytes += len(data)
+                if extra:
+                    values = self.extract(record)
+                    for column, values_column in extra:
+                        values_column.append(values.get(column))
+        if self._buffered_bytes >= self.max_bytes or \
+                (self._oldest is not None and self.clock() - self._oldest >= self.max_age):
+            return self.flush(process_records_input.checkpointer)
+        return None
+
+    def flush(self, checkpointer):
+        """
+        Writes every buffered record to a file, and checkpoints at the last of them.
+
+        :param amazon_kclpy.kcl.Checkpointer checkpointer: the checkpointer of the current dispatch
+        :return: the path of the file written, or None if nothing was buffered
+        :rtype: str or None
+        """
+        if not self.buffered_records:
+            return None
+        buffer = self._buffer
+        last_sequence_number = buffer['sequence_number'][-1]
+        last_sub_sequence_number = buffer['sub_sequence_number'][-1]
+        file_name = '{prefix}-{first}-{last}.{ext}'.format(prefix=self.prefix, first=buffer['sequence_number'][0],
+                                                          last=last_sequence_number,
+                                                          ext=_EXTENSIONS[self.file_format])
+        path = os.path.join(self.directory, file_name)
+        temporary_path = os.path.join(self.directory, '.{name}.tmp'.format(name=file_name))
+        try:
+            self._write(temporary_path, buffer)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        _fsync_directory(self.directory)
+        self.files.append(path)
+        self._reset()
+        checkpointer.checkpoint(last_sequence_number, last_sub_sequence_number)
+        return path
+
+    def _write(self, path, buffer):
+        if self.file_format == CSV:
+            with open(path, 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(self.columns)
+                columns = [buffer[column] for column in self.columns]
+                data_index = self.columns.index('data')
+                columns[data_index] = [base64.b64encode(data).decode('ascii') for data in columns[data_index]]
+                writer.writerows(zip(*columns))
+                csv_file.flush()
+                os.fsync(csv_file.fileno())
+            return
+        import pyarrow
+        table = pyarrow.table(dict((column, buffer[column]) for column in self.columns))
+        with open(path, 'wb') as output:
+            if self.file_format == PARQUET:
+                import pyarrow.parquet
+                pyarrow.parquet.write_table(table, output, compression=self.compression)
+            else:
+                import pyarrow.ipc
+                with pyarrow.ipc.new_file(output, table.schema) as writer:
+                    writer.write_table(table)
+            output.flush()
+            os.fsync(output.fileno())
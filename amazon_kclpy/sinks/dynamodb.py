@@ -0,0 +1,203 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Writes records to a DynamoDB table with concurrent ``BatchWriteItem`` calls::
+
+    from amazon_kclpy.sinks.dynamodb import DynamoDBBatchWriter
+
+    writer = DynamoDBBatchWriter('events', item_builder=lambda record: {
+        'id': {'S': record.partition_key},
+        'body': {'B': record.binary_data},
+    })
+
+    def process_records(self, process_records_input):
+        writer.write_and_checkpoint(process_records_input)
+
+Items are grouped into requests of 25, the most ``BatchWriteItem`` accepts, and up to ``concurrency`` requests are sent
+at once over one client, whose connection pool is sized to match.  Items DynamoDB returns as ``UnprocessedItems`` are
+retried with exponential backoff and full jitter.  Throttling errors are retried by the client itself.
+
+Requests finish out of order, so the result of a write is the last record of the longest run of records, from the
+start of the batch, that were all persisted.  Checkpointing there never skips a record that wasn't written.
+"""
+import random
+import threading
+import time
+
+MAX_BATCH_ITEMS = 25
+
+
+class UnprocessedItemsError(Exception):
+    """
+    Raised when items are still unprocessed after every retry.
+    """
+    pass
+
+
+def default_item_builder(record):
+    """
+    Builds an item keyed by the sequence number and sub sequence number of a record, with its partition key, arrival
+    timestamp and payload.
+
+    :param amazon_kclpy.messages.Record record: the record
+    :return: the item, in DynamoDB's attribute value format
+    :rtype: dict
+    """
+    return {
+        'sequence_number': {'S': record.sequence_number},
+        'sub_sequence_number': {'N': str(record.sub_sequence_number or 0)},
+        'partition_key': {'S': record.partition_key},
+        'arrival_millis': {'N': str(record.timestamp_millis)},
+        'data': {'B': record.binary_data},
+    }
+
+
+class BatchWriteResult(object):
+    """
+    The outcome of writing a batch of records.
+    """
+
+    def __init__(self, persisted, failed_records, errors, requests, retries):
+        """
+        :param amazon_kclpy.messages.Record or None persisted: the last record of the longest fully persisted run from
+            the start of the batch, or None if the first request failed
+        :param list failed_records: the records in requests that failed
+        :param list[Exception] errors: why requests failed
+        :param int requests: the number of BatchWriteItem calls made
+        :param int retries: the number of those calls that retried unprocessed items
+        """
+        self.persisted = persisted
+        self.failed_records = failed_records
+        self.errors = errors
+        self.requests = requests
+        self.retries = retries
+
+
+class DynamoDBBatchWriter(object):
+    """
+    Writes batches of records to a DynamoDB table with concurrent BatchWriteItem calls.
+    """
+
+    def __init__(self, table_name, client=None, item_builder=default_item_builder, concurrency=4, max_attempts=8,
+                 base_delay=0.05, max_delay=5.0, sleep=time.sleep):
+        """
+        :param str table_name: the table written to
+        :param client: a DynamoDB client, by default one is created with a connection pool for ``concurrency``
+            requests
+        :param item_builder: called with each record, returns its item in DynamoDB's attribute value format
+        :param int concurrency: the most BatchWriteItem calls in flight
+        :param int max_attempts: the most calls made for a group of items, including retries of unprocessed items
+        :param float base_delay: the first backoff before retrying unprocessed items, in seconds
+        :param float max_delay: the longest backoff, in seconds
+        :param sleep: waits for the given number of seconds
+        """
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = boto3.client('dynamodb', config=Config(max_pool_connections=max(10, concurrency)))
+        self.table_name = table_name
+        self.client = client
+        self.item_builder = item_builder
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='kclpy-dynamodb')
+            return self._executor
+
+    def _write_group(self, items):
+        """
+        Writes up to 25 items, retrying unprocessed items.
+
+        :return: the number of calls made
+        :rtype: int
+        """
+        request_items = {self.table_name: [{'PutRequest': {'Item': item}} for item in items]}
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))))
+            response = self.client.batch_write_item(RequestItems=request_items)
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                return attempt + 1
+        raise UnprocessedItemsError('{n} items were still unprocessed after {a} attempts'.format(
+            n=sum(len(requests) for requests in request_items.values()), a=self.max_attempts))
+
+    def write(self, records):
+        """
+        Writes a batch of records.
+
+        :param records: the records, or a :class:`amazon_kclpy.messages.ProcessRecordsInput`
+        :rtype: BatchWriteResult
+        """
+        records = getattr(records, 'records', records)
+        groups = [records[start:start + MAX_BATCH_ITEMS] for start in range(0, len(records), MAX_BATCH_ITEMS)]
+        item_builder = self.item_builder
+        item_groups = [[item_builder(record) for record in group] for group in groups]
+        if len(item_groups) > 1 and self.concurrency > 1:
+            pool = self._pool()
+            futures = [pool.submit(self._write_group, items) for items in item_groups]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+        else:
+            outcomes = []
+            for items in item_groups:
+                try:
+                    outcomes.append(self._write_group(items))
+                except Exception as e:
+                    outcomes.append(e)
+
+        persisted = None
+        prefix_complete = True
+        failed_records = []
+        errors = []
+        requests = retries = 0
+        for group, outcome in zip(groups, outcomes):
+            if isinstance(outcome, Exception):
+                prefix_complete = False
+                failed_records.extend(group)
+                errors.append(outcome)
+                continue
+            requests += outcome
+            retries += outcome - 1
+            if prefix_complete:
+                persisted = group[-1]
+        return BatchWriteResult(persisted, failed_records, errors, requests, retries)
+
+    def write_and_checkpoint(self, process_records_input):
+        """
+        Writes a batch of records, and checkpoints at the last record of the longest fully persisted run.
+
+        :param amazon_kclpy.messages.ProcessRecordsInput process_records_input: the batch
+        :return: the result of the write
+        :rtype: BatchWriteResult
+        :raises Exception: the first error, if any request failed, after checkpointing what was persisted
+        """
+        result = self.write(process_records_input)
+        if result.persisted is not None:
+            process_records_input.checkpointer.checkpoint(result.persisted.sequence_number,
+                                                          result.persisted.sub_sequence_number)
+        if result.errors:
+            raise result.errors[0]
+        return result
+
+    def close(self):
+        """
+        Stops the request threads, if they were started.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
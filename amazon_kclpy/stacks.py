@@ -0,0 +1,40 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Helpers for writing stack samples in the collapsed (folded) format read by flame graph tools such as
+`FlameGraph <https://github.com/brendangregg/FlameGraph>`_ and `speedscope <https://www.speedscope.app/>`_.  Each line
+holds the frames of a stack from the root to the leaf, separated by semicolons, followed by a space and the number of
+times the stack was sampled.
+"""
+import os
+
+
+def collapse_stack(frame, prefix=()):
+    """
+    Collapses a stack into a single line of semicolon separated frames, root first.
+
+    :param frame: the innermost frame of the stack, e.g. from ``sys._current_frames()``
+    :param tuple prefix: labels to put before the root frame, e.g. the shard id and the action
+    :return: the collapsed stack
+    :rtype: str
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append('{name} ({file}:{line})'.format(name=code.co_name, file=os.path.basename(code.co_filename),
+                                                      line=frame.f_lineno))
+        frame = frame.f_back
+    frames.extend(reversed(prefix))
+    frames.reverse()
+    return ';'.join(label.replace(';', ',') for label in frames)
+
+
+def write_collapsed(output_file, samples):
+    """
+    Writes sampled stacks in the collapsed format.
+
+    :param file output_file: the file to write to
+    :param dict samples: a mapping of collapsed stack to the number of times it was sampled
+    """
+    for stack, count in sorted(samples.items()):
+        output_file.write('{stack} {count}\n'.format(stack=stack, count=count))
@@ -0,0 +1,120 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+``kclpy-top`` renders live per shard rates for every record processor on this host that publishes to the shared
+metrics segment (see :mod:`amazon_kclpy.shared_metrics`)::
+
+    kclpy-top --interval 2
+"""
+import argparse
+import sys
+import time
+
+from amazon_kclpy.shared_metrics import SharedMetricsSegment, default_segment_path
+
+_COLUMNS = ('SLOT', 'PID', 'SHARD', 'REC/S', 'KB/S', 'BATCH/S', 'AVG BATCH', 'BEHIND MS', 'CKPT/S', 'CKPT MS',
+            'ERRORS')
+_ROW_FORMAT = '{:>4} {:>7} {:<28} {:>10} {:>10} {:>8} {:>9} {:>11} {:>7} {:>8} {:>7}'
+
+
+def compute_rates(previous, current):
+    """
+    Turns two readings of the segment into per shard rates.  Slots that were reclaimed by a different process between
+    the two readings are reported from the current reading only.
+
+    :param dict previous: a mapping of slot index to the slot read at the start of the interval
+    :param list[dict] current: the slots read at the end of the interval
+    :return: one dictionary of rates per slot in current
+    :rtype: list[dict]
+    """
+    rows = []
+    for slot in current:
+        before = previous.get(slot['slot'])
+        if before is None or before['pid'] != slot['pid'] or before['shard_id'] != slot['shard_id']:
+            before = dict(slot, batches=0, records=0, bytes=0, checkpoints=0, total_checkpoint_millis=0.0,
+                          updated=slot['started'])
+        elapsed = slot['updated'] - before['updated']
+        batches = slot['batches'] - before['batches']
+        records = slot['records'] - before['records']
+        checkpoints = slot['checkpoints'] - before['checkpoints']
+        checkpoint_millis = slot['total_checkpoint_millis'] - before['total_checkpoint_millis']
+        rows.append({
+            'slot': slot['slot'],
+            'pid': slot['pid'],
+            'shard_id': slot['shard_id'],
+            'records_per_second': records / elapsed if elapsed > 0 else 0.0,
+            'kilobytes_per_second': (slot['bytes'] - before['bytes']) / 1024.0 / elapsed if elapsed > 0 else 0.0,
+            'batches_per_second': batches / elapsed if elapsed > 0 else 0.0,
+            'average_batch_size': float(records) / batches if batches else float(slot['last_batch_size']),
+            'millis_behind_latest': slot['millis_behind_latest'],
+            'checkpoints_per_second': checkpoints / elapsed if elapsed > 0 else 0.0,
+            'checkpoint_millis': checkpoint_millis / checkpoints if checkpoints else slot['last_checkpoint_millis'],
+            'errors': slot['dispatch_errors'] + slot['checkpoint_errors'],
+        })
+    return rows
+
+
+def render(rows):
+    """
+    Formats rows produced by :func:`compute_rates` as a table.
+
+    :param list[dict] rows: the rows to render
+    :return: the table
+    :rtype: str
+    """
+    lines = [_ROW_FORMAT.format(*_COLUMNS)]
+    for row in sorted(rows, key=lambda r: r['shard_id']):
+        lines.append(_ROW_FORMAT.format(
+            row['slot'], row['pid'], row['shard_id'][:28],
+            '{:.1f}'.format(row['records_per_second']),
+            '{:.1f}'.format(row['kilobytes_per_second']),
+            '{:.2f}'.format(row['batches_per_second']),
+            '{:.1f}'.format(row['average_batch_size']),
+            row['millis_behind_latest'] if row['millis_behind_latest'] >= 0 else '-',
+            '{:.2f}'.format(row['checkpoints_per_second']),
+            '{:.1f}'.format(row['checkpoint_millis']),
+            row['errors']))
+    total_records = sum(row['records_per_second'] for row in rows)
+    total_kilobytes = sum(row['kilobytes_per_second'] for row in rows)
+    lines.append('{n} shards, {r:.1f} records/s, {k:.1f} KB/s'.format(n=len(rows), r=total_records,
+                                                                       k=total_kilobytes))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Shows live per shard rates for kclpy record processors on this '
+                                                 'host.')
+    parser.add_argument('-s', '--segment', dest='segment', default=None,
+                        help='The shared metrics segment to read. Default is {p}'.format(p=default_segment_path()))
+    parser.add_argument('-i', '--interval', dest='interval', type=float, default=1.0,
+                        help='Seconds between refreshes. Default is 1.')
+    parser.add_argument('-n', '--iterations', dest='iterations', type=int, default=None,
+                        help='Exit after this many refreshes. Default is to run until interrupted.')
+    args = parser.parse_args(argv)
+
+    try:
+        segment = SharedMetricsSegment(args.segment, create=False)
+    except (OSError, ValueError) as e:
+        sys.stderr.write('Unable to open the metrics segment: {e}\n'.format(e=e))
+        return 1
+
+    clear = '\x1b[H\x1b[2J' if sys.stdout.isatty() else ''
+    iteration = 0
+    try:
+        previous = dict((slot['slot'], slot) for slot in segment.read_slots())
+        while args.iterations is None or iteration < args.iterations:
+            time.sleep(args.interval)
+            current = segment.read_slots()
+            sys.stdout.write(clear + render(compute_rates(previous, current)) + '\n')
+            sys.stdout.flush()
+            previous = dict((slot['slot'], slot) for slot in current)
+            iteration += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        segment.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
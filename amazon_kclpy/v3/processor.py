@@ -69,6 +69,27 @@ class RecordProcessorBase(object):
         """
         raise NotImplementedError
 
+    def handoff_state(self):
+        """
+        Called when the record processor's code is being hot reloaded (see :mod:`amazon_kclpy.reload`), after the
+        last dispatch to this instance.  Whatever is returned is passed to :meth:`resume` of the replacement.
+
+        :return: any in memory state the replacement should take over
+        """
+        return None
+
+    def resume(self, initialize_input, state):
+        """
+        Called instead of :meth:`initialize` when this record processor replaces a hot reloaded one.  The shard, and
+        the checkpointer used for subsequent dispatches, stay the same.  By default this initializes the processor
+        again, and discards the state.
+
+        :param amazon_kclpy.messages.InitializeInput initialize_input: the initialization request the replaced
+            record processor received
+        :param state: the value returned from :meth:`handoff_state` of the replaced record processor
+        """
+        self.initialize(initialize_input)
+
     version = 3
 
 
@@ -0,0 +1,115 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Captures what the record processor was doing when a dispatch takes too long::
+
+    from amazon_kclpy import kcl
+    from amazon_kclpy.watchdog import WatchdogHook
+
+    kcl.KCLProcess(RecordProcessor(), hooks=[WatchdogHook(threshold=10.0)]).run()
+
+The hook is armed each time an action is dispatched.  A background thread checks it every ``poll_interval`` seconds,
+and once a dispatch has run for longer than ``threshold`` seconds it samples the stack of the processing thread every
+``sample_interval`` seconds with ``sys._current_frames``.  When the dispatch completes the samples are written as a
+collapsed stack report (see :mod:`amazon_kclpy.stacks`) to ``report_directory``.  Every stack in the report starts with
+the shard id, the action, and the number of records in the batch.
+
+Arming and disarming are a pair of attribute assignments, so a watchdog costs next to nothing while dispatches are
+fast.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from amazon_kclpy.hooks import ProcessHook
+from amazon_kclpy.stacks import collapse_stack, write_collapsed
+
+
+class WatchdogHook(ProcessHook):
+    """
+    Samples the stack of dispatches that take longer than a threshold, and writes a report once they complete.
+    """
+
+    def __init__(self, threshold=10.0, sample_interval=0.1, poll_interval=None, report_directory=None,
+                 max_samples=10000):
+        """
+        :param float threshold: the number of seconds a dispatch may take before its stack is sampled
+        :param float sample_interval: the number of seconds between stack samples
+        :param float or None poll_interval: the number of seconds between checks of the current dispatch, defaults to
+            a quarter of the threshold, and at most a second
+        :param str or None report_directory: where reports are written, defaults to the temporary directory
+        :param int max_samples: the largest number of samples taken for a single dispatch
+        :raises ValueError: if the threshold or an interval isn't positive, which would keep the watchdog busy
+        """
+        if threshold <= 0 or sample_interval <= 0 or (poll_interval is not None and poll_interval <= 0):
+            raise ValueError('The watchdog threshold and intervals must be positive')
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.poll_interval = poll_interval if poll_interval is not None else min(threshold / 4.0, 1.0)
+        self.report_directory = report_directory or tempfile.gettempdir()
+        self.max_samples = max_samples
+        self.reports = []
+        self._shard_id = 'unknown'
+        self._armed = None
+        self._thread = None
+        self._stopped = False
+
+    def action_started(self, action):
+        if action.action == 'initialize':
+            self._shard_id = action.shard_id
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, args=(threading.current_thread().ident,),
+                                            name='kclpy-watchdog')
+            self._thread.daemon = True
+            self._thread.start()
+        batch_size = len(action.records) if action.action == 'processRecords' else 0
+        self._armed = (time.perf_counter(), self._shard_id, action.action, batch_size)
+
+    def action_finished(self, action, error):
+        self._armed = None
+
+    def _watch(self, thread_ident):
+        while not self._stopped:
+            time.sleep(self.poll_interval)
+            armed = self._armed
+            if armed is not None and time.perf_counter() - armed[0] >= self.threshold:
+                self._sample(thread_ident, armed)
+
+    def _sample(self, thread_ident, armed):
+        started, shard_id, action, batch_size = armed
+        prefix = (shard_id, action, 'batch_size={n}'.format(n=batch_size))
+        samples = Counter()
+        taken = 0
+        while self._armed is armed and not self._stopped:
+            if taken < self.max_samples:
+                frame = sys._current_frames().get(thread_ident)
+                if frame is not None:
+                    samples[collapse_stack(frame, prefix)] += 1
+                    taken += 1
+                    del frame
+            time.sleep(self.sample_interval)
+        self._write_report(armed, time.perf_counter() - started, samples)
+
+    def _write_report(self, armed, elapsed, samples):
+        _, shard_id, action, batch_size = armed
+        file_name = 'kclpy-slow-{shard}-{action}-{pid}-{time}.folded'.format(
+            shard=shard_id, action=action, pid=os.getpid(), time=int(time.time() * 1000))
+        path = os.path.join(self.report_directory, file_name)
+        try:
+            with open(path, 'w') as report_file:
+                write_collapsed(report_file, samples)
+        except (IOError, OSError) as e:
+            sys.stderr.write('Unable to write slow dispatch report to {path}: {e}\n'.format(path=path, e=e))
+            return
+        sys.stderr.write('Dispatch of {action} ({n} records) for {shard} took {elapsed:.1f} seconds, stack samples '
+                         'written to {path}\n'.format(action=action, n=batch_size, shard=shard_id, elapsed=elapsed,
+                                                     path=path))
+        self.reports.append(path)
+
+    def close(self):
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join(self.poll_interval + self.sample_interval + 1.0)
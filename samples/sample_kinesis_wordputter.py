@@ -11,6 +11,8 @@ import time
 
 import boto3
 
+from amazon_kclpy.producer import KinesisProducer
+
 def get_stream_status(kinesis, stream_name):
     '''
     Query this provided connection object for the provided stream's status.
@@ -45,7 +47,8 @@ def wait_for_stream(kinesis, stream_name):
 
 def put_words_in_stream(kinesis, stream_name, words):
     '''
-    Put each word in the provided list of words into the stream.
+    Put each word in the provided list of words into the stream. Words are batched into PutRecords calls, and words
+    that Kinesis rejects, for example when a shard is throttled, are retried.
     :type kinesis: Kinesis.Client
     :param kinesis: A connection to Amazon Kinesis
     :type stream_name: str
@@ -53,9 +56,12 @@ def put_words_in_stream(kinesis, stream_name, words):
     :type words: list
     :param words: A list of strings to put into the stream.
     '''
-    for w in words:
+    producer = KinesisProducer(stream_name, client=kinesis)
+    futures = [(w, producer.put(w, partition_key=w)) for w in words]
+    producer.close()
+    for w, future in futures:
         try:
-            kinesis.put_record(StreamName=stream_name, Data=w, PartitionKey=w)
+            future.result()
             print("Put word: " + w + " into stream: " + stream_name)
         except Exception as e:
             sys.stderr.write("Encountered an exception while trying to put a word: "
@@ -233,14 +233,29 @@ if __name__ == '__main__':
         version=PACKAGE_VERSION,
         description='A python interface for the Amazon Kinesis Client Library MultiLangDaemon',
         license='Apache-2.0',
-        packages=[PACKAGE_NAME, PACKAGE_NAME + "/v2", PACKAGE_NAME + "/v3", 'samples'],
+        packages=[PACKAGE_NAME, PACKAGE_NAME + "/v2", PACKAGE_NAME + "/v3", PACKAGE_NAME + "/sinks", 'samples'],
         scripts=glob.glob('samples/*py'),
+        entry_points={
+            'console_scripts': [
+                'kclpy-top = amazon_kclpy.top:main',
+                'kclpy-replay = amazon_kclpy.replay:main',
+                'kclpy-emulator = amazon_kclpy.emulator:main',
+                'kclpy-loadgen = amazon_kclpy.loadgen:main',
+            ],
+        },
         package_data={
             '': ['*.txt', '*.md'],
             PACKAGE_NAME: ['jars/*'],
             'samples': ['sample.properties'],
         },
         install_requires=PYTHON_REQUIREMENTS,
+        extras_require={
+            'avro': ['fastavro'],
+            'msgpack': ['msgpack'],
+            'parquet': ['pyarrow'],
+            'protobuf': ['protobuf'],
+            'zstd': ['zstandard'],
+        },
         setup_requires=["pytest-runner"],
         tests_require=["pytest", "mock"],
         cmdclass=commands,
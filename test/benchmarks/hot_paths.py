@@ -0,0 +1,226 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Microbenchmarks of the code every record passes through, at realistic batch shapes.
+
+Each benchmark is run for batches of 1 to 10,000 records with payloads of 100 bytes to 1 MB, skipping shapes over the
+10 MB that a single GetRecords call can return.  Results are the best time per call over several runs.
+
+Results can be saved as a baseline and later compared against it::
+
+    python test/benchmarks/hot_paths.py --save baseline.json
+    python test/benchmarks/hot_paths.py --compare baseline.json --max-regression 10
+
+The comparison exits with a non zero status if any benchmark is slower than the baseline by more than the given
+percentage.  The same comparison runs under pytest when ``KCLPY_BENCHMARK_BASELINE`` names a baseline file (which is
+recorded if it doesn't exist yet), with the limit taken from ``KCLPY_BENCHMARK_MAX_REGRESSION`` (default 10).
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import timeit
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from amazon_kclpy import dispatch, kcl, messages
+
+RECORD_COUNTS = (1, 100, 1000, 10000)
+PAYLOAD_SIZES = (100, 1000, 10000, 100000, 1000000)
+QUICK_RECORD_COUNTS = (1, 100)
+QUICK_PAYLOAD_SIZES = (100, 10000)
+
+_MAX_BATCH_BYTES = 10 * 1024 * 1024
+
+
+class _NullOutput(object):
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+class _RepeatingInput(object):
+
+    def __init__(self, line):
+        self._line = line
+
+    def readline(self):
+        return self._line
+
+
+def shapes(quick=False):
+    """
+    :param bool quick: whether to only return a few small shapes
+    :return: (record count, payload size) pairs within the GetRecords limit
+    :rtype: list[tuple]
+    """
+    counts, sizes = (QUICK_RECORD_COUNTS, QUICK_PAYLOAD_SIZES) if quick else (RECORD_COUNTS, PAYLOAD_SIZES)
+    return [(count, size) for count in counts for size in sizes if count * size <= _MAX_BATCH_BYTES]
+
+
+def _record_dicts(count, size):
+    data = base64.b64encode(os.urandom(size)).decode('ascii')
+    return [{'action': 'record', 'data': data, 'partitionKey': 'partition-{n}'.format(n=n),
+             'sequenceNumber': str(49500000000000000000000000000 + n), 'subSequenceNumber': 0,
+             'approximateArrivalTimestamp': 1700000000000} for n in range(count)]
+
+
+def _message_decode(count, size):
+    line = json.dumps({'action': 'processRecords', 'millisBehindLatest': 0, 'records': _record_dicts(count, size)})
+    return lambda: json.loads(line, object_hook=dispatch.message_decode)
+
+
+def _record_construction(count, size):
+    record_dicts = _record_dicts(count, size)
+    return lambda: [messages.Record(record) for record in record_dicts]
+
+
+def _binary_data(count, size):
+    records = [messages.Record(record) for record in _record_dicts(count, size)]
+    return lambda: [record.binary_data for record in records]
+
+
+def _write_action(count, size):
+    io_handler = kcl._IOHandler(None, _NullOutput(), None)
+    response = {'action': 'status', 'responseFor': 'processRecords'}
+    return lambda: io_handler.write_action(response)
+
+
+def _checkpoint(count, size):
+    sequence_number = str(49500000000000000000000000000 + count)
+    response = json.dumps({'action': 'checkpoint', 'sequenceNumber': sequence_number, 'subSequenceNumber': 0})
+    checkpointer = kcl.Checkpointer(kcl._IOHandler(_RepeatingInput(response + '\n'), _NullOutput(), None))
+    return lambda: checkpointer.checkpoint(sequence_number, 0)
+
+
+#
+# Each benchmark receives the shape, and returns the callable to time.  Benchmarks whose cost doesn't depend on the
+# batch shape are only run once.
+#
+BENCHMARKS = [
+    ('message_decode', _message_decode, True),
+    ('record_construction', _record_construction, True),
+    ('binary_data', _binary_data, True),
+    ('write_action', _write_action, False),
+    ('checkpoint', _checkpoint, False),
+]
+
+
+def benchmark_name(name, count, size):
+    return '{name}[records={count},payload={size}]'.format(name=name, count=count, size=size)
+
+
+def run_benchmarks(quick=False, repeat=5, min_time=0.2):
+    """
+    Runs every benchmark at every shape.
+
+    :param bool quick: whether to only run a few small shapes
+    :param int repeat: the number of timed runs of each benchmark, the fastest is kept
+    :param float min_time: the least number of seconds each timed run takes
+    :return: a mapping of benchmark name to seconds per call
+    :rtype: dict
+    """
+    results = {}
+    for name, factory, shaped in BENCHMARKS:
+        for count, size in (shapes(quick) if shaped else [(0, 0)]):
+            timer = timeit.Timer(factory(count, size))
+            number = 1
+            while timer.timeit(number) < min_time:
+                number *= 2
+            best = min(timer.repeat(repeat=repeat, number=number)) / number
+            results[benchmark_name(name, count, size) if shaped else name] = best
+    return results
+
+
+def save_baseline(path, results):
+    """
+    :param str path: the baseline file
+    :param dict results: results returned by :func:`run_benchmarks`
+    """
+    with open(path, 'w') as baseline_file:
+        json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results},
+                  baseline_file, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    """
+    :param str path: the baseline file
+    :return: the results stored in the baseline
+    :rtype: dict
+    """
+    with open(path) as baseline_file:
+        return json.load(baseline_file)['results']
+
+
+def compare(results, baseline, max_regression):
+    """
+    Finds benchmarks that are slower than their baseline by more than a percentage.  Benchmarks missing from either
+    side are ignored.
+
+    :param dict results: results returned by :func:`run_benchmarks`
+    :param dict baseline: results loaded from a baseline
+    :param float max_regression: the largest allowed slowdown, as a percentage
+    :return: tuples of (name, baseline seconds, current seconds, percentage change), slowest first
+    :rtype: list[tuple]
+    """
+    regressions = []
+    for name, seconds in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = (seconds - previous) / previous * 100.0
+        if change > max_regression:
+            regressions.append((name, previous, seconds, change))
+    regressions.sort(key=lambda regression: -regression[3])
+    return regressions
+
+
+def render(results, baseline=None):
+    """
+    :param dict results: results returned by :func:`run_benchmarks`
+    :param dict or None baseline: results loaded from a baseline, to show the change against
+    :rtype: str
+    """
+    lines = []
+    for name in sorted(results):
+        line = '{name:<60} {us:>14.3f} us'.format(name=name, us=results[name] * 1e6)
+        if baseline and baseline.get(name):
+            line += ' {change:>+8.1f}%'.format(change=(results[name] - baseline[name]) / baseline[name] * 100.0)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the amazon_kclpy hot path microbenchmarks.')
+    parser.add_argument('--save', dest='save', default=None, help='Save the results as a baseline to this file.')
+    parser.add_argument('--compare', dest='compare', default=None, help='Compare the results to this baseline file.')
+    parser.add_argument('--max-regression', dest='max_regression', type=float, default=10.0,
+                        help='The largest allowed slowdown against the baseline, in percent. Default is 10.')
+    parser.add_argument('--quick', dest='quick', action='store_true', help='Only run a few small batch shapes.')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5,
+                        help='Timed runs of each benchmark, the fastest is kept. Default is 5.')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(quick=args.quick, repeat=args.repeat)
+    baseline = load_baseline(args.compare) if args.compare else None
+    sys.stdout.write(render(results, baseline) + '\n')
+    if args.save:
+        save_baseline(args.save, results)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.max_regression)
+        for name, previous, seconds, change in regressions:
+            sys.stdout.write('REGRESSION {name}: {p:.3f} us -> {s:.3f} us ({c:+.1f}%)\n'.format(
+                name=name, p=previous * 1e6, s=seconds * 1e6, c=change))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+A memory soak harness for :class:`amazon_kclpy.kcl.KCLProcess`.
+
+Synthetic ``processRecords`` messages, and the responses to the checkpoints they cause, are generated on demand and
+pushed through a KCLProcess over in-memory streams, so millions of batches can be run without holding them in memory.
+After a warm up, ``tracemalloc`` snapshots and the resident set size are taken at regular intervals.  The report shows
+how much the memory allocated by each part of amazon_kclpy grew between the first and the last snapshot, and the
+allocation sites anywhere that grew the most::
+
+    python test/benchmarks/soak.py --api v3 --batches 1000000
+
+The same harness runs under pytest, see ``test_soak.py``.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tracemalloc
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from amazon_kclpy import kcl
+from amazon_kclpy.v2 import processor as v2
+from amazon_kclpy.v3 import processor as v3
+
+#
+# The parts of amazon_kclpy whose allocations are tracked separately, as tracemalloc filename patterns.
+#
+MODULE_GROUPS = (
+    ('messages', '*amazon_kclpy/messages.py'),
+    ('dispatch', '*amazon_kclpy/dispatch.py'),
+    ('kcl', '*amazon_kclpy/kcl.py'),
+    ('v2', '*amazon_kclpy/v2/*'),
+    ('v3', '*amazon_kclpy/v3/*'),
+)
+
+_FIRST_SEQUENCE_NUMBER = 49500000000000000000000000000
+
+
+class V1Processor(kcl.RecordProcessorBase):
+
+    def __init__(self, checkpoint_every):
+        self.checkpoint_every = checkpoint_every
+        self.batches = 0
+
+    def initialize(self, shard_id):
+        pass
+
+    def process_records(self, records, checkpointer):
+        for record in records:
+            record.binary_data, record.partition_key
+        self.batches += 1
+        if self.batches % self.checkpoint_every == 0:
+            checkpointer.checkpoint(records[-1].sequence_number)
+
+    def shutdown(self, checkpointer, reason):
+        pass
+
+
+class V2Processor(v2.RecordProcessorBase):
+
+    def __init__(self, checkpoint_every):
+        self.checkpoint_every = checkpoint_every
+        self.batches = 0
+
+    def initialize(self, initialize_input):
+        pass
+
+    def process_records(self, process_records_input):
+        records = process_records_input.records
+        for record in records:
+            record.binary_data, record.partition_key
+        self.batches += 1
+        if self.batches % self.checkpoint_every == 0:
+            process_records_input.checkpointer.checkpoint(records[-1].sequence_number,
+                                                          records[-1].sub_sequence_number)
+
+    def shutdown(self, shutdown_input):
+        pass
+
+
+class V3Processor(v3.RecordProcessorBase):
+
+    def __init__(self, checkpoint_every):
+        self.checkpoint_every = checkpoint_every
+        self.batches = 0
+
+    def initialize(self, initialize_input):
+        pass
+
+    def process_records(self, process_records_input):
+        records = process_records_input.records
+        for record in records:
+            record.binary_data, record.partition_key
+        self.batches += 1
+        if self.batches % self.checkpoint_every == 0:
+            process_records_input.checkpointer.checkpoint(records[-1].sequence_number,
+                                                          records[-1].sub_sequence_number)
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        pass
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+
+PROCESSORS = {'v1': V1Processor, 'v2': V2Processor, 'v3': V3Processor}
+
+
+def resident_set_size():
+    """
+    :return: the resident set size of this process in bytes, or None if it can't be read
+    :rtype: int or None
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class _SyntheticDaemon(object):
+    """
+    Plays the MultiLangDaemon's side of both streams, generating each message when it's read.
+    """
+
+    def __init__(self, batches, records_per_batch, payload_size, on_batch):
+        self._batches = batches
+        self._records_per_batch = records_per_batch
+        self._data = base64.b64encode(os.urandom(payload_size)).decode('ascii')
+        self._on_batch = on_batch
+        self._sent = -1
+        self.checkpoint_request = None
+
+    def readline(self):
+        if self.checkpoint_request is not None:
+            request, self.checkpoint_request = self.checkpoint_request, None
+            return json.dumps({'action': 'checkpoint', 'sequenceNumber': request['sequenceNumber'],
+                               'subSequenceNumber': request['subSequenceNumber']}) + '\n'
+        self._sent += 1
+        if self._sent == 0:
+            return json.dumps({'action': 'initialize', 'shardId': 'shardId-000000000000',
+                               'sequenceNumber': 'TRIM_HORIZON', 'subSequenceNumber': None}) + '\n'
+        batch = self._sent - 1
+        if batch < self._batches:
+            self._on_batch(batch)
+            first = _FIRST_SEQUENCE_NUMBER + batch * self._records_per_batch
+            records = [{'action': 'record', 'data': self._data, 'partitionKey': str(n),
+                        'sequenceNumber': str(first + n), 'subSequenceNumber': 0,
+                        'approximateArrivalTimestamp': 1700000000000} for n in range(self._records_per_batch)]
+            return json.dumps({'action': 'processRecords', 'records': records, 'millisBehindLatest': 0}) + '\n'
+        if batch == self._batches:
+            return json.dumps({'action': 'shutdownRequested'}) + '\n'
+        return ''
+
+    def write(self, text):
+        for line in text.splitlines():
+            if line:
+                message = json.loads(line)
+                if message.get('action') == 'checkpoint':
+                    self.checkpoint_request = message
+
+    def flush(self):
+        pass
+
+
+class SoakReport(object):
+    """
+    The memory measurements of a soak run.
+    """
+
+    def __init__(self):
+        self.rss = []
+        self.group_sizes = []
+        self.top_growth = []
+
+    def group_growth(self):
+        """
+        :return: the bytes allocated by each module group at the last snapshot, less those at the first
+        :rtype: dict
+        """
+        if len(self.group_sizes) < 2:
+            return {}
+        first, last = self.group_sizes[0][1], self.group_sizes[-1][1]
+        return dict((name, last[name] - first[name]) for name in first)
+
+    def rss_growth(self):
+        """
+        :return: the resident set size at the last sample less that at the first, or None if it couldn't be read
+        :rtype: int or None
+        """
+        if len(self.rss) < 2 or self.rss[0][1] is None or self.rss[-1][1] is None:
+            return None
+        return self.rss[-1][1] - self.rss[0][1]
+
+
+def _group_sizes(snapshot):
+    sizes = {}
+    for name, pattern in MODULE_GROUPS:
+        filtered = snapshot.filter_traces([tracemalloc.Filter(True, pattern)])
+        sizes[name] = sum(statistic.size for statistic in filtered.statistics('filename'))
+    return sizes
+
+
+def soak(record_processor, batches, records_per_batch=10, payload_size=256, samples=10, warm_up=0.1, top=10):
+    """
+    Pushes synthetic batches through a KCLProcess while measuring memory.
+
+    :param record_processor: the record processor to run
+    :param int batches: the number of processRecords batches
+    :param int records_per_batch: the number of records in each batch
+    :param int payload_size: the number of bytes in each record
+    :param int samples: the number of measurements taken after the warm up
+    :param float warm_up: the fraction of batches run before the first measurement
+    :param int top: the number of allocation sites reported in :attr:`SoakReport.top_growth`
+    :rtype: SoakReport
+    """
+    report = SoakReport()
+    first_sample = int(batches * warm_up)
+    interval = max(1, (batches - first_sample) // samples)
+    state = {'first': None, 'last': None}
+
+    def on_batch(batch):
+        if batch < first_sample or (batch - first_sample) % interval:
+            return
+        snapshot = tracemalloc.take_snapshot()
+        report.rss.append((batch, resident_set_size()))
+        report.group_sizes.append((batch, _group_sizes(snapshot)))
+        if state['first'] is None:
+            state['first'] = snapshot
+        state['last'] = snapshot
+
+    daemon = _SyntheticDaemon(batches, records_per_batch, payload_size, on_batch)
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    try:
+        kcl.KCLProcess(record_processor, input_file=daemon, output_file=daemon, error_file=sys.stderr).run()
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    if state['first'] is not None and state['last'] is not state['first']:
+        snapshot_filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        first = state['first'].filter_traces(snapshot_filters)
+        last = state['last'].filter_traces(snapshot_filters)
+        report.top_growth = [difference for difference in last.compare_to(first, 'lineno')
+                             if difference.size_diff > 0][:top]
+    return report
+
+
+def render(report):
+    """
+    :param SoakReport report: the report returned by :func:`soak`
+    :rtype: str
+    """
+    lines = ['{batch:>10} {rss:>12} {groups}'.format(
+        batch='BATCH', rss='RSS_KB', groups=' '.join('{n:>10}'.format(n=name.upper()) for name, _ in MODULE_GROUPS))]
+    for (batch, rss), (_, sizes) in zip(report.rss, report.group_sizes):
+        lines.append('{batch:>10} {rss:>12} {groups}'.format(
+            batch=batch, rss=rss // 1024 if rss is not None else '-',
+            groups=' '.join('{s:>10}'.format(s=sizes[name]) for name, _ in MODULE_GROUPS)))
+    lines.append('')
+    lines.append('Top growing allocation sites:')
+    for difference in report.top_growth:
+        frame = difference.traceback[0]
+        lines.append('  {file}:{line} {size:+d} bytes, {count:+d} blocks'.format(
+            file=frame.filename, line=frame.lineno, size=difference.size_diff, count=difference.count_diff))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a memory soak of KCLProcess over in-memory streams.')
+    parser.add_argument('--api', dest='api', choices=sorted(PROCESSORS), default='v3',
+                        help='The record processor interface to exercise. Default is v3.')
+    parser.add_argument('--batches', dest='batches', type=int, default=100000,
+                        help='The number of processRecords batches. Default is 100000.')
+    parser.add_argument('--records', dest='records_per_batch', type=int, default=10,
+                        help='The number of records in each batch. Default is 10.')
+    parser.add_argument('--payload-size', dest='payload_size', type=int, default=256,
+                        help='The number of bytes in each record. Default is 256.')
+    parser.add_argument('--checkpoint-every', dest='checkpoint_every', type=int, default=10,
+                        help='Checkpoint after every this many batches. Default is 10.')
+    parser.add_argument('--samples', dest='samples', type=int, default=20,
+                        help='The number of measurements taken. Default is 20.')
+    args = parser.parse_args(argv)
+
+    report = soak(PROCESSORS[args.api](args.checkpoint_every), args.batches, args.records_per_batch,
+                  args.payload_size, args.samples)
+    sys.stdout.write(render(report) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Measures how long a freshly started record processor process takes to answer its first ``initialize`` message.  The
+MultiLangDaemon starts one process per shard, so this time is added to every failover.
+
+The measured time is compared against a bare interpreter that answers the same message without importing
+amazon_kclpy.  Wall clock timings are too noisy on shared machines to run by default, so the comparison only runs when
+``KCLPY_COLD_START_BUDGET_MS`` is set, and fails if the difference exceeds that many milliseconds.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_RUNS = int(os.environ.get('KCLPY_COLD_START_RUNS', '7'))
+_BUDGET_MS = os.environ.get('KCLPY_COLD_START_BUDGET_MS')
+
+_INITIALIZE = json.dumps({"action": "initialize", "shardId": "shardId-000001", "sequenceNumber": None,
+                          "subSequenceNumber": None}) + "\n"
+
+_KCL_PROCESSOR = """
+from amazon_kclpy import kcl
+from amazon_kclpy.v3 import processor
+
+
+class RecordProcessor(processor.RecordProcessorBase):
+    def initialize(self, initialize_input):
+        pass
+
+    def process_records(self, process_records_input):
+        pass
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        pass
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+
+kcl.KCLProcess(RecordProcessor()).run()
+"""
+
+_BARE_PROCESSOR = """
+import sys
+sys.stdin.readline()
+sys.stdout.write('\\n{"action": "status", "responseFor": "initialize"}\\n')
+sys.stdout.flush()
+sys.stdin.readline()
+"""
+
+
+def _time_to_first_response(source):
+    """
+    Starts an interpreter running the source, sends it an initialize message, and waits for the first status response.
+
+    :return: the number of milliseconds from process creation to the response
+    :rtype: float
+    """
+    env = dict(os.environ, PYTHONPATH=_REPO_ROOT, PYTHONDONTWRITEBYTECODE='1')
+    started = time.time()
+    process = subprocess.Popen([sys.executable, '-c', source], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               env=env, universal_newlines=True)
+    try:
+        process.stdin.write(_INITIALIZE)
+        process.stdin.flush()
+        line = ''
+        while not line.strip():
+            line = process.stdout.readline()
+            assert line, 'The processor exited before responding'
+        elapsed = (time.time() - started) * 1000.0
+        assert json.loads(line) == {"action": "status", "responseFor": "initialize"}
+    finally:
+        process.stdin.close()
+        process.wait()
+    return elapsed
+
+
+def _best_of(source):
+    return min(_time_to_first_response(source) for _ in range(_RUNS))
+
+
+def test_v3_processor_does_not_import_adapters():
+    source = _KCL_PROCESSOR.replace("kcl.KCLProcess(RecordProcessor()).run()",
+                                    "kcl.KCLProcess(RecordProcessor())\n"
+                                    "import sys\n"
+                                    "print(sorted(m for m in ['amazon_kclpy.v2.processor', 'traceback'] "
+                                    "if m in sys.modules))")
+    output = subprocess.check_output([sys.executable, '-c', source], env=dict(os.environ, PYTHONPATH=_REPO_ROOT),
+                                     universal_newlines=True)
+    assert output.strip() == '[]'
+
+
+@pytest.mark.skipif(not _BUDGET_MS, reason='KCLPY_COLD_START_BUDGET_MS is not set')
+def test_cold_start_within_budget():
+    baseline = _best_of(_BARE_PROCESSOR)
+    measured = _best_of(_KCL_PROCESSOR)
+    overhead = measured - baseline
+    sys.stderr.write('cold start: {m:.1f} ms, bare interpreter: {b:.1f} ms, overhead: {o:.1f} ms\n'
+                     .format(m=measured, b=baseline, o=overhead))
+    budget = float(_BUDGET_MS)
+    assert overhead <= budget, 'Cold start overhead of {o:.1f} ms exceeds the budget of {b:.0f} ms'.format(
+        o=overhead, b=budget)
@@ -0,0 +1,50 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Runs the hot path microbenchmarks.  A quick pass over small batch shapes always runs, to keep the benchmarks working.
+The full suite, compared against a baseline, only runs when ``KCLPY_BENCHMARK_BASELINE`` is set, see
+:mod:`hot_paths`.
+"""
+import os
+
+import pytest
+
+from test.benchmarks import hot_paths
+
+_BASELINE = os.environ.get('KCLPY_BENCHMARK_BASELINE')
+_MAX_REGRESSION = float(os.environ.get('KCLPY_BENCHMARK_MAX_REGRESSION', '10'))
+
+
+def test_benchmarks_run_at_small_shapes():
+    results = hot_paths.run_benchmarks(quick=True, repeat=1, min_time=0.01)
+
+    assert 'write_action' in results
+    assert 'checkpoint' in results
+    assert hot_paths.benchmark_name('binary_data', 100, 10000) in results
+    assert all(seconds > 0 for seconds in results.values())
+
+
+def test_shapes_stay_within_a_get_records_call():
+    assert (10000, 1000) in hot_paths.shapes()
+    assert (1, 1000000) in hot_paths.shapes()
+    assert (100, 1000000) not in hot_paths.shapes()
+
+
+def test_compare_reports_regressions_beyond_the_limit():
+    baseline = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+    results = {'a': 1.05, 'b': 1.5, 'c': 0.5, 'd': 9.0}
+
+    assert hot_paths.compare(results, baseline, 10) == [('b', 1.0, 1.5, 50.0)]
+
+
+@pytest.mark.skipif(not _BASELINE, reason='KCLPY_BENCHMARK_BASELINE is not set')
+def test_no_regression_against_baseline():
+    results = hot_paths.run_benchmarks()
+    if not os.path.exists(_BASELINE):
+        hot_paths.save_baseline(_BASELINE, results)
+        pytest.skip('Recorded a new baseline in {path}'.format(path=_BASELINE))
+    baseline = hot_paths.load_baseline(_BASELINE)
+    regressions = hot_paths.compare(results, baseline, _MAX_REGRESSION)
+    assert not regressions, 'Slower than the baseline by more than {limit:g}%:\n{table}'.format(
+        limit=_MAX_REGRESSION, table='\n'.join('{n}: {c:+.1f}%'.format(n=name, c=change)
+                                               for name, _, _, change in regressions))
@@ -0,0 +1,34 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Checks that memory allocated by amazon_kclpy doesn't grow as batches are processed, for each record processor
+interface.  The length of the run and the allowed growth are set with ``KCLPY_SOAK_BATCHES`` (default 1000) and
+``KCLPY_SOAK_MAX_GROWTH_BYTES`` (default 16384).  Set ``KCLPY_SOAK_MAX_RSS_GROWTH_MB`` to also bound the growth of
+the resident set size, which is only meaningful for long runs.
+"""
+import os
+import sys
+
+import pytest
+
+from test.benchmarks import soak
+
+_BATCHES = int(os.environ.get('KCLPY_SOAK_BATCHES', '1000'))
+_MAX_GROWTH = int(os.environ.get('KCLPY_SOAK_MAX_GROWTH_BYTES', '16384'))
+_MAX_RSS_GROWTH_MB = os.environ.get('KCLPY_SOAK_MAX_RSS_GROWTH_MB')
+
+
+@pytest.mark.parametrize('api', sorted(soak.PROCESSORS))
+def test_allocations_stay_bounded(api):
+    record_processor = soak.PROCESSORS[api](checkpoint_every=10)
+    report = soak.soak(record_processor, _BATCHES)
+
+    assert record_processor.batches == _BATCHES
+    growth = report.group_growth()
+    assert sorted(growth) == sorted(name for name, _ in soak.MODULE_GROUPS)
+    grown = dict((name, size) for name, size in growth.items() if size > _MAX_GROWTH)
+    assert not grown, 'Allocations grew by more than {limit} bytes:\n{report}'.format(limit=_MAX_GROWTH,
+                                                                                      report=soak.render(report))
+    if _MAX_RSS_GROWTH_MB is not None and report.rss_growth() is not None:
+        sys.stderr.write(soak.render(report) + '\n')
+        assert report.rss_growth() <= float(_MAX_RSS_GROWTH_MB) * 1024 * 1024
@@ -0,0 +1,34 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Keeps the pipe throughput harness working with a short run.  Use ``throughput.py`` directly for real measurements.
+"""
+import random
+
+import pytest
+
+from test.benchmarks import throughput
+
+
+def test_payload_size_distributions():
+    rng = random.Random(1)
+
+    assert throughput.parse_distribution('512')(rng) == 512
+    assert 10 <= throughput.parse_distribution('uniform:10:20')(rng) <= 20
+    assert throughput.parse_distribution('lognormal:1024:0.5')(rng) > 0
+    with pytest.raises(ValueError):
+        throughput.parse_distribution('pareto:1')
+
+
+def test_short_run_over_pipes():
+    generator = throughput.WorkloadGenerator(records_per_batch=20, payload_size='uniform:100:300', pool_size=4,
+                                             seed=3)
+    report = throughput.run(generator, batches=40, checkpoint_every=4)
+
+    assert report.batches == 40
+    assert report.records == 800
+    assert report.payload_bytes == sum(size for _, size in generator.batches) * 10
+    assert report.checkpoints == 10
+    assert report.round_trips.count == 40
+    assert 0 < report.round_trip_millis(50) <= report.round_trip_millis(99)
+    assert report.records_per_second > 0
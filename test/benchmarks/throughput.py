@@ -0,0 +1,224 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Measures end to end throughput of a record processor running as a separate process over real OS pipes, the way the
+MultiLangDaemon runs it, so that the cost of pipes, buffering and scheduling is included::
+
+    python test/benchmarks/throughput.py --batches 2000 --records 500 --payload-size lognormal:1024:1.0
+    python test/benchmarks/throughput.py --checkpoint-every 1 -- python my_app.py
+
+Batches are produced by a :class:`WorkloadGenerator` with a configurable number of records and payload size
+distribution.  Without a command, a minimal record processor is run that decodes every record and checkpoints every
+``--checkpoint-every`` batches.  The round trip of each batch, from writing ``processRecords`` to reading its status
+response (including any checkpoints made along the way), is recorded, and records/s, MB/s and the p50 and p99 round
+trip are reported.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if __name__ == '__main__':
+    sys.path.insert(0, _REPO_ROOT)
+
+from amazon_kclpy.emulator import ProcessorConnection
+from amazon_kclpy.histogram import Histogram
+from amazon_kclpy.loadgen import parse_distribution
+
+_FIRST_SEQUENCE_NUMBER = 49500000000000000000000000000
+
+BENCHMARK_PROCESSOR = """
+import os
+from amazon_kclpy import kcl
+from amazon_kclpy.v3 import processor
+
+
+class RecordProcessor(processor.RecordProcessorBase):
+
+    def __init__(self):
+        self.checkpoint_every = int(os.environ.get('KCLPY_BENCHMARK_CHECKPOINT_EVERY', '0'))
+        self.batches = 0
+
+    def initialize(self, initialize_input):
+        pass
+
+    def process_records(self, process_records_input):
+        records = process_records_input.records
+        for record in records:
+            record.binary_data
+        self.batches += 1
+        if self.checkpoint_every and self.batches % self.checkpoint_every == 0:
+            process_records_input.checkpointer.checkpoint(records[-1].sequence_number)
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        pass
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+
+kcl.KCLProcess(RecordProcessor()).run()
+"""
+
+
+class WorkloadGenerator(object):
+    """
+    Produces processRecords messages.  A pool of distinct batches is generated up front and cycled through, so that
+    generating the workload doesn't slow the benchmark down.
+    """
+
+    def __init__(self, records_per_batch=100, payload_size='1024', pool_size=32, seed=None):
+        """
+        :param int records_per_batch: the number of records in each batch
+        :param str payload_size: the payload size distribution, see :func:`parse_distribution`
+        :param int pool_size: the number of distinct batches generated
+        :param int or None seed: seeds the payload sizes and contents, for repeatable workloads
+        """
+        rng = random.Random(seed)
+        sizes = parse_distribution(payload_size)
+        self.batches = []
+        for batch in range(pool_size):
+            records = []
+            payload_bytes = 0
+            for n in range(records_per_batch):
+                size = sizes(rng)
+                payload_bytes += size
+                data = bytes(bytearray(rng.getrandbits(8) for _ in range(min(size, 64)))) * (size // 64 + 1)
+                records.append({'action': 'record', 'data': base64.b64encode(data[:size]).decode('ascii'),
+                                'partitionKey': str(rng.getrandbits(32)),
+                                'sequenceNumber': str(_FIRST_SEQUENCE_NUMBER + batch * records_per_batch + n),
+                                'subSequenceNumber': 0, 'approximateArrivalTimestamp': 1700000000000})
+            self.batches.append(({'action': 'processRecords', 'records': records, 'millisBehindLatest': 0},
+                                 payload_bytes))
+
+    def batch(self, index):
+        """
+        :param int index: the number of the batch
+        :return: the processRecords message and the number of payload bytes in it
+        :rtype: tuple
+        """
+        return self.batches[index % len(self.batches)]
+
+
+class ThroughputReport(object):
+    """
+    The result of a benchmark run.
+    """
+
+    def __init__(self, seconds, batches, records, payload_bytes, checkpoints, round_trips):
+        self.seconds = seconds
+        self.batches = batches
+        self.records = records
+        self.payload_bytes = payload_bytes
+        self.checkpoints = checkpoints
+        self.round_trips = round_trips
+
+    @property
+    def records_per_second(self):
+        return self.records / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        return self.payload_bytes / self.seconds / 1e6 if self.seconds > 0 else 0.0
+
+    def round_trip_millis(self, percentile):
+        """
+        :param float percentile: the percentile, from 0 to 100
+        :return: the batch round trip time at the percentile, in milliseconds
+        :rtype: float
+        """
+        return self.round_trips.percentile(percentile) / 1000.0
+
+
+def run(generator, batches, command=None, checkpoint_every=0, env=None):
+    """
+    Runs a record processor over pipes, and measures its throughput.
+
+    :param WorkloadGenerator generator: produces the batches
+    :param int batches: the number of batches sent
+    :param list[str] or None command: the record processor command, defaults to :data:`BENCHMARK_PROCESSOR`
+    :param int checkpoint_every: how many batches the default record processor processes between checkpoints, or 0
+        to never checkpoint
+    :param dict or None env: the environment of the record processor, defaults to this process's
+    :rtype: ThroughputReport
+    """
+    env = dict(os.environ if env is None else env)
+    if command is None:
+        command = [sys.executable, '-c', BENCHMARK_PROCESSOR]
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [_REPO_ROOT, env.get('PYTHONPATH')]))
+        env['KCLPY_BENCHMARK_CHECKPOINT_EVERY'] = str(checkpoint_every)
+    checkpoints = [0]
+
+    def on_checkpoint(request):
+        checkpoints[0] += 1
+        return {'action': 'checkpoint', 'sequenceNumber': request.get('sequenceNumber'),
+                'subSequenceNumber': request.get('subSequenceNumber')}
+
+    lines = [json.dumps(message) for message, _ in generator.batches]
+    round_trips = Histogram()
+    records = payload_bytes = 0
+    connection = ProcessorConnection(command, env)
+    try:
+        connection.exchange({'action': 'initialize', 'shardId': 'shardId-000000000000',
+                             'sequenceNumber': 'TRIM_HORIZON', 'subSequenceNumber': None}, on_checkpoint)
+        started = time.perf_counter()
+        for index in range(batches):
+            message, size = generator.batch(index)
+            sent = time.perf_counter()
+            connection.exchange_line(lines[index % len(lines)], message['action'], on_checkpoint)
+            round_trips.record((time.perf_counter() - sent) * 1e6)
+            records += len(message['records'])
+            payload_bytes += size
+        elapsed = time.perf_counter() - started
+        connection.exchange({'action': 'shutdownRequested'}, on_checkpoint)
+    finally:
+        connection.close()
+    return ThroughputReport(elapsed, batches, records, payload_bytes, checkpoints[0], round_trips)
+
+
+def render(report):
+    """
+    :param ThroughputReport report: the report returned by :func:`run`
+    :rtype: str
+    """
+    return ('{b} batches, {r} records, {c} checkpoints in {s:.3f} seconds\n'
+            '{rps:.1f} records/s, {mbps:.3f} MB/s\n'
+            'batch round trip: p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {max:.3f} ms').format(
+        b=report.batches, r=report.records, c=report.checkpoints, s=report.seconds, rps=report.records_per_second,
+        mbps=report.megabytes_per_second, p50=report.round_trip_millis(50), p99=report.round_trip_millis(99),
+        max=report.round_trips.max / 1000.0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measures record processor throughput over OS pipes.')
+    parser.add_argument('--batches', dest='batches', type=int, default=1000,
+                        help='The number of batches sent. Default is 1000.')
+    parser.add_argument('--records', dest='records_per_batch', type=int, default=100,
+                        help='The number of records in each batch. Default is 100.')
+    parser.add_argument('--payload-size', dest='payload_size', default='1024',
+                        help='The payload size distribution: <bytes>, uniform:<low>:<high> or '
+                             'lognormal:<median>:<sigma>. Default is 1024.')
+    parser.add_argument('--checkpoint-every', dest='checkpoint_every', type=int, default=10,
+                        help='Batches between checkpoints of the default record processor, 0 for none. '
+                             'Default is 10.')
+    parser.add_argument('--seed', dest='seed', type=int, default=None, help='Seeds the workload.')
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='The record processor command, after --. Defaults to a minimal record processor.')
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    generator = WorkloadGenerator(args.records_per_batch, args.payload_size, seed=args.seed)
+    report = run(generator, args.batches, command or None, args.checkpoint_every)
+    sys.stdout.write(render(report) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
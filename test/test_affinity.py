@@ -0,0 +1,72 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import pytest
+from mock import Mock
+
+pytest.importorskip('fcntl')
+
+from amazon_kclpy import affinity, messages
+
+
+@pytest.fixture
+def pinned(monkeypatch):
+    calls = []
+    monkeypatch.setattr(os, 'sched_setaffinity', lambda pid, cpus: calls.append(list(cpus)), raising=False)
+    return calls
+
+
+def _initialize(shard_id):
+    return messages.InitializeInput({"action": "initialize", "shardId": shard_id, "sequenceNumber": None,
+                                     "subSequenceNumber": None})
+
+
+def test_assign_cpus_spreads_and_wraps():
+    members = {'10': {'shard_id': 'shardId-2'}, '11': {'shard_id': 'shardId-1'}, '12': {'shard_id': 'shardId-3'}}
+
+    assert affinity.assign_cpus(members, [0, 1, 2, 3]) == {'11': [0], '10': [1], '12': [2]}
+    assert affinity.assign_cpus(members, [0, 1]) == {'11': [0], '10': [1], '12': [0]}
+    assert affinity.assign_cpus(members, [0, 1, 2, 3], cpus_per_shard=2) == {'11': [0, 1], '10': [2, 3],
+                                                                             '12': [0, 1]}
+
+
+def test_niceness_for_lag():
+    table = [(0, 10), (60000, 0)]
+
+    assert affinity.niceness_for_lag(table, 10) == 10
+    assert affinity.niceness_for_lag(table, 120000) == 0
+    assert affinity.niceness_for_lag(table, None) is None
+
+
+def test_hook_pins_on_initialize_and_releases_on_lease_lost(tmp_path, pinned):
+    hook = affinity.AffinityHook(str(tmp_path), cpus=[2, 3])
+
+    hook.action_started(_initialize("shardId-1"))
+    assert pinned == [[2]]
+    assert hook.registry.read()['members'][str(os.getpid())]['cpus'] == [2]
+
+    hook.action_finished(messages.LeaseLostInput({"action": "leaseLost"}), None)
+    assert hook.registry.read()['members'] == {}
+    assert pinned == [[2], [2, 3]]
+
+
+def test_dead_processes_are_pruned(tmp_path, pinned):
+    registry = affinity.AffinityRegistry(str(tmp_path), cpus=[0, 1])
+    registry.update(lambda members: members.update({str(2 ** 22 + 12345): {'shard_id': 'shardId-0', 'cpus': []}}))
+
+    assert list(registry.join("shardId-1")['members'].keys()) == [str(os.getpid())]
+
+
+def test_renice_follows_lag(tmp_path, pinned, monkeypatch):
+    setpriority = Mock()
+    monkeypatch.setattr(os, 'setpriority', setpriority)
+    hook = affinity.AffinityHook(str(tmp_path), cpus=[0], lag_niceness=[(0, 10), (60000, 0)])
+    hook.action_started(_initialize("shardId-1"))
+
+    process_records = Mock(action='processRecords', millis_behind_latest=5)
+    hook.action_started(process_records)
+    hook.action_started(process_records)
+    setpriority.assert_called_once_with(os.PRIO_PROCESS, 0, 10)
+    hook.close()
@@ -0,0 +1,93 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+
+import pytest
+
+from amazon_kclpy.aggregation import MAGIC, RecordAggregator, UserRecord, aggregate, deaggregate, is_aggregated
+from amazon_kclpy.shards import ShardMap
+from utils import LocalStream
+
+
+def test_encoding_matches_the_kpl_format():
+    aggregator = RecordAggregator()
+    aggregator.add(b'hi', 'pk')
+
+    record = aggregator.flush()
+
+    body = b'\x0a\x02pk' + b'\x1a\x06\x08\x00\x1a\x02hi'
+    assert record.data == MAGIC + body + hashlib.md5(body).digest()
+    assert (record.partition_key, record.explicit_hash_key, record.count) == ('pk', None, 1)
+
+
+def _keys_on(shard_map, shard_id, count):
+    return [key for key in ('key-{n}'.format(n=n) for n in range(100)) if shard_map.shard_for(key) == shard_id][:count]
+
+
+def test_mixed_keys_on_one_shard_round_trip():
+    shard_map = ShardMap(LocalStream(), 'stream')
+    first, second = _keys_on(shard_map, 'shardId-000000000000', 2)
+    user_records = [UserRecord(b'a' * 200, first), UserRecord(b'', second, '12345'),
+                    UserRecord(b'\x00\xff', first, '12345'), UserRecord('café'.encode('utf-8'), second)]
+    aggregator = RecordAggregator(shard_map=shard_map)
+    for user_record in user_records:
+        assert aggregator.add(user_record.data, user_record.partition_key, user_record.explicit_hash_key) is None
+    size = aggregator.size
+
+    record = aggregator.flush()
+
+    assert len(record.data) + len(record.partition_key) == size
+    assert is_aggregated(record.data)
+    assert deaggregate(record.data) == user_records
+    assert aggregator.flush() is None
+
+
+def test_records_for_other_shards_or_keys_finish_the_aggregate():
+    shard_map = ShardMap(LocalStream(), 'stream')
+    first, second = _keys_on(shard_map, 'shardId-000000000000', 2)
+    other, = _keys_on(shard_map, 'shardId-000000000001', 1)
+    by_shard = RecordAggregator(shard_map=shard_map)
+    by_key = RecordAggregator()
+
+    assert [by_shard.add(b'x', key) is not None for key in (first, second, other, other, first)] == \
+        [False, False, True, False, True]
+    assert [by_key.add(b'x', key) is not None for key in (first, first, second, second, other)] == \
+        [False, False, True, False, True]
+    assert [record.count for record in aggregate([(b'x', key) for key in (first, other, second, first)],
+                                                 shard_map=shard_map)] == [3, 1]
+
+
+def test_groups_are_packed_up_to_the_size_limit():
+    records = [(('{k}:{n}'.format(k=n % 3, n=n) * 10).encode('ascii'), 'key-{k}'.format(k=n % 3))
+               for n in range(300)]
+
+    aggregated = aggregate(records, max_size=1000)
+
+    assert all(len(record.data) + len(record.partition_key) <= 1000 for record in aggregated)
+    assert [record.partition_key for record in aggregated[:3]] == ['key-0', 'key-0', 'key-0']
+    decoded = [user_record for record in aggregated for user_record in deaggregate(record.data)]
+    assert sum(record.count for record in aggregated) == len(decoded) == 300
+    for key in ('key-0', 'key-1', 'key-2'):
+        assert [user_record.data for user_record in decoded if user_record.partition_key == key] == \
+            [data for data, partition_key in records if partition_key == key]
+
+
+def test_oversized_records_are_rejected_without_losing_the_current_aggregate():
+    aggregator = RecordAggregator(max_size=100)
+    aggregator.add(b'small', 'key')
+
+    with pytest.raises(ValueError):
+        aggregator.add(b'x' * 100, 'key')
+
+    assert deaggregate(aggregator.flush().data) == [UserRecord(b'small', 'key')]
+
+
+def test_other_payloads_are_a_single_user_record():
+    aggregator = RecordAggregator()
+    aggregator.add(b'data', 'key')
+    corrupted = bytearray(aggregator.flush().data)
+    corrupted[-1] ^= 0xff
+
+    assert deaggregate(b'plain', 'outer') == [UserRecord(b'plain', 'outer')]
+    assert deaggregate(bytes(corrupted), 'outer') == [UserRecord(bytes(corrupted), 'outer')]
@@ -0,0 +1,138 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import struct
+
+import pytest
+
+from amazon_kclpy import messages
+from amazon_kclpy.codec import Codec, CodecRegistry, JsonCodec, SchemaCache, split_schema_id
+
+
+def _records(*payloads, **kwargs):
+    partition_keys = kwargs.get('partition_keys') or ['key'] * len(payloads)
+    return [messages.Record({'data': base64.b64encode(payload).decode('ascii'), 'partitionKey': key,
+                             'sequenceNumber': str(n), 'subSequenceNumber': 0, 'approximateArrivalTimestamp': 0})
+            for n, (payload, key) in enumerate(zip(payloads, partition_keys))]
+
+
+class PrefixedTextCodec(Codec):
+    """
+    Decodes payloads prefixed with a schema id, where the "schema" names a text encoding.
+    """
+
+    def __init__(self, resolver):
+        self.schemas = SchemaCache(resolver)
+
+    def decode(self, payload):
+        schema_id, body = split_schema_id(payload)
+        return body.decode(self.schemas.get(schema_id))
+
+
+@pytest.mark.parametrize('use_orjson', [False, None])
+def test_json_failures_are_separated(use_orjson):
+    records = _records(b'{"a": 1}', b'not json', b'[2, 3]')
+    decoded = CodecRegistry(default=JsonCodec(use_orjson=use_orjson)).decode(records)
+
+    assert decoded.values == [{'a': 1}, None, [2, 3]]
+    assert [(failure.index, failure.record) for failure in decoded.failures] == [(1, records[1])]
+    assert [value for _, value in decoded.successes()] == [{'a': 1}, [2, 3]]
+
+
+def test_json_lines():
+    decoded = CodecRegistry(default=JsonCodec(lines=True, use_orjson=False)).decode(_records(b'{"a": 1}\n\n{"a": 2}\n'))
+
+    assert decoded.values == [[{'a': 1}, {'a': 2}]]
+
+
+def test_routes_by_content_type_and_caches_schemas():
+    resolved = []
+
+    def resolver(schema_id):
+        resolved.append(schema_id)
+        return {1: 'utf-8', 2: 'utf-16-le'}[schema_id]
+
+    text = PrefixedTextCodec(resolver)
+    registry = CodecRegistry(default=JsonCodec(use_orjson=False))
+    registry.register('text', text)
+    records = _records(struct.pack('>BI', 0, 1) + b'hello', b'{"b": true}', struct.pack('>BI', 0, 2) +
+                       'wide'.encode('utf-16-le'), struct.pack('>BI', 0, 1) + b'again', b'\x01bad',
+                       partition_keys=['text-1', 'json-1', 'text-2', 'text-3', 'text-4'])
+
+    decoded = registry.decode(records, content_type=lambda record: record.partition_key.split('-')[0])
+
+    assert decoded.values == ['hello', {'b': True}, 'wide', 'again', None]
+    assert [failure.index for failure in decoded.failures] == [4]
+    assert isinstance(decoded.failures[0].error, ValueError)
+    assert resolved == [1, 2]
+
+
+def test_unregistered_content_type_without_default_fails_records():
+    decoded = CodecRegistry().decode(_records(b'1', b'2'), content_type='avro')
+
+    assert decoded.values == [None, None]
+    assert [type(failure.error) for failure in decoded.failures] == [LookupError, LookupError]
+
+
+def test_bad_base64_fails_only_its_record():
+    records = _records(b'{"a": 1}', b'[2]')
+    records.insert(1, messages.Record({'data': 'not*base64', 'partitionKey': 'key', 'sequenceNumber': '9',
+                                       'subSequenceNumber': 0, 'approximateArrivalTimestamp': 0}))
+
+    decoded = CodecRegistry(default=JsonCodec(use_orjson=False)).decode(records)
+
+    assert decoded.values == [{'a': 1}, None, [2]]
+    assert [failure.index for failure in decoded.failures] == [1]
+
+
+def test_message_pack():
+    msgpack = pytest.importorskip('msgpack')
+    from amazon_kclpy.codec import MessagePackCodec
+
+    decoded = CodecRegistry(default=MessagePackCodec()).decode(
+        _records(msgpack.packb({'a': [1, 'b']}), b'\xc1', msgpack.packb(2)))
+
+    assert decoded.values == [{'a': [1, 'b']}, None, 2]
+    assert [failure.index for failure in decoded.failures] == [1]
+
+
+def test_avro_with_fixed_and_registered_schemas():
+    fastavro = pytest.importorskip('fastavro')
+    from io import BytesIO
+    from amazon_kclpy.codec import AvroCodec
+
+    schemas = {1: {'type': 'record', 'name': 'Order', 'fields': [{'name': 'id', 'type': 'long'},
+                                                                 {'name': 'sku', 'type': 'string'}]},
+               2: {'type': 'record', 'name': 'Ping', 'fields': [{'name': 'at', 'type': 'long'}]}}
+
+    def encode(schema_id, value):
+        body = BytesIO()
+        fastavro.schemaless_writer(body, fastavro.parse_schema(schemas[schema_id]), value)
+        return struct.pack('>BI', 0, schema_id) + body.getvalue()
+
+    resolved = []
+    codec = AvroCodec(schema_resolver=lambda schema_id: resolved.append(schema_id) or schemas[schema_id])
+    payloads = [encode(1, {'id': 7, 'sku': 's-1'}), encode(2, {'at': 3}), encode(1, {'id': 8, 'sku': 's-2'})[:-1],
+                encode(2, {'at': 4}) + b'\x00', b'\x01bad', encode(1, {'id': 9, 'sku': ''})]
+
+    decoded = CodecRegistry(default=codec).decode(_records(*payloads))
+
+    assert decoded.values == [{'id': 7, 'sku': 's-1'}, {'at': 3}, None, None, None, {'id': 9, 'sku': ''}]
+    assert [failure.index for failure in decoded.failures] == [2, 3, 4]
+    assert resolved == [1, 2]
+    assert AvroCodec(schema=schemas[2]).decode(encode(2, {'at': 5})[5:]) == {'at': 5}
+
+
+def test_protobuf_with_fixed_and_registered_message_classes():
+    pytest.importorskip('google.protobuf')
+    from google.protobuf.wrappers_pb2 import Int64Value, StringValue
+    from amazon_kclpy.codec import ProtobufCodec
+
+    fixed = CodecRegistry(default=ProtobufCodec(message_class=StringValue)).decode(
+        _records(StringValue(value='a').SerializeToString(), b'\xff\xff'))
+    registered = ProtobufCodec(message_class_resolver={1: StringValue, 2: Int64Value}.get).decode_batch(
+        [struct.pack('>BI', 0, 2) + Int64Value(value=5).SerializeToString(), b'no id'])
+
+    assert fixed.values[0].value == 'a' and [failure.index for failure in fixed.failures] == [1]
+    assert registered[0][0].value == 5 and list(registered[1]) == [1]
@@ -0,0 +1,86 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import csv
+import json
+import os
+
+import pytest
+
+from amazon_kclpy import dispatch
+from amazon_kclpy.sinks.columnar import CSV, PARQUET, ColumnarFileSink
+from utils import FakeClock, RecordingCheckpointer
+
+
+def _batch(checkpointer, first, count, size=10):
+    records = [{'action': 'record', 'data': base64.b64encode(('{n:0{size}d}'.format(n=n, size=size)).encode())
+                .decode('ascii'), 'partitionKey': 'pk-{n}'.format(n=n), 'sequenceNumber': str(n),
+                'subSequenceNumber': 0, 'approximateArrivalTimestamp': 1700000000000 + n}
+               for n in range(first, first + count)]
+    process_records_input = json.loads(json.dumps({'action': 'processRecords', 'records': records,
+                                                   'millisBehindLatest': 0}), object_hook=dispatch.message_decode)
+    process_records_input._checkpointer = checkpointer
+    return process_records_input
+
+
+def _read_csv(path):
+    with open(path, newline='') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_rolls_on_size_and_checkpoints_after_rename(tmpdir):
+    checkpointer = RecordingCheckpointer()
+    sink = ColumnarFileSink(str(tmpdir), prefix='shardId-1', file_format=CSV, max_bytes=250,
+                            extract=lambda record: {'length': len(record.binary_data)}, extra_columns=['length'])
+
+    assert sink.add(_batch(checkpointer, 0, 20)) is None
+    assert checkpointer.checkpoints == []
+    path = sink.add(_batch(checkpointer, 20, 10))
+
+    assert os.path.basename(path) == 'shardId-1-0-29.csv'
+    assert checkpointer.checkpoints == [('29', 0)]
+    assert sorted(os.listdir(str(tmpdir))) == ['shardId-1-0-29.csv']
+    rows = _read_csv(path)
+    assert rows[0] == ['sequence_number', 'sub_sequence_number', 'partition_key', 'arrival_millis', 'data', 'length']
+    assert rows[1] == ['0', '0', 'pk-0', '1700000000000', base64.b64encode(b'0000000000').decode('ascii'), '10']
+    assert len(rows) == 31
+    assert sink.buffered_records == 0
+
+
+def test_rolls_on_age_and_flushes_the_rest(tmpdir):
+    clock = FakeClock(1000.0)
+    checkpointer = RecordingCheckpointer()
+    sink = ColumnarFileSink(str(tmpdir), file_format=CSV, max_age=60, clock=clock)
+
+    sink.add(_batch(checkpointer, 0, 5))
+    clock.now += 61
+    assert sink.add(_batch(checkpointer, 5, 5)) is not None
+    sink.add(_batch(checkpointer, 10, 3))
+    sink.flush(checkpointer)
+
+    assert checkpointer.checkpoints == [('9', 0), ('12', 0)]
+    assert sink.flush(checkpointer) is None
+    assert [len(_read_csv(path)) - 1 for path in sink.files] == [10, 3]
+
+
+def test_records_stay_buffered_when_the_write_fails(tmpdir):
+    checkpointer = RecordingCheckpointer()
+    sink = ColumnarFileSink(os.path.join(str(tmpdir), 'missing'), file_format=CSV, max_bytes=1)
+
+    with pytest.raises(IOError):
+        sink.add(_batch(checkpointer, 0, 3))
+    assert checkpointer.checkpoints == []
+    assert sink.buffered_records == 3
+
+
+def test_parquet(tmpdir):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    checkpointer = RecordingCheckpointer()
+    sink = ColumnarFileSink(str(tmpdir), file_format=PARQUET)
+    sink.add(_batch(checkpointer, 0, 4))
+    path = sink.flush(checkpointer)
+
+    table = parquet.read_table(path)
+    assert table.column('sequence_number').to_pylist() == ['0', '1', '2', '3']
+    assert checkpointer.checkpoints == [('3', 0)]
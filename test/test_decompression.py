@@ -0,0 +1,88 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import gzip
+import zlib
+
+import pytest
+
+from amazon_kclpy import messages
+from amazon_kclpy.decompression import GZIP, ZLIB, ZSTD, DecompressionStage, detect_format
+
+
+def _records(*payloads):
+    return [messages.Record({'data': base64.b64encode(payload).decode('ascii'), 'partitionKey': 'key',
+                             'sequenceNumber': str(n), 'subSequenceNumber': 0, 'approximateArrivalTimestamp': 0})
+            for n, payload in enumerate(payloads)]
+
+
+def test_detect_format():
+    assert detect_format(gzip.compress(b'data')) == GZIP
+    assert detect_format(zlib.compress(b'data', 9)) == ZLIB
+    assert detect_format(b'\x28\xb5\x2f\xfd rest') == ZSTD
+    assert detect_format(b'{"plain": "json"}') is None
+    assert detect_format(b'') is None
+
+
+def test_batch_with_mixed_formats_and_failures():
+    payload = b'{"event": "click"}' * 50
+    records = _records(gzip.compress(payload), zlib.compress(payload), payload, gzip.compress(payload)[:-8],
+                       b'\x1f\x8bnot gzip')
+
+    batch = DecompressionStage(threads=0).decompress(records)
+
+    assert batch.payloads == [payload, payload, payload, None, None]
+    assert batch.formats == [GZIP, ZLIB, None, GZIP, GZIP]
+    assert [failure.index for failure in batch.failures] == [3, 4]
+
+
+def test_formats_can_be_disabled():
+    compressed = zlib.compress(b'data')
+
+    assert DecompressionStage(formats=[GZIP]).decompress_payload(compressed) == (compressed, None)
+
+
+def test_output_size_is_limited():
+    stage = DecompressionStage(max_output_size=1000)
+
+    with pytest.raises(ValueError):
+        stage.decompress_payload(gzip.compress(b'\0' * 10000))
+
+
+def test_large_batches_use_the_thread_pool():
+    payloads = [('record {n} '.format(n=n) * 100).encode('ascii') for n in range(40)]
+    stage = DecompressionStage(threads=3, parallel_threshold=0)
+    try:
+        batch = stage.decompress(_records(*[gzip.compress(payload) for payload in payloads]))
+    finally:
+        stage.close()
+
+    assert batch.payloads == payloads
+    assert not batch.failures
+
+
+def test_zstd_with_dictionary(tmpdir):
+    zstandard = pytest.importorskip('zstandard')
+    samples = [('{{"user": "user-{n}", "action": "view", "page": "/item/{n}"}}'.format(n=n)).encode('ascii')
+               for n in range(500)]
+    dictionary = zstandard.train_dictionary(1024, samples)
+    path = tmpdir.join('events.dict')
+    path.write_binary(dictionary.as_bytes())
+    compressor = zstandard.ZstdCompressor(dict_data=dictionary)
+
+    batch = DecompressionStage(zstd_dictionaries=[str(path)]).decompress(
+        _records(compressor.compress(samples[0]), zstandard.ZstdCompressor().compress(samples[1])))
+
+    assert batch.payloads == samples[:2]
+    assert batch.formats == [ZSTD, ZSTD]
+
+
+def test_zstd_frames_without_a_content_size():
+    zstandard = pytest.importorskip('zstandard')
+    compressor = zstandard.ZstdCompressor(write_content_size=False)
+    stage = DecompressionStage(max_output_size=1000)
+
+    assert stage.decompress_payload(compressor.compress(b'\0' * 1000)) == (b'\0' * 1000, ZSTD)
+    with pytest.raises(ValueError):
+        stage.decompress_payload(compressor.compress(b'\0' * 1001))
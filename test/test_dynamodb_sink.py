@@ -0,0 +1,113 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from amazon_kclpy import messages
+from amazon_kclpy.sinks.dynamodb import DynamoDBBatchWriter, UnprocessedItemsError
+from utils import RecordingCheckpointer
+
+
+def _records(count):
+    return [messages.Record({'data': base64.b64encode(b'payload').decode('ascii'), 'partitionKey': 'key',
+                             'sequenceNumber': str(n), 'subSequenceNumber': 0, 'approximateArrivalTimestamp': 0})
+            for n in range(count)]
+
+
+def _item(record):
+    return {'id': {'S': record.sequence_number}}
+
+
+def _puts(records):
+    return {'events': [{'PutRequest': {'Item': _item(record)}} for record in records]}
+
+
+@pytest.fixture
+def client():
+    return boto3.client('dynamodb', region_name='us-east-1', aws_access_key_id='id', aws_secret_access_key='secret')
+
+
+def test_unprocessed_items_are_retried(client):
+    records = _records(30)
+    writer = DynamoDBBatchWriter('events', client=client, item_builder=_item, concurrency=1, sleep=lambda s: None)
+    with Stubber(client) as stubber:
+        stubber.add_response('batch_write_item', {'UnprocessedItems': {}}, {'RequestItems': _puts(records[:25])})
+        stubber.add_response('batch_write_item', {'UnprocessedItems': _puts(records[27:29])},
+                             {'RequestItems': _puts(records[25:])})
+        stubber.add_response('batch_write_item', {'UnprocessedItems': {}}, {'RequestItems': _puts(records[27:29])})
+
+        result = writer.write(records)
+
+        stubber.assert_no_pending_responses()
+    assert result.persisted is records[-1]
+    assert (result.requests, result.retries) == (3, 1)
+    assert not result.failed_records
+
+
+def test_checkpoints_the_persisted_prefix_before_raising(client):
+    records = _records(60)
+    checkpointer = RecordingCheckpointer()
+    process_records_input = messages.ProcessRecordsInput({'action': 'processRecords', 'records': records,
+                                                          'millisBehindLatest': 0})
+    process_records_input._checkpointer = checkpointer
+    writer = DynamoDBBatchWriter('events', client=client, item_builder=_item, concurrency=1, max_attempts=2,
+                                 sleep=lambda s: None)
+    with Stubber(client) as stubber:
+        stubber.add_response('batch_write_item', {}, {'RequestItems': _puts(records[:25])})
+        stubber.add_response('batch_write_item', {'UnprocessedItems': _puts(records[25:26])},
+                             {'RequestItems': _puts(records[25:50])})
+        stubber.add_response('batch_write_item', {'UnprocessedItems': _puts(records[25:26])},
+                             {'RequestItems': _puts(records[25:26])})
+        stubber.add_response('batch_write_item', {}, {'RequestItems': _puts(records[50:])})
+
+        with pytest.raises(UnprocessedItemsError):
+            writer.write_and_checkpoint(process_records_input)
+
+    assert checkpointer.checkpoints == [('24', 0)]
+
+
+def test_concurrent_requests_against_a_local_table():
+    class LocalTable(object):
+
+        def __init__(self):
+            self.items = {}
+            self.calls = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.lock = threading.Lock()
+
+        def batch_write_item(self, RequestItems):
+            with self.lock:
+                self.calls += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                unprocessed = self.calls % 3 == 0
+            time.sleep(0.01)
+            requests = RequestItems['events']
+            written = requests[:-1] if unprocessed and len(requests) > 1 else requests
+            with self.lock:
+                for request in written:
+                    item = request['PutRequest']['Item']
+                    self.items[item['id']['S']] = item
+                self.in_flight -= 1
+            if len(written) < len(requests):
+                return {'UnprocessedItems': {'events': requests[len(written):]}}
+            return {'UnprocessedItems': {}}
+
+    table = LocalTable()
+    records = _records(200)
+    writer = DynamoDBBatchWriter('events', client=table, item_builder=_item, concurrency=4, sleep=lambda s: None)
+    try:
+        result = writer.write(records)
+    finally:
+        writer.close()
+
+    assert result.persisted is records[-1]
+    assert sorted(table.items, key=int) == [record.sequence_number for record in records]
+    assert table.max_in_flight > 1
@@ -0,0 +1,116 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import sys
+
+from amazon_kclpy.emulator import Emulator, Scenario, SHARD_END
+
+_PROCESSOR = '''
+import sys
+from amazon_kclpy import kcl
+from amazon_kclpy.v3 import processor
+
+
+class RecordProcessor(processor.RecordProcessorBase):
+
+    def initialize(self, initialize_input):
+        pass
+
+    def checkpoint(self, checkpointer, sequence_number=None):
+        for attempt in range(10):
+            try:
+                checkpointer.checkpoint(sequence_number)
+                return
+            except kcl.CheckpointError as e:
+                if e.value != 'ThrottlingException':
+                    raise
+
+    def process_records(self, process_records_input):
+        records = process_records_input.records
+        if int(records[-1].sequence_number) % 2:
+            self.checkpoint(process_records_input.checkpointer, records[-1].sequence_number)
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        self.checkpoint(shard_ended_input.checkpointer)
+
+    def shutdown_requested(self, shutdown_requested_input):
+        self.checkpoint(shutdown_requested_input.checkpointer)
+
+
+kcl.KCLProcess(RecordProcessor()).run()
+'''
+
+
+def _emulator(tmpdir, scenario, resume=False):
+    script = tmpdir.join('processor.py')
+    script.write(_PROCESSOR)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    checkpoints = str(tmpdir.join('checkpoints.json'))
+    return Emulator([sys.executable, str(script)], scenario, checkpoints, env=env, resume=resume), checkpoints
+
+
+def test_steady_scenario_checkpoints_every_shard(tmpdir):
+    emulator, checkpoints = _emulator(tmpdir, Scenario.named('steady', shards=2, batches=3, records_per_batch=4,
+                                                             payload_size=16))
+    stats = emulator.run()
+
+    assert [(shard.outcome, shard.records, shard.batches, shard.error) for shard in stats] == \
+        [('completed', 12, 3, None)] * 2
+    with open(checkpoints) as checkpoint_file:
+        persisted = json.load(checkpoint_file)
+    assert sorted(persisted) == ['shardId-000000000000', 'shardId-000000000001']
+    assert all(int(checkpoint['sequenceNumber']) % 100 == 11 for checkpoint in persisted.values())
+
+
+def test_resharding_starts_children_after_shard_end(tmpdir):
+    emulator, _ = _emulator(tmpdir, Scenario.named('resharding', batches=4, records_per_batch=2, payload_size=8))
+    stats = emulator.run()
+
+    assert [(shard.shard_id, shard.outcome, shard.records) for shard in stats] == [
+        ('shardId-000000000000', 'ended', 4),
+        ('shardId-000000000001', 'completed', 4),
+        ('shardId-000000000002', 'completed', 4),
+    ]
+    assert emulator.store.get('shardId-000000000000') == (SHARD_END, None)
+
+
+def test_rerunning_resharding_starts_afresh_or_resumes_from_shard_end(tmpdir):
+    scenario = Scenario.named('resharding', batches=4, records_per_batch=2, payload_size=8)
+    _emulator(tmpdir, scenario)[0].run()
+
+    rerun = _emulator(tmpdir, scenario)[0].run()
+    resumed = _emulator(tmpdir, scenario, resume=True)[0].run()
+
+    assert [(shard.outcome, shard.leases, shard.records) for shard in rerun] == \
+        [('ended', 1, 4), ('completed', 1, 4), ('completed', 1, 4)]
+    assert [(shard.outcome, shard.leases, shard.error) for shard in resumed] == \
+        [('ended', 0, None), ('completed', 1, None), ('completed', 1, None)]
+    assert [shard.records for shard in resumed[1:]] == [0, 0]
+
+
+def test_lease_theft_redelivers_after_checkpoint_with_throttling(tmpdir):
+    emulator, _ = _emulator(tmpdir, Scenario.named('lease-theft', batches=4, records_per_batch=3, payload_size=8,
+                                                   checkpoint_failure_rate=0.3, seed=4))
+    shard, = emulator.run()
+
+    assert shard.error is None
+    assert shard.outcome == 'completed'
+    assert shard.leases == 2
+    assert shard.records == 12 + shard.redelivered
+    assert shard.checkpoint_errors > 0
+
+
+def test_seeded_runs_fail_the_same_checkpoints(tmpdir):
+    scenario = Scenario.named('steady', shards=3, batches=4, records_per_batch=2, payload_size=8,
+                              checkpoint_failure_rate=0.3, seed=7)
+    runs = [_emulator(tmpdir.mkdir(str(run)), scenario)[0].run() for run in range(2)]
+
+    first, second = [[(shard.shard_id, shard.checkpoint_errors) for shard in stats] for stats in runs]
+    assert first == second
+    assert sum(errors for _, errors in first) > 0
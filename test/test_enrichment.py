@@ -0,0 +1,165 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+
+import pytest
+
+from amazon_kclpy import messages
+from amazon_kclpy.enrichment import CacheLifecycleProcessor, EnrichmentCache
+from amazon_kclpy.instrumentation import InstrumentationHook, MetricSink
+from amazon_kclpy.v3 import processor
+from utils import FakeClock
+
+
+class CollectingSink(MetricSink):
+
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, timestamp, metrics):
+        self.emitted.append(metrics)
+
+
+class Processor(processor.RecordProcessorBase):
+
+    def __init__(self):
+        self.calls = []
+
+    def initialize(self, initialize_input):
+        self.calls.append('initialize')
+
+    def process_records(self, process_records_input):
+        pass
+
+    def lease_lost(self, lease_lost_input):
+        self.calls.append('lease_lost')
+
+    def shard_ended(self, shard_ended_input):
+        self.calls.append('shard_ended')
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+
+def _counters(cache):
+    return dict((name.rsplit('.', 1)[1], value) for name, value, kind in cache.metrics() if kind == 'counter')
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_budget():
+    cache = EnrichmentCache(loader=lambda key: key * 4, max_bytes=12, sizer=lambda key, value: len(value))
+
+    assert [cache.get(key) for key in 'abc'] == ['aaaa', 'bbbb', 'cccc']
+    cache.get('a')
+    cache.get('d')
+
+    assert sorted(cache._entries) == ['a', 'c', 'd']
+    assert cache.bytes == 12
+    assert _counters(cache)['evictions'] == 1
+    cache.put('huge', 'x' * 13)
+    assert 'huge' not in cache._entries and len(cache) == 3
+
+
+def test_values_expire_and_missing_keys_are_cached_negatively():
+    clock = FakeClock()
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        return None if key == 'unknown' else key.upper()
+
+    cache = EnrichmentCache(loader=loader, ttl=10, negative_ttl=2, clock=clock)
+
+    assert [cache.get('a'), cache.get('unknown', 'none'), cache.get('a'), cache.get('unknown')] == \
+        ['A', 'none', 'A', None]
+    clock.now = 5
+    cache.get('unknown')
+    clock.now = 11
+    cache.get('a')
+
+    assert loads == ['a', 'unknown', 'unknown', 'a']
+    assert _counters(cache) == {'hits': 1, 'misses': 4, 'negative_hits': 1, 'coalesced': 0, 'loads': 4,
+                                'load_errors': 0, 'evictions': 0, 'expirations': 2}
+
+
+def test_concurrent_misses_share_one_load():
+    release = threading.Event()
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        release.wait(5)
+        return 'value'
+
+    cache = EnrichmentCache(loader=loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('key'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while _counters(cache)['misses'] < 5:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ['key']
+    assert results == ['value'] * 5
+    assert _counters(cache)['coalesced'] == 4
+
+
+def test_bulk_loads_and_errors():
+    calls = []
+
+    def bulk_loader(keys):
+        calls.append(keys)
+        if 'bad' in keys:
+            raise IOError('lookup failed')
+        return dict((key, key.upper()) for key in keys if key != 'unknown')
+
+    cache = EnrichmentCache(bulk_loader=bulk_loader)
+
+    assert cache.get_many(['a', 'b', 'a', 'unknown']) == {'a': 'A', 'b': 'B'}
+    assert cache.get_many(['a', 'c', 'unknown']) == {'a': 'A', 'c': 'C'}
+    with pytest.raises(IOError):
+        cache.get_many(['bad'])
+    assert calls == [['a', 'b', 'unknown'], ['c'], ['bad']]
+    assert 'bad' not in cache._entries and _counters(cache)['load_errors'] == 1
+
+
+def test_lifecycle_follows_the_lease():
+    cache = EnrichmentCache(loader=lambda key: None, warmer=lambda shard_id: {shard_id + ':hot': 'warm'})
+    delegate = Processor()
+    lifecycle = CacheLifecycleProcessor(delegate, [cache])
+
+    messages.InitializeInput({'action': 'initialize', 'shardId': 'shardId-1', 'sequenceNumber': None,
+                              'subSequenceNumber': 0}).dispatch(None, lifecycle)
+    assert cache.get('shardId-1:hot') == 'warm'
+    lifecycle.lease_lost(messages.LeaseLostInput({'action': 'leaseLost'}))
+
+    assert len(cache) == 0
+    assert delegate.calls == ['initialize', 'lease_lost']
+
+
+def test_counters_are_flushed_by_the_instrumentation_hook():
+    cache = EnrichmentCache(loader=lambda key: key, name='customers')
+    sink = CollectingSink()
+    hook = InstrumentationHook(sink)
+    hook.add_source(cache)
+    cache.get('a')
+    cache.get('a')
+
+    hook.flush()
+
+    assert ('kclpy.cache.customers.hits', 1, 'counter') in sink.emitted[0]
+    assert ('kclpy.cache.customers.hit_ratio', 0.5, 'gauge') in sink.emitted[0]
+    assert _counters(cache)['hits'] == 0
+
+
+def test_metrics_can_be_reset_in_the_same_step():
+    cache = EnrichmentCache(loader=lambda key: key, name='customers')
+    cache.get('a')
+    cache.get('a')
+
+    assert ('kclpy.cache.customers.hits', 1, 'counter') in cache.metrics(reset=True)
+    assert _counters(cache)['hits'] == 0 and _counters(cache)['misses'] == 0
+    assert ('kclpy.cache.customers.entries', 1, 'gauge') in cache.metrics()
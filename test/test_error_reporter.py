@@ -0,0 +1,85 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+from amazon_kclpy import kcl
+from amazon_kclpy.error_reporter import ErrorReporter
+from utils import CheckpointingProcessor, FakeClock, make_io_obj
+
+
+class DownstreamError(Exception):
+    pass
+
+
+def _fail(message):
+    raise DownstreamError(message)
+
+
+def _report(reporter, message):
+    try:
+        _fail(message)
+    except DownstreamError as e:
+        reporter.report("Caught exception from action dispatch", e)
+
+
+def test_repeats_are_summarized_per_window():
+    clock = FakeClock(1000.0)
+    error_file = make_io_obj()
+    reporter = ErrorReporter(error_file, window=60, clock=clock)
+
+    for attempt in range(5):
+        _report(reporter, "attempt {n}".format(n=attempt))
+    output = error_file.getvalue()
+    assert output.count("Traceback") == 1
+    assert "Caught exception from action dispatch: attempt 0" in output
+
+    clock.now += 61
+    reporter.poll()
+    summary = error_file.getvalue()[len(output):]
+    assert summary.startswith("Suppressed 4 repeats of DownstreamError raised at ")
+    assert "in _fail during the last 60 seconds, most recently: attempt 4" in summary
+
+    clock.now += 61
+    reporter.poll()
+    clock.now += 1
+    _report(reporter, "after recovery")
+    assert error_file.getvalue().count("Traceback") == 2
+
+
+def test_output_is_capped():
+    clock = FakeClock(1000.0)
+    error_file = make_io_obj()
+    reporter = ErrorReporter(error_file, window=60, max_bytes_per_minute=600, clock=clock)
+
+    try:
+        _fail("first")
+    except DownstreamError as e:
+        reporter.report("one", e)
+        reporter.report("two", e)
+        reporter.report("three", e)
+    assert error_file.getvalue().count("Traceback") == 1
+    assert reporter.dropped == 2
+
+    clock.now += 60
+    try:
+        _fail("later")
+    except DownstreamError as e:
+        reporter.report("four", e)
+    assert error_file.getvalue().count("2 error reports were dropped") == 1
+    assert reporter.dropped == 0
+
+
+def test_kcl_process_summarizes_repeated_failures():
+    class FailingProcessor(CheckpointingProcessor):
+        def process_records(self, process_records_input):
+            _fail("downstream unavailable")
+
+    batch = {"action": "processRecords", "millisBehindLatest": 0, "records": []}
+    error_file = make_io_obj()
+    kcl.KCLProcess(FailingProcessor(), input_file=make_io_obj("\n".join([json.dumps(batch)] * 20)),
+                   output_file=make_io_obj(), error_file=error_file).run()
+
+    output = error_file.getvalue()
+    assert output.count("Traceback") == 1
+    assert "Suppressed 19 repeats of DownstreamError" in output
@@ -0,0 +1,127 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import socket
+
+from amazon_kclpy import kcl
+from amazon_kclpy.histogram import Histogram
+from amazon_kclpy.hooks import ProcessHook
+from amazon_kclpy.instrumentation import COUNTER, FileSink, InstrumentationHook, MetricSink, StatsdSink
+from utils import CheckpointingProcessor, make_io_obj
+
+
+class RecordingSink(MetricSink):
+
+    def __init__(self):
+        self.emitted = []
+        self.closed = False
+
+    def emit(self, timestamp, metrics):
+        self.emitted.append(dict((name, value) for name, value, kind in metrics))
+
+    def close(self):
+        self.closed = True
+
+
+def test_histogram_percentiles_within_precision():
+    histogram = Histogram()
+    for value in range(1, 100001):
+        histogram.record(value)
+
+    assert histogram.count == 100000
+    assert histogram.min == 1
+    assert histogram.max == 100000
+    for percentile in (50, 90, 99, 99.9):
+        expected = 100000 * percentile / 100.0
+        assert abs(histogram.percentile(percentile) - expected) / expected < 0.01
+    assert histogram.percentile(100) == 100000
+
+
+def test_histogram_clamps_and_resets():
+    histogram = Histogram(highest_value=1000)
+    histogram.record(-5)
+    histogram.record(10 ** 9)
+
+    assert histogram.min == 0
+    assert histogram.max == 1000
+    histogram.reset()
+    assert histogram.count == 0
+    assert histogram.percentile(50) is None
+
+
+def test_hook_times_each_phase_per_action():
+    records = [{"action": "record", "data": "bWVvdw==", "partitionKey": "cat", "sequenceNumber": "456",
+                "subSequenceNumber": 0, "approximateArrivalTimestamp": 1476889707000}] * 3
+    messages = [
+        {"action": "initialize", "shardId": "shardId-123", "sequenceNumber": "456", "subSequenceNumber": 0},
+        {"action": "processRecords", "millisBehindLatest": 0, "records": records},
+        {"action": "checkpoint", "sequenceNumber": "456", "subSequenceNumber": 0},
+    ]
+    sink = RecordingSink()
+    process = kcl.KCLProcess(CheckpointingProcessor(), input_file=make_io_obj("\n".join(map(json.dumps, messages))),
+                             output_file=make_io_obj(), error_file=make_io_obj(),
+                             hooks=[InstrumentationHook(sink, flush_interval=3600)])
+    process.run()
+
+    assert sink.closed
+    assert len(sink.emitted) == 1
+    metrics = sink.emitted[0]
+    assert metrics['kclpy.processRecords.records'] == 3
+    assert metrics['kclpy.processRecords.bytes'] == 12
+    assert metrics['kclpy.initialize.count'] == 1
+    for phase in ('read', 'decode', 'dispatch', 'write', 'checkpoint'):
+        assert metrics['kclpy.processRecords.{p}.count'.format(p=phase)] == 1
+        assert metrics['kclpy.processRecords.{p}.p99'.format(p=phase)] >= 0
+    assert 'kclpy.initialize.checkpoint.count' not in metrics
+
+
+def test_statsd_sink_packs_datagrams():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(5)
+    sink = StatsdSink(*receiver.getsockname(), max_datagram_size=45)
+    sink.emit(0, [('kclpy.a.records', 3, COUNTER), ('kclpy.a.read.p50', 1.5, 'gauge'),
+                  ('kclpy.a.read.p99', 2.5, 'gauge')])
+
+    assert receiver.recv(1024) == b'kclpy.a.records:3|c\nkclpy.a.read.p50:1.5|g'
+    assert receiver.recv(1024) == b'kclpy.a.read.p99:2.5|g'
+    sink.close()
+    receiver.close()
+
+
+def test_file_sink(tmp_path):
+    path = str(tmp_path.joinpath('metrics.txt'))
+    sink = FileSink(path)
+    sink.emit(12.5, [('kclpy.a.records', 3, COUNTER)])
+    sink.close()
+
+    with open(path) as metrics_file:
+        assert metrics_file.read() == '12.500 kclpy.a.records 3\n'
+
+
+def test_hooks_that_started_are_finished_when_a_later_hook_fails():
+    class Hook(ProcessHook):
+
+        def __init__(self, fail=False):
+            self.fail = fail
+            self.calls = []
+
+        def action_started(self, action):
+            self.calls.append('started')
+            if self.fail:
+                raise RuntimeError('hook failed')
+
+        def action_finished(self, action, error):
+            self.calls.append(('finished', type(error)))
+
+    hooks = [Hook(), Hook(fail=True)]
+    message = {"action": "initialize", "shardId": "shardId-123", "sequenceNumber": "456", "subSequenceNumber": 0}
+    error_file = make_io_obj()
+    process = kcl.KCLProcess(CheckpointingProcessor(), input_file=make_io_obj(json.dumps(message)),
+                             output_file=make_io_obj(), error_file=error_file, hooks=hooks)
+    process.run()
+
+    assert hooks[0].calls == ['started', ('finished', RuntimeError)]
+    assert hooks[1].calls == ['started']
+    assert 'hook failed' in error_file.getvalue()
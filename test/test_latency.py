@@ -0,0 +1,84 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from amazon_kclpy import latency, messages
+from amazon_kclpy.histogram import Histogram
+from amazon_kclpy.instrumentation import MetricSink
+from utils import FakeClock
+
+
+class RecordingSink(MetricSink):
+
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, timestamp, metrics):
+        self.emitted.append(dict((name, value) for name, value, kind in metrics))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(latency.time, 'time', clock)
+    return clock
+
+
+def _batch(arrivals, millis_behind_latest):
+    records = [{"action": "record", "data": "", "partitionKey": "cat", "sequenceNumber": str(index),
+                "subSequenceNumber": 0, "approximateArrivalTimestamp": arrival}
+               for index, arrival in enumerate(arrivals)]
+    return messages.ProcessRecordsInput({"action": "processRecords", "millisBehindLatest": millis_behind_latest,
+                                         "records": [messages.Record(record) for record in records]})
+
+
+def test_latency_from_arrival_to_dispatch_and_completion(clock):
+    hook = latency.LatencyHook(snapshot_interval=3600)
+    batch = _batch([999000, 999000, 999500, 999900], 250)
+
+    hook.action_started(batch)
+    clock.now = 1000.2
+    hook.action_finished(batch, None)
+
+    snapshot = hook.snapshot()
+    assert snapshot[latency.ARRIVAL_TO_DISPATCH]['count'] == 4
+    assert snapshot[latency.ARRIVAL_TO_DISPATCH]['max'] == 1000
+    assert snapshot[latency.ARRIVAL_TO_DISPATCH]['p50'] == pytest.approx(500, rel=0.01)
+    assert snapshot[latency.ARRIVAL_TO_COMPLETION]['max'] == 1200
+    assert snapshot[latency.ARRIVAL_TO_COMPLETION]['p50'] == pytest.approx(700, rel=0.01)
+    assert snapshot[latency.MILLIS_BEHIND_LATEST]['max'] == 250
+
+
+def test_snapshots_are_sent_on_a_timer_and_reset(clock):
+    sink = RecordingSink()
+    hook = latency.LatencyHook(sink, snapshot_interval=10)
+    batch = _batch([999000], 0)
+
+    hook.action_started(batch)
+    hook.action_finished(batch, None)
+    assert sink.emitted == []
+
+    clock.now = 1011.0
+    hook.action_started(batch)
+    hook.action_finished(batch, None)
+    assert len(sink.emitted) == 1
+    assert sink.emitted[0]['kclpy.latency.arrival_to_dispatch.count'] == 2
+    assert 'kclpy.latency.arrival_to_completion.p99_9' in sink.emitted[0]
+    assert hook.snapshot() == {}
+
+
+def test_histograms_merge():
+    first = Histogram()
+    second = Histogram()
+    for value in range(100):
+        first.record(value)
+        second.record(value + 100)
+    first.merge(second)
+
+    assert first.count == 200
+    assert first.min == 0
+    assert first.max == 199
+    assert first.percentile(50) == 99
+    with pytest.raises(ValueError):
+        first.merge(Histogram(precision_bits=5))
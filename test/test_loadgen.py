@@ -0,0 +1,74 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import random
+from collections import Counter
+
+from amazon_kclpy.aggregation import deaggregate
+from amazon_kclpy.decompression import GZIP, DecompressionStage
+from amazon_kclpy.loadgen import KeyChooser, LoadConfig, PayloadFactory, render, run_worker
+from amazon_kclpy.shards import ShardMap
+from utils import FakeClock, LocalStream
+
+
+def test_keys_follow_the_skew():
+    uniform = KeyChooser(10, 0.0, random.Random(1))
+    skewed = KeyChooser(100, 1.2, random.Random(1))
+
+    uniform_counts = Counter(uniform.choose(10000))
+    skewed_counts = Counter(skewed.choose(10000))
+
+    assert len(uniform_counts) == 10 and max(uniform_counts.values()) < 1200
+    assert skewed_counts.most_common(1)[0][0] == 'key-0'
+    assert abs(skewed_counts['key-0'] / 10000.0 - skewed.share(0)) < 0.02
+
+
+def test_payloads_are_compressed_events():
+    factory = PayloadFactory('uniform:100:200', GZIP, random.Random(1))
+    payloads = [factory.make() for _ in range(20)]
+
+    batch = DecompressionStage().decompress_payload(payloads[0][0])
+
+    assert len(batch[0]) == payloads[0][1] and batch[1] == GZIP
+    assert all(100 <= size <= 200 for _, size in payloads)
+    assert sum(len(data) for data, _ in payloads) < sum(size for _, size in payloads)
+
+
+def test_worker_paces_to_the_target_rate():
+    clock = FakeClock()
+    stream = LocalStream()
+    config = LoadConfig('load', records_per_second=2000, payload_size='100', duration=1.0, seed=1)
+
+    report = run_worker(config, stream, clock=clock, sleep=clock.sleep)
+
+    assert 1900 <= report.user_records <= 2000
+    assert report.records == report.records_put == len(stream.records) == report.user_records
+    assert report.payload_bytes == report.user_records * 100
+    assert report.seconds >= 1.0
+    assert '0 failed' in render(report)
+
+
+def test_worker_aggregates_user_records_by_shard():
+    clock = FakeClock()
+    stream = LocalStream()
+    config = LoadConfig('load', payload_size='50', partition_keys=1000, aggregate=True, max_records=600, seed=1)
+
+    report = run_worker(config, stream, workers=2, clock=clock, sleep=clock.sleep)
+
+    shard_map = ShardMap(stream, 'load')
+    user_records = [user_record for record in stream.records for user_record in deaggregate(record['Data'])]
+    assert report.user_records == len(user_records) == 300
+    assert report.records == len(stream.records) <= 4
+    assert all(shard_map.shard_for(user_record.partition_key) == shard_map.shard_for(record['PartitionKey'])
+               for record in stream.records for user_record in deaggregate(record['Data']))
+
+
+def test_aggregated_records_are_put_after_lingering():
+    clock = FakeClock()
+    stream = LocalStream()
+    config = LoadConfig('load', records_per_second=1000, payload_size='50', aggregate=True, max_records=500, seed=1)
+
+    report = run_worker(config, stream, clock=clock, sleep=clock.sleep)
+
+    assert report.user_records == sum(len(deaggregate(record['Data'])) for record in stream.records) == 500
+    assert 8 <= report.records <= 12
@@ -0,0 +1,117 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from amazon_kclpy.instrumentation import InstrumentationHook, MetricSink
+from amazon_kclpy.producer import KinesisProducer, PutRecordsError
+from utils import LocalStream
+
+
+def _ok(shard_id, sequence_number):
+    return {'ShardId': shard_id, 'SequenceNumber': sequence_number}
+
+
+THROTTLED = {'ErrorCode': 'ProvisionedThroughputExceededException', 'ErrorMessage': 'Rate exceeded for shard'}
+
+
+@pytest.fixture
+def client():
+    return boto3.client('kinesis', region_name='us-east-1', aws_access_key_id='id', aws_secret_access_key='secret')
+
+
+def test_only_failed_entries_are_retried(client):
+    producer = KinesisProducer('words', client=client, linger=None, max_in_flight=1, sleep=lambda s: None)
+    with Stubber(client) as stubber:
+        stubber.add_response('put_records', {'FailedRecordCount': 1, 'Records': [_ok('shardId-0', '1'), THROTTLED,
+                                                                                 _ok('shardId-0', '2')]},
+                             {'StreamName': 'words', 'Records': [{'Data': b'a', 'PartitionKey': 'a'},
+                                                                 {'Data': b'b', 'PartitionKey': 'b'},
+                                                                 {'Data': b'c', 'PartitionKey': 'c'}]})
+        stubber.add_response('put_records', {'Records': [_ok('shardId-1', '3')]},
+                             {'StreamName': 'words', 'Records': [{'Data': b'b', 'PartitionKey': 'b'}]})
+
+        futures = [producer.put(word, partition_key=word) for word in 'abc']
+        assert producer.close(timeout=5)
+
+        stubber.assert_no_pending_responses()
+    assert [future.result() for future in futures] == [('shardId-0', '1'), ('shardId-1', '3'), ('shardId-0', '2')]
+    counters = dict((name, value) for name, value, kind in producer.metrics() if kind == 'counter')
+    assert counters == {'kclpy.producer.requests': 2, 'kclpy.producer.records_put': 3,
+                        'kclpy.producer.bytes_put': 6, 'kclpy.producer.records_retried': 1,
+                        'kclpy.producer.records_throttled': 1}
+
+
+def test_entries_fail_after_every_attempt(client):
+    producer = KinesisProducer('words', client=client, linger=None, max_in_flight=1, max_attempts=2,
+                               sleep=lambda s: None)
+    with Stubber(client) as stubber:
+        for _ in range(2):
+            stubber.add_response('put_records', {'FailedRecordCount': 1, 'Records': [THROTTLED]})
+
+        future = producer.put(b'word', partition_key='word')
+        producer.close(timeout=5)
+
+    with pytest.raises(PutRecordsError) as error:
+        future.result()
+    assert error.value.error_code == 'ProvisionedThroughputExceededException'
+    assert ('kclpy.producer.records_failed', 1, 'counter') in producer.metrics()
+
+
+def test_batches_are_limited_by_records_and_bytes():
+    stream = LocalStream()
+    producer = KinesisProducer('words', client=stream, linger=None, max_in_flight=1, max_batch_records=3,
+                               max_batch_bytes=10)
+    for word in ['aaa', 'bbb', 'ccc', 'd', 'e', 'f', 'g']:
+        producer.put(word, partition_key='k')
+    producer.close(timeout=5)
+
+    assert stream.sent('Data') == [[b'aaa', b'bbb'], [b'ccc', b'd', b'e'], [b'f', b'g']]
+    with pytest.raises(ValueError):
+        producer.put(b'\0' * (1024 * 1024), partition_key='k')
+
+
+def test_linger_sends_partial_batches():
+    stream = LocalStream()
+    producer = KinesisProducer('words', client=stream, linger=0.01)
+    try:
+        assert producer.put('word', partition_key='word').result(timeout=5) == ('shardId-000000000000', '0')
+    finally:
+        producer.close()
+
+
+def test_several_calls_are_in_flight():
+    stream = LocalStream(delay=0.05)
+    producer = KinesisProducer('words', client=stream, linger=None, max_in_flight=4, max_batch_records=10)
+    futures = [producer.put(str(n), partition_key=str(n)) for n in range(80)]
+    producer.close(timeout=5)
+
+    assert all(future.done() and not future.exception() for future in futures)
+    assert len(stream.calls) == 8
+    assert 1 < stream.max_in_flight <= 4
+
+
+def test_metrics_are_flushed_by_the_instrumentation_hook():
+    class CollectingSink(MetricSink):
+
+        def __init__(self):
+            self.emitted = []
+
+        def emit(self, timestamp, metrics):
+            self.emitted.append(metrics)
+
+    sink = CollectingSink()
+    hook = InstrumentationHook(sink)
+    producer = KinesisProducer('words', client=LocalStream(), linger=None)
+    hook.add_source(producer)
+    producer.put(b'word', partition_key='word')
+    producer.close(timeout=5)
+
+    hook.flush()
+    hook.flush()
+
+    assert ('kclpy.producer.records_put', 1, 'counter') in sink.emitted[0]
+    assert not [name for metrics in sink.emitted[1:] for name, value, kind in metrics
+                if name.startswith('kclpy.producer.') and kind == 'counter']
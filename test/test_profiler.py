@@ -0,0 +1,88 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import time
+
+import pytest
+
+from amazon_kclpy import kcl, messages
+from amazon_kclpy.profiler import SamplingProfilerHook
+from utils import CheckpointingProcessor, make_io_obj
+
+
+class BusyProcessor(CheckpointingProcessor):
+
+    def process_records(self, process_records_input):
+        deadline = time.time() + 0.2
+        while time.time() < deadline:
+            pass
+
+
+def _messages():
+    return [
+        {"action": "initialize", "shardId": "shardId-123", "sequenceNumber": "456", "subSequenceNumber": 0},
+        {"action": "processRecords", "millisBehindLatest": 0, "records": []},
+    ]
+
+
+def test_samples_are_attributed_to_the_action(tmp_path):
+    hook = SamplingProfilerHook(output_directory=str(tmp_path), interval=0.005, max_files=2)
+    kcl.KCLProcess(BusyProcessor(), input_file=make_io_obj("\n".join(map(json.dumps, _messages()))),
+                   output_file=make_io_obj(), error_file=make_io_obj(), hooks=[hook]).run()
+
+    assert len(hook.files) == 1
+    with open(hook.files[0]) as profile:
+        stacks = [line.rsplit(' ', 1)[0] for line in profile.read().splitlines()]
+    assert any(stack.startswith('shardId-123;processRecords;') and 'process_records' in stack for stack in stacks)
+
+
+def test_activity_tracks_checkpoints():
+    hook = SamplingProfilerHook()
+    hook._thread = object()
+    hook.action_started(messages.ProcessRecordsInput({"action": "processRecords", "millisBehindLatest": 0,
+                                                      "records": []}))
+    assert hook._activity == 'processRecords'
+    hook.checkpoint_started()
+    assert hook._activity == 'checkpoint'
+    hook.checkpoint_finished(0.1, None)
+    assert hook._activity == 'processRecords'
+    hook.action_finished(None, None)
+    assert hook._activity == 'idle'
+
+
+def test_rotation_keeps_max_files(tmp_path):
+    hook = SamplingProfilerHook(output_directory=str(tmp_path), max_files=2)
+    for _ in range(3):
+        hook._samples['a;b'] += 1
+        hook.rotate()
+        time.sleep(0.002)
+
+    assert len(hook.files) == 2
+    assert sorted(str(path) for path in tmp_path.iterdir()) == sorted(hook.files)
+
+
+def test_enabled_by_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv('KCLPY_PROFILE', '1')
+    monkeypatch.setenv('KCLPY_PROFILE_DIRECTORY', str(tmp_path))
+    process = kcl.KCLProcess(CheckpointingProcessor(), input_file=make_io_obj(), output_file=make_io_obj(),
+                             error_file=make_io_obj())
+    assert [type(hook) for hook in process.hooks] == [SamplingProfilerHook]
+    assert process.hooks[0].output_directory == str(tmp_path)
+
+    process = kcl.KCLProcess(CheckpointingProcessor(), input_file=make_io_obj(), output_file=make_io_obj(),
+                             error_file=make_io_obj(), profile=False)
+    assert process.hooks == []
+
+
+@pytest.mark.parametrize('value', ['', '0', 'false', 'No', ' off '])
+def test_disabled_by_false_environment_values(value, monkeypatch):
+    monkeypatch.setenv('KCLPY_PROFILE', value)
+    process = kcl.KCLProcess(CheckpointingProcessor(), input_file=make_io_obj(), output_file=make_io_obj(),
+                             error_file=make_io_obj())
+    assert process.hooks == []
+
+
+def test_fraction_selects_processes():
+    assert SamplingProfilerHook.from_environment({'KCLPY_PROFILE_FRACTION': '0'}) is None
+    assert SamplingProfilerHook.from_environment({'KCLPY_PROFILE_FRACTION': '1'}) is not None
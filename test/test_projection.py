@@ -0,0 +1,104 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import json
+
+import pytest
+
+from amazon_kclpy import messages
+from amazon_kclpy.projection import Equals, OneOf, Prefix, Projection, parse_path
+
+
+def _records(*payloads):
+    return [messages.Record({'data': base64.b64encode(payload).decode('ascii'), 'partitionKey': 'key',
+                             'sequenceNumber': str(n), 'subSequenceNumber': 0, 'approximateArrivalTimestamp': 0})
+            for n, payload in enumerate(payloads)]
+
+
+DOCUMENT = {
+    'type': 'order',
+    'region': 'eu-west-1',
+    'user': {'id': 'u-1', 'name': 'Ann', 'tags': ['a', 'b']},
+    'items': [{'sku': 's-1', 'qty': 2}, {'sku': 's-2', 'qty': 1}],
+    'note': 'contains "quotes", {braces} and [brackets]',
+    'amount': 12.5,
+}
+
+
+def test_parse_path():
+    assert parse_path('items[0].sku') == ('items', 0, 'sku')
+    assert parse_path('a.b') == ('a', 'b')
+    with pytest.raises(ValueError):
+        parse_path('a..b')
+
+
+@pytest.mark.parametrize('paths', [
+    ['user.id', 'items[1].sku', 'amount', 'missing', 'user.tags[1]'],
+    ['user', 'user.id', 'items[5].sku', 'note'],
+    ['type.nested', 'items.sku', 'user.tags[0]'],
+])
+def test_projection_agrees_with_a_full_parse(paths):
+    def lookup(value, path):
+        for token in parse_path(path):
+            if isinstance(token, int) and isinstance(value, list) and token < len(value):
+                value = value[token]
+            elif isinstance(token, str) and isinstance(value, dict) and token in value:
+                value = value[token]
+            else:
+                return None
+        return value
+
+    for text in (json.dumps(DOCUMENT), json.dumps(DOCUMENT, indent=2)):
+        values, matched = Projection(paths).project_payload(text.encode('utf-8'))
+        assert matched
+        assert values == [lookup(DOCUMENT, path) for path in paths]
+
+
+def test_batch_columns_predicates_and_failures():
+    eu = dict(DOCUMENT)
+    us = dict(DOCUMENT, region='us-east-1')
+    refund = dict(DOCUMENT, type='refund')
+    records = _records(json.dumps(eu).encode(), json.dumps(us).encode(), b'{"type": "order", "region": ',
+                       json.dumps(refund).encode(), b'{"region": "eu-north-1"}')
+    projection = Projection(['user.id', 'amount'], where=[Prefix('region', 'eu-'), OneOf('type', ['order'])])
+
+    batch = projection.project(records)
+
+    assert batch.matches == [True, False, False, False, False]
+    assert batch.columns['user.id'][0] == 'u-1'
+    assert batch.columns['region'][:2] == ['eu-west-1', 'us-east-1']
+    assert [failure.index for failure in batch.failures] == [2]
+    assert [row for _, row in batch.rows()] == [
+        {'user.id': 'u-1', 'amount': 12.5, 'region': 'eu-west-1', 'type': 'order'}]
+
+
+def test_scanning_stops_once_every_path_is_found():
+    values, matched = Projection(['type']).project_payload('{"type": "order", "rest": this is not json')
+
+    assert (values, matched) == (['order'], True)
+    assert Projection(['type'], where=[Equals('type', 'refund')]).project_payload(
+        '{"type": "order", "rest": nonsense')[1] is False
+
+
+def test_duplicate_keys_are_counted_once():
+    projection = Projection(['a', 'b'])
+
+    assert projection.project_payload('{"a": 1, "a": 2, "b": 3}') == ([2, 3], True)
+    assert projection.project_payload('{"a": null, "a": 1, "user": {"a": 4}, "b": null}') == ([1, None], True)
+
+
+def test_skipped_values_are_matched_without_being_parsed():
+    deep = {'b': '}]'}
+    for _ in range(12):
+        deep = [{'c': deep}, 1]
+    skipped = {'deep': deep, 'escaped': ['a \\" ] \\\\', '\\\\'], 'empty': [{}, []],
+               'numbers': {'n': [-1.5e3, 0, True, None]}}
+    document = dict(skipped, last='found')
+    projection = Projection(['last'])
+
+    for text in (json.dumps(document), json.dumps(document, indent=2)):
+        assert projection.project_payload(text) == (['found'], True)
+    for malformed in ('{"deep": [[1, "unterminated]]], "last": 1}', '{"deep": [1, 2', '{"deep": nope, "last": 1}'):
+        with pytest.raises(ValueError):
+            projection.project_payload(malformed)
@@ -0,0 +1,123 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import sys
+
+import pytest
+
+from amazon_kclpy import kcl
+from amazon_kclpy.hooks import ProcessHook
+from amazon_kclpy.reload import ModuleReloader
+from utils import make_io_obj
+
+_PROCESSOR_SOURCE = """
+from amazon_kclpy.v3 import processor
+
+GENERATION = {generation}
+
+
+class RecordProcessor(processor.RecordProcessorBase):
+
+    def __init__(self):
+        self.generation = GENERATION
+        self.shard_id = None
+        self.batches = []
+
+    def initialize(self, initialize_input):
+        self.shard_id = initialize_input.shard_id
+
+    def process_records(self, process_records_input):
+        self.batches.append((self.generation, len(process_records_input.records)))
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        pass
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+    def handoff_state(self):
+        return self.batches
+
+    def resume(self, initialize_input, state):
+        self.shard_id = initialize_input.shard_id
+        self.batches = state
+"""
+
+
+class DeployingHook(ProcessHook):
+    """
+    Rewrites the processor module after the first batch, as a deployment would.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+
+    def action_finished(self, action, error):
+        if action.action == 'processRecords' and self.source is not None:
+            _write_module(self.path, self.source, bump=True)
+            self.source = None
+
+
+def _write_module(path, source, bump=False):
+    with open(path, 'w') as module_file:
+        module_file.write(source)
+    if bump:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 10))
+
+
+def _record():
+    return {"action": "record", "data": "bWVvdw==", "partitionKey": "cat", "sequenceNumber": "456",
+            "subSequenceNumber": 0, "approximateArrivalTimestamp": 1476889707000}
+
+
+_MESSAGES = [
+    {"action": "initialize", "shardId": "shardId-123", "sequenceNumber": "456", "subSequenceNumber": 0},
+    {"action": "processRecords", "millisBehindLatest": 0, "records": [_record()]},
+    {"action": "processRecords", "millisBehindLatest": 0, "records": [_record(), _record()]},
+]
+
+
+@pytest.fixture
+def module_path(tmp_path):
+    path = str(tmp_path.joinpath('reloadable_processor.py'))
+    _write_module(path, _PROCESSOR_SOURCE.format(generation=1))
+    sys.path.insert(0, str(tmp_path))
+    yield path
+    sys.path.remove(str(tmp_path))
+    sys.modules.pop('reloadable_processor', None)
+
+
+def _run(module_path, new_source):
+    import reloadable_processor
+    error_file = make_io_obj()
+    process = kcl.KCLProcess(reloadable_processor.RecordProcessor(),
+                             input_file=make_io_obj("\n".join(map(json.dumps, _MESSAGES))),
+                             output_file=make_io_obj(), error_file=error_file,
+                             hooks=[DeployingHook(module_path, new_source)],
+                             reloader=ModuleReloader('reloadable_processor', poll_interval=0))
+    process.run()
+    return process, error_file.getvalue()
+
+
+def test_reload_hands_off_state(module_path):
+    process, errors = _run(module_path, _PROCESSOR_SOURCE.format(generation=2))
+
+    assert errors == ""
+    assert process.processor.generation == 2
+    assert process.processor.shard_id == "shardId-123"
+    assert process.processor.batches == [(1, 1), (2, 2)]
+
+
+def test_broken_reload_keeps_current_processor(module_path):
+    process, errors = _run(module_path, "this is not python")
+
+    assert "Caught exception while reloading the record processor" in errors
+    assert process.processor.generation == 1
+    assert process.processor.batches == [(1, 1), (1, 2)]
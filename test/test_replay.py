@@ -0,0 +1,87 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import json
+
+from amazon_kclpy import kcl
+from amazon_kclpy.capture import read_capture
+from amazon_kclpy.replay import load_actions, replay
+from amazon_kclpy.v3 import processor
+from utils import make_io_obj
+
+
+class RetryingProcessor(processor.RecordProcessorBase):
+
+    def __init__(self):
+        self.records = 0
+        self.checkpoint_errors = []
+
+    def initialize(self, initialize_input):
+        pass
+
+    def process_records(self, process_records_input):
+        self.records += len(process_records_input.records)
+        try:
+            process_records_input.checkpointer.checkpoint()
+        except kcl.CheckpointError as e:
+            self.checkpoint_errors.append(e.value)
+            process_records_input.checkpointer.checkpoint()
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        pass
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+
+def _record(data, sequence_number):
+    return {'action': 'record', 'data': base64.b64encode(data).decode('ascii'), 'partitionKey': 'key',
+            'sequenceNumber': sequence_number, 'subSequenceNumber': 0, 'approximateArrivalTimestamp': 1000}
+
+
+def _capture(tmpdir):
+    path = str(tmpdir.join('capture.jsonl.gz'))
+    lines = [
+        {'action': 'initialize', 'shardId': 'shardId-000000000000', 'sequenceNumber': '1', 'subSequenceNumber': 0},
+        {'action': 'processRecords', 'millisBehindLatest': 0,
+         'records': [_record(b'alpha', '10'), _record(b'beta', '11')]},
+        {'action': 'checkpoint', 'sequenceNumber': None, 'subSequenceNumber': None, 'error': 'ThrottlingException'},
+        {'action': 'checkpoint', 'sequenceNumber': '11', 'subSequenceNumber': 0},
+        {'action': 'shutdownRequested'},
+    ]
+    input_file = make_io_obj('\n'.join(json.dumps(line) for line in lines) + '\n')
+    kcl.KCLProcess(RetryingProcessor(), input_file=input_file, output_file=make_io_obj(),
+                   error_file=make_io_obj(), capture=path).run()
+    return path
+
+
+def test_capture_records_both_directions(tmpdir):
+    entries = list(read_capture(_capture(tmpdir)))
+
+    inbound = [json.loads(entry['line'])['action'] for entry in entries if entry['direction'] == 'in']
+    outbound = [json.loads(entry['line'])['action'] for entry in entries if entry['direction'] == 'out']
+    assert inbound == ['initialize', 'processRecords', 'checkpoint', 'checkpoint', 'shutdownRequested']
+    assert outbound == ['status', 'checkpoint', 'checkpoint', 'status', 'status']
+    assert all(entries[i]['time'] <= entries[i + 1]['time'] for i in range(len(entries) - 1))
+
+
+def test_replay_answers_checkpoints_from_the_capture(tmpdir):
+    path = _capture(tmpdir)
+    actions = load_actions(path)
+    assert [len(action.checkpoint_responses) for action in actions] == [0, 2, 0]
+
+    record_processor = RetryingProcessor()
+    report = replay(path, record_processor, error_file=make_io_obj())
+
+    assert record_processor.records == 2
+    assert record_processor.checkpoint_errors == ['ThrottlingException']
+    assert report['actions'] == 3
+    assert report['records'] == 2
+    assert report['bytes'] == len(b'alpha') + len(b'beta')
+    metrics = dict((name, value) for name, value, _ in report['metrics'])
+    assert metrics['kclpy.processRecords.checkpoint.count'] == 2
+    assert metrics['kclpy.processRecords.dispatch.count'] == 1
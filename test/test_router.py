@@ -0,0 +1,125 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import base64
+import re
+
+import pytest
+
+from amazon_kclpy import messages
+from amazon_kclpy.router import PartitionKeyRouter, prefix, regex
+from amazon_kclpy.v3 import processor
+from utils import RecordingCheckpointer
+
+
+class Handler(processor.RecordProcessorBase):
+
+    def __init__(self, log=None, fail=False):
+        self.log = log if log is not None else []
+        self.fail = fail
+        self.batches = []
+        self.calls = []
+
+    def initialize(self, initialize_input):
+        self.calls.append('initialize')
+
+    def process_records(self, process_records_input):
+        self.batches.append([record.partition_key for record in process_records_input.records])
+        process_records_input.checkpointer.checkpoint()
+        self.log.append(self)
+        if self.fail:
+            raise RuntimeError('handler failed')
+
+    def lease_lost(self, lease_lost_input):
+        self.calls.append('lease_lost')
+
+    def shard_ended(self, shard_ended_input):
+        shard_ended_input.checkpointer.checkpoint()
+        self.calls.append('shard_ended')
+
+    def shutdown_requested(self, shutdown_requested_input):
+        self.calls.append('shutdown_requested')
+
+
+def _batch(checkpointer, *partition_keys):
+    records = [messages.Record({'data': base64.b64encode(b'data').decode('ascii'), 'partitionKey': partition_key,
+                                'sequenceNumber': str(n), 'subSequenceNumber': 0, 'approximateArrivalTimestamp': 0})
+               for n, partition_key in enumerate(partition_keys)]
+    process_records_input = messages.ProcessRecordsInput({'action': 'processRecords', 'records': records,
+                                                          'millisBehindLatest': 0})
+    process_records_input._checkpointer = checkpointer
+    return process_records_input
+
+
+def test_first_matching_rule_wins():
+    router = PartitionKeyRouter([prefix('orders:refund:', 'refunds'), prefix('orders:', 'orders'),
+                                 regex(r'orders:(?P<id>\d+)$', 'numbered'), regex(r'user-\d+$', 'users'),
+                                 prefix('', 'anything')])
+
+    assert [router.handlers[router.route(key)] for key in
+            ['orders:refund:1', 'orders:42', 'user-7', 'user-x', 'order']] == \
+        ['refunds', 'orders', 'users', 'anything', 'anything']
+    assert PartitionKeyRouter([regex(r'a+b', 'regex'), prefix('a', 'prefix')]).route('aab') == 0
+    assert PartitionKeyRouter([prefix('a', 'prefix')]).route('b') is None
+
+
+def test_regex_rules_keep_their_own_groups_and_flags():
+    router = PartitionKeyRouter([regex(r'(?P<id>\d+)x', 'x'), regex(r'(?P<id>\d+)y', 'y'), regex(r'(a)\1', 'double'),
+                                 regex(r'b+$', 'plain'), regex(r'(?i)upper', 'upper'), regex(r'(c)(d)\2', 'second')],
+                                default='none')
+
+    assert [router.handlers[router.route(key)] for key in ['12x', '12y', 'aa', 'ab', 'bb', 'UPPER', 'cdd', 'cdc']] == \
+        ['x', 'y', 'double', 'none', 'plain', 'upper', 'second', 'none']
+    assert PartitionKeyRouter([regex(r'b', 'plain'), regex(r'(b)\1', 'double')]).route('bb') == 0
+    assert PartitionKeyRouter([regex(r'(b)\1', 'double'), regex(r'b', 'plain')]).route('bb') == 0
+    with pytest.raises(re.error):
+        PartitionKeyRouter([regex(r'(a', 'broken')])
+
+
+def test_batches_are_split_in_order_and_checkpointed_after_every_handler():
+    log = []
+    orders, users, other = Handler(log), Handler(log), Handler(log)
+    router = PartitionKeyRouter([prefix('order-', orders), regex(r'user-\d', users)], default=other)
+    checkpointer = RecordingCheckpointer()
+
+    router.process_records(_batch(checkpointer, 'order-1', 'user-1', 'x', 'order-2', 'user-2', 'order-1'))
+
+    assert orders.batches == [['order-1', 'order-2', 'order-1']]
+    assert users.batches == [['user-1', 'user-2']]
+    assert other.batches == [['x']]
+    assert log == [orders, users, other]
+    assert checkpointer.checkpoints == [('5', 0)]
+
+
+def test_a_handler_used_by_several_rules_gets_one_sub_batch():
+    shared = Handler()
+    router = PartitionKeyRouter([prefix('a', shared), regex('c', Handler()), prefix('b', shared)])
+
+    router.process_records(_batch(RecordingCheckpointer(), 'a1', 'b1', 'c1', 'a2'))
+
+    assert shared.batches == [['a1', 'b1', 'a2']]
+    assert router.handlers[1].batches == [['c1']]
+
+
+def test_a_failed_handler_stops_the_checkpoint():
+    router = PartitionKeyRouter([prefix('a', Handler()), prefix('b', Handler(fail=True))])
+    checkpointer = RecordingCheckpointer()
+
+    with pytest.raises(RuntimeError):
+        router.process_records(_batch(checkpointer, 'a1', 'b1', 'c1'))
+
+    assert checkpointer.checkpoints == []
+    assert router.unmatched == 1
+
+
+def test_lifecycle_calls_reach_each_handler_once():
+    shared = Handler()
+    router = PartitionKeyRouter([prefix('a', shared), prefix('b', shared)], default=Handler())
+    checkpointer = RecordingCheckpointer()
+
+    router.initialize(None)
+    messages.ShardEndedInput({'action': 'shardEnded'}).dispatch(checkpointer, router)
+
+    assert shared.calls == ['initialize', 'shard_ended']
+    assert router.handlers[2].calls == ['initialize', 'shard_ended']
+    assert checkpointer.checkpoints == [(None, None)]
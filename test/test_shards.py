@@ -0,0 +1,71 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+
+import boto3
+from botocore.stub import Stubber
+
+from amazon_kclpy.producer import KinesisProducer
+from amazon_kclpy.shards import MAX_HASH_KEY, ShardMap, ShardRateLimiter, hash_key
+from utils import FakeClock, LocalStream, make_shard
+
+
+HALF = 2 ** 127
+SHARDS = [make_shard('shardId-000000000000', 0, MAX_HASH_KEY, closed=True),
+          make_shard('shardId-000000000002', HALF, MAX_HASH_KEY), make_shard('shardId-000000000001', 0, HALF - 1)]
+
+
+def _key_on(shard_map, shard_id, start=0):
+    for n in range(start, start + 1000):
+        if shard_map.shard_for(str(n)) == shard_id:
+            return str(n)
+
+
+def test_shard_map_pages_through_open_shards():
+    client = boto3.client('kinesis', region_name='us-east-1', aws_access_key_id='id', aws_secret_access_key='secret')
+    shard_map = ShardMap(client, 'words')
+    with Stubber(client) as stubber:
+        stubber.add_response('list_shards', {'Shards': SHARDS[:2], 'NextToken': 'page-2'}, {'StreamName': 'words'})
+        stubber.add_response('list_shards', {'Shards': SHARDS[2:]}, {'NextToken': 'page-2'})
+
+        keys = ['alpha', 'beta', 'gamma', 'alpha']
+        shard_ids = shard_map.shards_for(keys, [None, None, None, str(MAX_HASH_KEY)])
+
+    assert hash_key('alpha') == int(hashlib.md5(b'alpha').hexdigest(), 16)
+    expected = ['shardId-000000000001' if hash_key(key) < HALF else 'shardId-000000000002' for key in keys[:3]]
+    assert shard_ids == expected + ['shardId-000000000002']
+    assert shard_map.shard_ids == ['shardId-000000000001', 'shardId-000000000002']
+
+
+def test_limiter_holds_back_records_for_busy_shards():
+    clock = FakeClock(100.0)
+    shard_map = ShardMap(LocalStream(SHARDS[1:]), 'words', clock=clock)
+    limiter = ShardRateLimiter(shard_map, records_per_second=2, bytes_per_second=100, clock=clock)
+    hot = _key_on(shard_map, 'shardId-000000000001')
+    cold = _key_on(shard_map, 'shardId-000000000002')
+    requests = [{'Data': b'x', 'PartitionKey': hot} for _ in range(3)] + [{'Data': b'x' * 96, 'PartitionKey': cold},
+                                                                          {'Data': b'x' * 5, 'PartitionKey': cold}]
+
+    admitted, wait = limiter.admit(requests)
+
+    assert admitted == [True, True, False, True, False]
+    assert 0 < wait < 0.5
+    clock.sleep(0.5)
+    assert limiter.admit(requests[2:3] + requests[4:]) == ([True, True], 0.0)
+
+
+def test_producer_sends_shaped_batches():
+    clock = FakeClock(100.0)
+    stream = LocalStream(SHARDS[1:])
+    shard_map = ShardMap(stream, 'words', clock=clock)
+    hot = _key_on(shard_map, 'shardId-000000000001')
+    cold = _key_on(shard_map, 'shardId-000000000002')
+    producer = KinesisProducer('words', client=stream, linger=None, max_in_flight=1, max_attempts=1, clock=clock,
+                               sleep=clock.sleep, shaper=ShardRateLimiter(shard_map, records_per_second=2, clock=clock))
+    futures = [producer.put(b'x', partition_key=key) for key in [hot, hot, cold, hot, hot, hot]]
+    assert producer.close(timeout=5)
+
+    assert all(future.result() for future in futures)
+    assert stream.sent('PartitionKey') == [[hot, hot, cold], [hot], [hot], [hot]]
+    assert ('kclpy.producer.records_deferred', 6, 'counter') in producer.metrics()
@@ -0,0 +1,95 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip('fcntl')
+
+from amazon_kclpy import kcl, top
+from amazon_kclpy.shared_metrics import SharedMetricsHook, SharedMetricsSegment
+from utils import CheckpointingProcessor, make_io_obj
+
+
+class RecordingHook(SharedMetricsHook):
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingHook, self).__init__(*args, **kwargs)
+        self.readings = []
+
+    def close(self):
+        if self._segment is not None:
+            self.readings = self._segment.read_slots()
+        super(RecordingHook, self).close()
+
+
+def _record(data):
+    return {"action": "record", "data": data, "partitionKey": "cat", "sequenceNumber": "456",
+            "subSequenceNumber": 0, "approximateArrivalTimestamp": 1476889707000}
+
+
+@pytest.fixture
+def segment_path(tmp_path):
+    return str(tmp_path.joinpath('segment'))
+
+
+def test_hook_publishes_counters(segment_path):
+    messages = [
+        {"action": "initialize", "shardId": "shardId-123", "sequenceNumber": "456", "subSequenceNumber": 0},
+        {"action": "processRecords", "millisBehindLatest": 1500, "records": [_record("bWVvdw=="), _record("bWVv")]},
+        {"action": "checkpoint", "sequenceNumber": "456", "subSequenceNumber": 0},
+    ]
+    hook = RecordingHook(segment_path, slot_count=4)
+    process = kcl.KCLProcess(CheckpointingProcessor(), input_file=make_io_obj("\n".join(map(json.dumps, messages))),
+                             output_file=make_io_obj(), error_file=make_io_obj(), hooks=[hook])
+    process.run()
+
+    assert len(hook.readings) == 1
+    slot = hook.readings[0]
+    assert slot['pid'] == os.getpid()
+    assert slot['shard_id'] == "shardId-123"
+    assert slot['batches'] == 1
+    assert slot['records'] == 2
+    assert slot['bytes'] == 7
+    assert slot['millis_behind_latest'] == 1500
+    assert slot['checkpoints'] == 1
+    assert slot['checkpoint_errors'] == 0
+
+
+def test_close_releases_slot(segment_path):
+    hook = SharedMetricsHook(segment_path, slot_count=4)
+    hook._claim("shardId-1")
+    hook.close()
+
+    segment = SharedMetricsSegment(segment_path, create=False)
+    assert segment.read_slots() == []
+    segment.close()
+
+
+def test_slots_of_dead_processes_are_reclaimed(segment_path):
+    segment = SharedMetricsSegment(segment_path, slot_count=1)
+    index = segment.claim("shardId-1")
+    values = (2 ** 22 + 12345, b"shardId-1") + (0.0,) * 2 + (0,) * 4 + (-1, 0, 0, 0.0, 0.0, 0)
+    segment.publish(index, values)
+
+    assert segment.claim("shardId-2") == 0
+    assert segment.read_slot(0)['shard_id'] == "shardId-2"
+    segment.close()
+
+
+def test_compute_rates():
+    previous = {0: {'slot': 0, 'pid': 10, 'shard_id': 'shardId-1', 'started': 0.0, 'updated': 10.0, 'batches': 5,
+                    'records': 500, 'bytes': 51200, 'checkpoints': 1, 'total_checkpoint_millis': 4.0}}
+    current = [dict(previous[0], updated=12.0, batches=7, records=700, bytes=71680, checkpoints=3,
+                    total_checkpoint_millis=10.0, last_batch_size=100, millis_behind_latest=0,
+                    last_checkpoint_millis=3.0, dispatch_errors=1, checkpoint_errors=0)]
+
+    row = top.compute_rates(previous, current)[0]
+    assert row['records_per_second'] == 100.0
+    assert row['kilobytes_per_second'] == 10.0
+    assert row['average_batch_size'] == 100.0
+    assert row['checkpoint_millis'] == 3.0
+    assert row['errors'] == 1
+    assert 'shardId-1' in top.render([row])
@@ -0,0 +1,64 @@
+# Copyright 2024 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import time
+
+import pytest
+
+from amazon_kclpy import kcl
+from amazon_kclpy.watchdog import WatchdogHook
+from utils import CheckpointingProcessor, make_io_obj
+
+
+class SlowProcessor(CheckpointingProcessor):
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def process_records(self, process_records_input):
+        self.wait_on_downstream()
+
+    def wait_on_downstream(self):
+        time.sleep(self.delay)
+
+
+def _run(processor, hook):
+    record = {"action": "record", "data": "bWVvdw==", "partitionKey": "cat", "sequenceNumber": "456",
+              "subSequenceNumber": 0, "approximateArrivalTimestamp": 1476889707000}
+    messages = [
+        {"action": "initialize", "shardId": "shardId-123", "sequenceNumber": "456", "subSequenceNumber": 0},
+        {"action": "processRecords", "millisBehindLatest": 0, "records": [record, record]},
+    ]
+    kcl.KCLProcess(processor, input_file=make_io_obj("\n".join(map(json.dumps, messages))),
+                   output_file=make_io_obj(), error_file=make_io_obj(), hooks=[hook]).run()
+
+
+def test_slow_dispatch_is_sampled(tmp_path):
+    hook = WatchdogHook(threshold=0.05, sample_interval=0.01, poll_interval=0.01, report_directory=str(tmp_path))
+    _run(SlowProcessor(0.4), hook)
+
+    assert len(hook.reports) == 1
+    assert 'shardId-123-processRecords' in hook.reports[0]
+    with open(hook.reports[0]) as report:
+        lines = report.read().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert stack.startswith('shardId-123;processRecords;batch_size=2;')
+        assert int(count) > 0
+    assert any('wait_on_downstream' in line for line in lines)
+
+
+def test_fast_dispatch_is_not_reported(tmp_path):
+    hook = WatchdogHook(threshold=5, poll_interval=0.01, report_directory=str(tmp_path))
+    _run(SlowProcessor(0), hook)
+
+    assert hook.reports == []
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('arguments', [{'threshold': 0}, {'sample_interval': 0}, {'poll_interval': -1}])
+def test_non_positive_intervals_are_rejected(arguments):
+    with pytest.raises(ValueError):
+        WatchdogHook(**arguments)
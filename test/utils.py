@@ -3,6 +3,10 @@
 
 import sys
 import io
+import threading
+import time
+
+from amazon_kclpy.v3 import processor
 
 
 def make_io_obj(json_text=None):
@@ -14,4 +18,100 @@ def make_io_obj(json_text=None):
     if json_text is not None:
         return create_method(json_text)
     else:
-        return create_method()
\ No newline at end of file
+        return create_method()
+
+
+class CheckpointingProcessor(processor.RecordProcessorBase):
+
+    def initialize(self, initialize_input):
+        pass
+
+    def process_records(self, process_records_input):
+        process_records_input.checkpointer.checkpoint()
+
+    def lease_lost(self, lease_lost_input):
+        pass
+
+    def shard_ended(self, shard_ended_input):
+        pass
+
+    def shutdown_requested(self, shutdown_requested_input):
+        pass
+
+
+def make_shard(shard_id, start, end, closed=False):
+    sequence_number_range = {'StartingSequenceNumber': '1'}
+    if closed:
+        sequence_number_range['EndingSequenceNumber'] = '2'
+    return {'ShardId': shard_id, 'HashKeyRange': {'StartingHashKey': str(start), 'EndingHashKey': str(end)},
+            'SequenceNumberRange': sequence_number_range}
+
+
+TWO_SHARDS = [make_shard('shardId-000000000000', 0, 2 ** 127 - 1),
+              make_shard('shardId-000000000001', 2 ** 127, 2 ** 128 - 1)]
+
+
+class FakeClock(object):
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RecordingCheckpointer(object):
+
+    def __init__(self, fail=False):
+        self.checkpoints = []
+        self.fail = fail
+
+    def checkpoint(self, sequence_number=None, sub_sequence_number=None):
+        if self.fail:
+            raise IOError('checkpoint failed')
+        self.checkpoints.append((sequence_number, sub_sequence_number))
+
+
+class LocalStream(object):
+    """
+    Stands in for a Kinesis client, keeping the records of each PutRecords request and reporting them all as put on
+    the first of its shards.
+    """
+
+    def __init__(self, shards=None, delay=0.0):
+        self.shards = TWO_SHARDS if shards is None else shards
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def records(self):
+        return [record for call in self.calls for record in call]
+
+    def sent(self, field):
+        """
+        :param str field: a field of the request entries, such as ``Data`` or ``PartitionKey``
+        :return: the field of each record, grouped by request
+        """
+        return [[record[field] for record in call] for call in self.calls]
+
+    def list_shards(self, **arguments):
+        return {'Shards': self.shards}
+
+    def put_records(self, StreamName, Records):
+        with self.lock:
+            self.calls.append(list(Records))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        shard_id = self.shards[0]['ShardId']
+        return {'FailedRecordCount': 0,
+                'Records': [{'ShardId': shard_id, 'SequenceNumber': str(n)} for n in range(len(Records))]}